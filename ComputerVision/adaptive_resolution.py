@@ -0,0 +1,148 @@
+import datetime
+import time
+
+import numpy as np
+
+from typing import *
+
+from lane_detector import LaneDetection, LaneDetector
+from lane_geometry import get_lane_geometry
+
+
+class ResolutionParams:
+    """Wrapper for configuration constants"""
+    WIDTHS = (960, 720, 640, 480, 360, 320, 240)  # the working widths to choose from
+    LATENCY_SMOOTHING = 0.1  # weight of the last frame in the average latency
+    HEADROOM = 0.7  # a bigger width is chosen when its expected latency is below this fraction of the budget
+    MIN_FRAMES = 10  # frames processed at a width before it can change again
+
+
+class AdaptiveLaneDetector:
+    """Adapts the working width of a LaneDetector to keep its per-frame latency within a budget.
+
+    The latency of detect() is averaged over the recent frames. When the average goes over the budget, the
+    next smaller width of widths is used; when the average, scaled by the number of pixels of the next bigger
+    width, is expected below HEADROOM of the budget, the bigger width is used again. The headroom and the
+    MIN_FRAMES frames between two changes keep the width from oscillating. Lines are fitted in the bird's eye
+    view of the working resolution, the last good lines of the detector follow every change (see
+    LaneDetector.apply_fallback()).
+
+    Every change is printed with its reason, and metrics() reports the current choices.
+
+    Example:
+        detector = AdaptiveLaneDetector(TrackingLaneDetector(), budget_s=0.005)
+        for frame in frames:
+            cv2.imshow('Lanes', detector.detector.draw_overlay(detector.detect(frame)))
+
+    Attributes:
+        detector: LaneDetector -- The detector whose width is adapted.
+        budget_s: float -- The target latency of detect(), in seconds.
+        widths: Tuple[int, ...] -- The working widths to choose from, in decreasing order.
+        latency_s: float -- The average latency of the recent frames, in seconds.
+        switches: int -- The number of width changes.
+        frames_per_width: Dict[int, int] -- The number of frames processed at every width.
+
+    Methods:
+        detect(frame: np.ndarray) -> LaneDetection -- Detects the lane lines of a frame and adapts the width.
+        metrics() -> Dict[str, float] -- Returns the current choices and latency in a dict.
+        summary() -> str -- Returns a one line summary of the metrics.
+    """
+    detector: LaneDetector
+    budget_s: float
+    widths: Tuple[int, ...]
+    latency_s: float
+    switches: int
+    frames_per_width: Dict[int, int]
+
+    def __init__(self, detector: LaneDetector, budget_s: float, widths: Sequence[int] = ResolutionParams.WIDTHS):
+        """Initializes the AdaptiveLaneDetector, starting at the width of the detector.
+
+        Args:
+            detector: LaneDetector -- The detector to adapt, which must have a working width (not None).
+            budget_s: float -- The target latency of detect(), in seconds.
+            widths = ResolutionParams.WIDTHS: Sequence[int] -- The working widths to choose from, the width of
+                the detector is added to them.
+        """
+        if detector.width is None:
+            raise ValueError('The detector must have a working width to adapt, got width=None')
+        self.detector = detector
+        self.budget_s = budget_s
+        self.widths = tuple(sorted(set(widths) | {detector.width}, reverse=True))
+        self.latency_s = 0.0
+        self.switches = 0
+        self.frames_per_width = {}
+        self._frames_at_width = 0
+        self._shape = None
+
+    def detect(self, frame: np.ndarray) -> LaneDetection:
+        """Detects the lane lines of a frame, then chooses the width of the next frame.
+
+        Args:
+            frame: np.ndarray -- The BGR frame, at any resolution.
+
+        Returns:
+            LaneDetection -- The detection, whose frame is at the width chosen for this frame.
+        """
+        start_s = time.perf_counter()
+        detection = self.detector.detect(frame)
+        latency_s = time.perf_counter() - start_s
+
+        width = self.detector.width
+        self._shape = detection.frame.shape[:2]
+        self.frames_per_width[width] = self.frames_per_width.get(width, 0) + 1
+        # the first frame at a width also pays for its buffers and geometry, it is not averaged
+        if self._frames_at_width and not self.latency_s:
+            self.latency_s = latency_s
+        elif self._frames_at_width:
+            self.latency_s += ResolutionParams.LATENCY_SMOOTHING * (latency_s - self.latency_s)
+        self._frames_at_width += 1
+        if self._frames_at_width >= ResolutionParams.MIN_FRAMES:
+            self._adapt(width)
+        return detection
+
+    def metrics(self) -> Dict[str, float]:
+        """Returns the current choices and latency in a dict, e.g. to be logged as JSON.
+
+        Returns:
+            Dict[str, float] -- The width, the rows of the frame actually processed (the crop of the road
+                trapezoid), the latency and its budget, the number of switches and the frames per width.
+        """
+        metrics = {'width': self.detector.width, 'latency_ms': self.latency_s * 1e3, 'budget_ms': self.budget_s * 1e3,
+                   'switches': self.switches}
+        if self._shape is not None:
+            height, width = self._shape
+            metrics['height'] = height
+            metrics['roi_rows'] = height - get_lane_geometry(height, width, self.detector.roi).roi_top
+        for width, frames in self.frames_per_width.items():
+            metrics[f'frames_at_{width}'] = frames
+        return metrics
+
+    def summary(self) -> str:
+        """Returns a one line summary of the metrics.
+
+        Returns:
+            str -- The summary.
+        """
+        metrics = self.metrics()
+        summary = (f"width {metrics['width']}, latency {metrics['latency_ms']:.2f}ms for a {metrics['budget_ms']:.2f}ms budget, "
+                   f"{self.switches} switches")
+        if 'roi_rows' in metrics:
+            summary += f", {metrics['roi_rows']}/{metrics['height']} rows processed"
+        return summary
+
+    def _adapt(self, width: int):
+        index = self.widths.index(width)
+        if self.latency_s > self.budget_s and index + 1 < len(self.widths):
+            new_width = self.widths[index + 1]
+            reason = f'latency {self.latency_s * 1e3:.2f}ms over the {self.budget_s * 1e3:.2f}ms budget'
+        elif index > 0 and self.latency_s * (self.widths[index - 1] / width) ** 2 < self.budget_s * ResolutionParams.HEADROOM:
+            new_width = self.widths[index - 1]
+            reason = f'latency {self.latency_s * 1e3:.2f}ms leaves room in the {self.budget_s * 1e3:.2f}ms budget'
+        else:
+            return
+        print(f'[{datetime.datetime.now()}][AdaptiveLaneDetector] width {width} -> {new_width}: {reason}')
+        # the latency scales with the number of pixels, until it is measured at the new width
+        self.latency_s *= (new_width / width) ** 2
+        self.detector.width = new_width
+        self.switches += 1
+        self._frames_at_width = 0
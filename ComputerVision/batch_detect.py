@@ -0,0 +1,145 @@
+import argparse
+import datetime
+import os
+import time
+
+import cv2
+import numpy as np
+
+from typing import *
+
+from edge_detection import EdgeBackend, EdgeParams
+from lane_detector import LaneDetection, LaneDetector
+from lane_results import LaneResultsWriter, ResultsParams
+from lane_tracking import TrackingLaneDetector
+from line_fitting import FitMethod, FitParams
+from parallel_lane_detector import ParallelLaneDetector
+from video_decode_pool import DecodePoolParams, VideoDecodePool, read_frames
+
+
+class BatchParams:
+    """Wrapper for configuration constants"""
+    PROGRESS_INTERVAL_S = 10
+
+
+def video_shape(video_path: str) -> Tuple[int, int, int]:
+    """Returns the (height, width, 3) shape of the frames of a video file."""
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise IOError(f'Could not open video {video_path!r}')
+    shape = (int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    video.release()
+    return shape
+
+
+def timed_detections(detector: LaneDetector, frames: Iterable[np.ndarray]) -> Iterator[Tuple[LaneDetection, float]]:
+    """Yields the detection of every frame and the time detect() took, in seconds."""
+    for frame in frames:
+        start_s = time.perf_counter()
+        detection = detector.detect(frame)
+        yield detection, time.perf_counter() - start_s
+
+
+def timed_parallel_detections(pool: ParallelLaneDetector, frames: Iterable[np.ndarray]) -> Iterator[Tuple[LaneDetection, float]]:
+    """Yields the detection of every frame and the time from its submission to its collection, in seconds."""
+    submitted_s = []
+    next_collected = 0
+
+    def collect() -> Tuple[LaneDetection, float]:
+        nonlocal next_collected
+        detection = pool.collect()[1]
+        time_s = time.perf_counter() - submitted_s[next_collected]
+        next_collected += 1
+        return detection, time_s
+
+    for frame in frames:
+        if pool.full():
+            yield collect()
+        submitted_s.append(time.perf_counter())
+        pool.submit(frame)
+    while pool.pending():
+        yield collect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detects the lane lines of every frame of a video file, without any window, '
+                                                 'and writes them to chunks of .npy columns (see lane_results.py).')
+    parser.add_argument('--video', required=True, help='video file to process')
+    parser.add_argument('--output', default=None, help='directory of the results, defaults to the video path without its extension')
+    parser.add_argument('--restart', action='store_true', help='discard the results of a previous run instead of resuming it')
+    parser.add_argument('--chunk-frames', type=int, default=ResultsParams.CHUNK_FRAMES, help='number of frames per written chunk')
+    parser.add_argument('--edge-backend', choices=EdgeBackend.ALL, default=EdgeParams.DEFAULT_BACKEND,
+                        help='how the Sobel magnitude is computed, exact is the original float pipeline')
+    parser.add_argument('--fit-method', choices=FitMethod.ALL, default=FitParams.DEFAULT_METHOD,
+                        help='how the lines are fitted on the edge pixels, ransac ignores the pixels off the line')
+    parser.add_argument('--max-fit-points', type=int, default=None,
+                        help='fit every line on a stratified subsample of at most this many pixels')
+    parser.add_argument('--track', action='store_true',
+                        help='search each line around its last fit instead of the whole frame (needs --workers 0)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of processes detecting frames in parallel (0 detects in this process)')
+    parser.add_argument('--decode-workers', type=int, default=0,
+                        help='number of processes decoding segments of the video in parallel (0 decodes in this process)')
+    parser.add_argument('--segment-frames', type=int, default=DecodePoolParams.SEGMENT_FRAMES, help='number of frames per decoded segment')
+    args = parser.parse_args()
+    if args.track and args.workers:
+        parser.error('--track follows the frames in order, it needs --workers 0')
+
+    detector_kwargs = dict(width=480, roi=(0.42, 0.6, 0.77), threshold=120, side_margin=0.08, edge_backend=args.edge_backend,
+                           fit_method=args.fit_method, max_fit_points=args.max_fit_points)
+    detector_class = TrackingLaneDetector if args.track else LaneDetector
+    output = args.output or os.path.splitext(args.video)[0]
+    # the lines are in the bird's eye view of the working resolution, which the metadata records to read them back
+    working_shape = LaneDetector(**detector_kwargs).working_shape(video_shape(args.video))
+    metadata = dict(video=os.path.abspath(args.video), detector=detector_class.__name__, detector_kwargs=detector_kwargs,
+                    working_shape=working_shape[:2])
+
+    try:
+        writer = LaneResultsWriter(output, metadata, args.chunk_frames, restart=args.restart)
+    except ValueError as e:
+        parser.error(str(e))
+    with writer:
+        start = writer.next_frame
+        if start:
+            print(f'[{datetime.datetime.now()}][batch_detect] resuming {args.video} at frame {start}')
+
+        pool = None
+        if args.decode_workers > 0:
+            pool = VideoDecodePool(args.video, args.decode_workers, args.segment_frames, start=start)
+            frames = iter(pool)
+        else:
+            frames = read_frames(args.video, start)
+
+        detector_pool = None
+        if args.workers:
+            detector_pool = ParallelLaneDetector(args.workers, **detector_kwargs)
+            detections = timed_parallel_detections(detector_pool, frames)
+        else:
+            detections = timed_detections(detector_class(**detector_kwargs), frames)
+
+        start_s = time.monotonic()
+        next_progress_s = start_s + BatchParams.PROGRESS_INTERVAL_S
+        try:
+            for frame_index, (detection, time_s) in enumerate(detections, start):
+                writer.append(frame_index, detection, time_s)
+                if time.monotonic() >= next_progress_s:
+                    next_progress_s += BatchParams.PROGRESS_INTERVAL_S
+                    print(f'[{datetime.datetime.now()}][batch_detect] frame {frame_index}, '
+                          f'{(frame_index + 1 - start) / (time.monotonic() - start_s):.1f} frames/s')
+        except KeyboardInterrupt:
+            print(f'[{datetime.datetime.now()}][batch_detect] interrupted, run again to resume at frame {writer.next_frame}')
+        finally:
+            detections.close()
+            frames.close()
+            if detector_pool is not None:
+                detector_pool.close()
+            if pool is not None:
+                pool.close()
+
+        elapsed_s = time.monotonic() - start_s
+        print(f'[{datetime.datetime.now()}][batch_detect] {writer.next_frame - start} frames processed in {elapsed_s:.1f}s, '
+              f'{writer.frames} frames in {output}')
+
+
+if __name__ == '__main__':
+    main()
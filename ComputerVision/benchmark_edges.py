@@ -0,0 +1,55 @@
+import argparse
+import time
+
+import numpy as np
+
+from typing import *
+
+from edge_detection import EdgeBackend, EdgeDetector
+from lane_detector import LaneDetector, LaneDetectorParams
+from synthetic_road import make_road_frames
+
+
+def make_blurred_frames(n_frames: int, width: int) -> List[np.ndarray]:
+    """Runs the lane pipeline on synthetic frames and keeps the blurred bird's eye views the edges are detected on."""
+    blurred = []
+    detector = LaneDetector(width=width, debug_view=lambda stage, image: blurred.append(image.copy()) if stage == 'blurred' else None)
+    for frame in make_road_frames(n_frames, width, width * 9 // 16):
+        detector.detect(frame)
+    return blurred
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the edge detection backends of the lane pipeline.')
+    parser.add_argument('--widths', default='480,1280,1920', help='comma separated working widths')
+    parser.add_argument('--frames', type=int, default=30, help='number of synthetic frames per width')
+    parser.add_argument('--threshold', type=int, default=LaneDetectorParams.THRESHOLD, help='edge threshold')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is kept')
+    args = parser.parse_args()
+
+    print(f'{"width":>6} {"backend":<8} {"us/frame":>10} {"speedup":>8} {"edges":>8} {"differ":>8}')
+    for width in (int(width) for width in args.widths.split(',')):
+        frames = make_blurred_frames(args.frames, width)
+        reference = [EdgeDetector(args.threshold, EdgeBackend.EXACT).detect(frame).copy() for frame in frames]
+
+        exact_us = None
+        for backend in EdgeBackend.ALL:
+            detector = EdgeDetector(args.threshold, backend)
+            out = np.empty_like(frames[0])
+            best_s = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for frame in frames:
+                    detector.detect(frame, dst=out)
+                best_s = min(best_s, (time.perf_counter() - start) / len(frames))
+            us = best_s * 1e6
+            exact_us = exact_us or us
+
+            edges = [detector.detect(frame).copy() for frame in frames]
+            n_edges = np.mean([np.count_nonzero(binary) for binary in edges])
+            n_differ = np.mean([np.count_nonzero(binary != expected) for binary, expected in zip(edges, reference)])
+            print(f'{width:>6} {backend:<8} {us:>10.1f} {exact_us / us:>7.1f}x {n_edges:>8.0f} {n_differ:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from typing import *
+
+import object_socket
+from frame_codecs import FRAME_CODECS, FrameCodec
+from synthetic_road import make_road_frames
+
+
+def load_frames(video_path: Optional[str], n_frames: int, width: int) -> List[np.ndarray]:
+    """Reads the first n_frames of the video (resized to width), or generates synthetic frames if no video is given."""
+    if video_path is None:
+        return list(make_road_frames(n_frames, width, width * 9 // 16))
+
+    video = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = video.read()
+        if not ret:
+            break
+        ratio = frame.shape[0] / frame.shape[1]
+        frames.append(cv2.resize(frame, (width, int(width * ratio))))
+    video.release()
+    return frames
+
+
+def measure_codec(codec: FrameCodec, frames: List[np.ndarray]) -> Dict[str, float]:
+    """Measures the average payload size and the average encode/decode time of a codec."""
+    sizes, encode_s, decode_s = [], [], []
+    for frame in frames:
+        start = time.perf_counter()
+        payload = codec.encode(frame)
+        encode_s.append(time.perf_counter() - start)
+        sizes.append(memoryview(payload).nbytes)
+
+        start = time.perf_counter()
+        codec.decode(memoryview(payload), frame.dtype, frame.shape)
+        decode_s.append(time.perf_counter() - start)
+    return {'bytes_per_frame': float(np.mean(sizes)),
+            'encode_ms': float(np.mean(encode_s)) * 1000,
+            'decode_ms': float(np.mean(decode_s)) * 1000}
+
+
+def measure_end_to_end_fps(codec: FrameCodec, frames: List[np.ndarray], port: int) -> float:
+    """Sends all the frames through a sender/receiver pair on the loopback interface and returns the fps."""
+    def send():
+        sender = object_socket.ObjectSenderSocket('127.0.0.1', port, frame_codec=codec)
+        for frame in frames:
+            sender.send_array(frame)
+        sender.send_array(None)
+        sender.close()
+
+    sender_thread = threading.Thread(target=send)
+    sender_thread.start()
+    time.sleep(0.1)
+    receiver = object_socket.ObjectReceiverSocket('127.0.0.1', port)
+
+    start = time.perf_counter()
+    n_received = 0
+    while receiver.recv_array() is not None:
+        n_received += 1
+    elapsed_s = time.perf_counter() - start
+
+    receiver.close()
+    sender_thread.join()
+    return n_received / elapsed_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the frame codecs of object_socket.')
+    parser.add_argument('--video', help='video to read the frames from (synthetic frames if missing)')
+    parser.add_argument('--frames', type=int, default=60, help='number of frames per codec')
+    parser.add_argument('--width', type=int, default=1280, help='width the frames are resized to')
+    parser.add_argument('--port', type=int, default=5100, help='first port used for the end to end runs')
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.width)
+    print(f'{len(frames)} frames of shape {frames[0].shape}')
+    print(f'{"codec":<6} {"KiB/frame":>10} {"ratio":>7} {"encode ms":>10} {"decode ms":>10} {"e2e fps":>9}')
+    for i, codec in enumerate(FRAME_CODECS.values()):
+        stats = measure_codec(codec, frames)
+        fps = measure_end_to_end_fps(codec, frames, args.port + i)
+        print(f'{codec.name:<6} {stats["bytes_per_frame"] / 1024:>10.1f} {frames[0].nbytes / stats["bytes_per_frame"]:>7.1f} '
+              f'{stats["encode_ms"]:>10.2f} {stats["decode_ms"]:>10.2f} {fps:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
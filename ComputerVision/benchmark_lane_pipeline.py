@@ -0,0 +1,215 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from typing import *
+
+from edge_detection import EdgeBackend
+from lane_detector import LaneDetection, LaneDetector, LaneDetectorParams, extract_points
+from lane_geometry import get_lane_geometry
+from lane_tracking import TrackingLaneDetector
+from line_fitting import LineFitter
+from synthetic_road import make_road_frames
+from video_decode_pool import read_frames
+
+
+Stage = Tuple[str, Callable, Tuple[str, ...], str]  # name, function, names of its inputs, name of its output
+
+
+def make_stages(detector: LaneDetector, frame_shape: Tuple[int, ...]) -> List[Stage]:
+    """Returns the stages of LaneDetector.detect() followed by draw_overlay(), one function per stage.
+
+    Every stage writes into its own preallocated buffer like the detector does, so the timings are those
+    of the steady state. The Sobel stage computes the squared magnitude and the threshold stage compares it,
+    as the SQUARED backend of EdgeDetector does, then clears the margins: the detector must use that backend
+    and no opening.
+    """
+    assert detector.edge_backend == EdgeBackend.SQUARED and not detector.opening_ksize
+    height, width = detector.working_shape(frame_shape)[:2]
+    geometry = get_lane_geometry(height, width, detector.roi)
+    roi_shape = (height - geometry.roi_top, width)
+    fitter = LineFitter(detector.fit_method, detector.max_fit_points)
+    squared_threshold = detector.threshold * (detector.threshold + 1)
+    margin = int(width * detector.side_margin)
+    bottom = height - int(height * detector.bottom_margin)
+    half = width // 2
+    resized = np.empty((height, width, 3), np.uint8)
+    gray = np.empty(roi_shape, np.uint8)
+    road = np.empty(roi_shape, np.uint8)
+    top_down = np.empty((height, width), np.uint8)
+    blurred = np.empty((height, width), np.uint8)
+    gx = np.empty((height, width), np.float32)
+    gy = np.empty((height, width), np.float32)
+    squared = np.empty((height, width), np.float32)
+    binary = np.empty((height, width), np.uint8)
+    overlay = np.empty((height, width, 3), np.uint8)
+
+    def resize(frame: np.ndarray) -> np.ndarray:
+        return cv2.resize(frame, (width, height), dst=resized) if frame.shape[:2] != (height, width) else frame
+
+    def to_gray(frame: np.ndarray) -> np.ndarray:
+        return cv2.cvtColor(frame[geometry.roi_top:], cv2.COLOR_BGR2GRAY, dst=gray)
+
+    def mask(image: np.ndarray) -> np.ndarray:
+        return cv2.multiply(image, geometry.roi_mask, dst=road)
+
+    def warp(image: np.ndarray) -> np.ndarray:
+        return geometry.warp_roi(image, dst=top_down)
+
+    def blur(image: np.ndarray) -> np.ndarray:
+        return cv2.blur(image, LaneDetectorParams.BLUR_KSIZE, dst=blurred)
+
+    def sobel(image: np.ndarray) -> np.ndarray:
+        cv2.Sobel(image, cv2.CV_32F, 1, 0, dst=gx)
+        cv2.Sobel(image, cv2.CV_32F, 0, 1, dst=gy)
+        cv2.multiply(gx, gx, dst=squared)
+        return cv2.accumulateSquare(gy, squared)
+
+    def threshold(magnitude: np.ndarray) -> np.ndarray:
+        cv2.compare(magnitude, squared_threshold, cv2.CMP_GT, dst=binary)
+        binary[:, :margin] = 0
+        binary[:, width - margin:] = 0
+        binary[bottom:, :] = 0
+        return binary
+
+    def extract(image: np.ndarray) -> Tuple[Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+        return extract_points(image[:, :half]), extract_points(image[:, half:], half)
+
+    def fit(points: Tuple[Tuple[np.ndarray, np.ndarray], ...]) -> Tuple[Optional[np.ndarray], ...]:
+        return tuple(fitter.fit(xs, ys) if len(ys) >= LaneDetectorParams.MIN_POINTS else None for xs, ys in points)
+
+    def draw(frame: np.ndarray, lines: Tuple[Optional[np.ndarray], ...]) -> np.ndarray:
+        detection = LaneDetection(frame, lines[0], lines[1], lines[0] is not None, lines[1] is not None, 0, 0)
+        return detector.draw_overlay(detection, dst=overlay)
+
+    return [('resize', resize, ('frame',), 'resized'),
+            ('gray', to_gray, ('resized',), 'gray'),
+            ('mask', mask, ('gray',), 'road'),
+            ('warp', warp, ('road',), 'top_down'),
+            ('blur', blur, ('top_down',), 'blurred'),
+            ('sobel', sobel, ('blurred',), 'magnitude'),
+            ('threshold', threshold, ('magnitude',), 'binary'),
+            ('extract', extract, ('binary',), 'points'),
+            ('fit', fit, ('points',), 'lines'),
+            ('overlay', draw, ('resized', 'lines'), 'overlay')]
+
+
+def run_stages(stages: List[Stage], frames: List[np.ndarray]) -> List[Dict[str, Any]]:
+    """Runs the stages on every frame and keeps a copy of every intermediate result, the inputs of the timed stages."""
+    values = []
+    for frame in frames:
+        frame_values = {'frame': frame}
+        for _, function, inputs, output in stages:
+            result = function(*(frame_values[name] for name in inputs))
+            frame_values[output] = _copy(result)
+        values.append(frame_values)
+    return values
+
+
+def time_per_frame_ns(function: Callable, inputs: List[tuple], repeat: int) -> float:
+    """Returns the best average time of a function over the inputs, in nanoseconds."""
+    best_ns = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for args in inputs:
+            function(*args)
+        best_ns = min(best_ns, (time.perf_counter_ns() - start) / len(inputs))
+    return best_ns
+
+
+def benchmark_frames(name: str, frames: List[np.ndarray], detector_kwargs: Dict[str, Any], repeat: int) -> List[Dict[str, Any]]:
+    """Times every stage in isolation, then detect() end to end, on the frames of one input."""
+    detector = LaneDetector(**detector_kwargs)
+    stages = make_stages(detector, frames[0].shape)
+    values = run_stages(stages, frames)
+    for frame, frame_values in zip(frames, values):  # the isolated stages must compute what detect() computes
+        detection = detector.fit(frame)
+        for line, expected in zip(frame_values['lines'], (detection.left, detection.right)):
+            assert (line is None) == (expected is None) and (line is None or np.allclose(line, expected))
+
+    height, width = values[0]['resized'].shape[:2]
+    results = []
+    for stage, function, inputs, _ in stages:
+        ns = time_per_frame_ns(function, [tuple(frame_values[name] for name in inputs) for frame_values in values], repeat)
+        results.append(dict(input=name, working_shape=[height, width], stage=stage, ns_per_frame=ns, fps=1e9 / ns))
+    stages_ns = sum(result['ns_per_frame'] for result in results)
+    results.append(dict(input=name, working_shape=[height, width], stage='sum_of_stages', ns_per_frame=stages_ns, fps=1e9 / stages_ns))
+
+    tracker = TrackingLaneDetector(**detector_kwargs)
+    overlay = []
+
+    def detect_and_draw(frame: np.ndarray):
+        overlay[:] = [detector.draw_overlay(detector.detect(frame), dst=overlay[0] if overlay else None)]
+
+    for stage, function in (('end_to_end', detector.detect), ('end_to_end_overlay', detect_and_draw),
+                            ('end_to_end_tracking', tracker.detect)):
+        function(frames[0])  # allocates the buffers
+        ns = time_per_frame_ns(function, [(frame,) for frame in frames], repeat)
+        results.append(dict(input=name, working_shape=[height, width], stage=stage, ns_per_frame=ns, fps=1e9 / ns))
+    return results
+
+
+def _copy(value: Any) -> Any:
+    # the stages write into buffers reused for the next frame
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times every stage of the lane pipeline in isolation and end to end, '
+                                                 'and saves the results as JSON to compare runs.')
+    parser.add_argument('--resolutions', default='640x360,1280x720,1920x1080', help='comma separated resolutions of the synthetic frames')
+    parser.add_argument('--video', default=None, help='benchmark the first frames of this video file instead of synthetic frames')
+    parser.add_argument('--width', type=int, default=LaneDetectorParams.WIDTH, help='working width, 0 for the full resolution')
+    parser.add_argument('--frames', type=int, default=30, help='number of frames per input')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs, the best one is kept')
+    parser.add_argument('--output', default='benchmark_lane_pipeline.json', help='JSON file the results are written to')
+    parser.add_argument('--compare', default=None, help='JSON file of a previous run to compare with')
+    args = parser.parse_args()
+
+    detector_kwargs = dict(width=args.width or None, edge_backend=EdgeBackend.SQUARED)
+    if args.video is not None:
+        inputs = [(os.path.basename(args.video), list(read_frames(args.video, 0, args.frames)))]
+    else:
+        inputs = []
+        for resolution in args.resolutions.split(','):
+            width, height = (int(size) for size in resolution.split('x'))
+            inputs.append((resolution, list(make_road_frames(args.frames, width, height))))
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare) as file:
+            previous = {(result['input'], tuple(result['working_shape']), result['stage']): result['ns_per_frame']
+                        for result in json.load(file)['results']}
+
+    results = []
+    print(f'{"input":<12} {"working":>9} {"stage":<20} {"ns/frame":>12} {"fps":>10}' + (f' {"vs previous":>12}' if previous else ''))
+    for name, frames in inputs:
+        for result in benchmark_frames(name, frames, detector_kwargs, args.repeat):
+            results.append(result)
+            line = (f'{name:<12} {"x".join(map(str, result["working_shape"][::-1])):>9} {result["stage"]:<20} '
+                    f'{result["ns_per_frame"]:>12.0f} {result["fps"]:>10.1f}')
+            previous_ns = previous.get((name, tuple(result['working_shape']), result['stage']))
+            if previous_ns:
+                line += f' {previous_ns / result["ns_per_frame"]:>11.2f}x'
+            print(line)
+
+    report = dict(created=datetime.datetime.now().isoformat(), args=vars(args), python=platform.python_version(),
+                  numpy=np.__version__, opencv=cv2.__version__, opencv_threads=cv2.getNumThreads(),
+                  cpus=os.cpu_count(), machine=platform.machine(), results=results)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import numpy as np
+
+from typing import *
+
+from line_fitting import FitMethod, LineFitter
+
+
+def make_marking_points(n_points: int, outlier_fraction: float, height: int, width: int,
+                        rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Draws the pixels of a lane marking of known line, plus outliers spread over the half frame.
+
+    The marking is denser at the bottom (close to the camera), like in the bird's eye view, and a few pixels
+    wide. Returns the int32 x and y coordinates in row major order, like extract_points(), and the true line.
+    """
+    line = np.array([rng.uniform(0.2, 0.3) * width, rng.uniform(-0.3, 0.3)])
+    n_outliers = int(n_points * outlier_fraction)
+    ys = (height * np.sqrt(rng.random(n_points - n_outliers))).astype(np.int32)  # density growing towards the bottom
+    xs = np.rint(line[0] + line[1] * ys + rng.normal(0, 1.5, len(ys))).astype(np.int32)
+    outlier_ys = rng.integers(0, height, n_outliers, dtype=np.int32)
+    outlier_xs = rng.integers(0, width // 2, n_outliers, dtype=np.int32)
+    ys = np.concatenate([ys, outlier_ys])
+    xs = np.concatenate([xs, outlier_xs])
+    order = np.lexsort((xs, ys))
+    return xs[order], ys[order], line
+
+
+def fit_polyfit(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """The original fit of the lane pipeline."""
+    return np.polynomial.polynomial.polyfit(ys, xs, deg=1)
+
+
+def line_error_px(line: np.ndarray, truth: np.ndarray, height: int) -> float:
+    """Returns the largest horizontal distance between two lines over the rows of the frame."""
+    return float(max(abs((line[0] - truth[0]) + (line[1] - truth[1]) * y) for y in (0, height - 1)))
+
+
+def time_per_fit_us(function: Callable, inputs: List[tuple], repeat: int) -> float:
+    """Returns the best average time of a function over the inputs, in microseconds."""
+    best_s = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in inputs:
+            function(*args)
+        best_s = min(best_s, (time.perf_counter() - start) / len(inputs))
+    return best_s * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the line fits of the lane pipeline with np.polynomial.polynomial.polyfit.')
+    parser.add_argument('--points', default='500,5000,50000', help='comma separated numbers of pixels per marking')
+    parser.add_argument('--outliers', default='0,0.2', help='comma separated fractions of the pixels off the marking')
+    parser.add_argument('--fits', type=int, default=50, help='number of markings per configuration')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is kept')
+    parser.add_argument('--max-points', type=int, default=512, help='the subsample size of the subsampled variants')
+    args = parser.parse_args()
+
+    height, width = 270, 480
+    variants = (('polyfit', fit_polyfit),
+                ('least_squares', LineFitter(FitMethod.LEAST_SQUARES).fit),
+                ('ls_subsampled', LineFitter(FitMethod.LEAST_SQUARES, args.max_points).fit),
+                ('ransac', LineFitter(FitMethod.RANSAC).fit),
+                ('ransac_subsampled', LineFitter(FitMethod.RANSAC, args.max_points).fit))
+
+    print(f'{"points":>7} {"outliers":>8} {"variant":<18} {"us/fit":>9} {"speedup":>8} {"mean err px":>12} {"max err px":>11}')
+    rng = np.random.default_rng(0)
+    for n_points in (int(n) for n in args.points.split(',')):
+        for outlier_fraction in (float(fraction) for fraction in args.outliers.split(',')):
+            markings = [make_marking_points(n_points, outlier_fraction, height, width, rng) for _ in range(args.fits)]
+            inputs = [(xs, ys) for xs, ys, _ in markings]
+            baseline_us = None
+            for name, function in variants:
+                errors = [line_error_px(function(xs, ys), truth, height) for xs, ys, truth in markings]
+                us = time_per_fit_us(function, inputs, args.repeat)
+                baseline_us = baseline_us or us
+                print(f'{n_points:>7} {outlier_fraction:>8.2f} {name:<18} {us:>9.1f} {baseline_us / us:>7.1f}x '
+                      f'{np.mean(errors):>12.2f} {np.max(errors):>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from typing import *
+
+from lane_detector import LaneDetector, extract_points
+from lane_geometry import get_lane_geometry
+from synthetic_road import make_road_frames
+
+
+def make_binary_frames(n_frames: int, width: int) -> List[np.ndarray]:
+    """Runs the lane pipeline on synthetic frames and keeps the binary bird's eye views the points are extracted from."""
+    binaries = []
+    detector = LaneDetector(width=width, debug_view=lambda stage, image: binaries.append(image.copy()) if stage == 'markings' else None)
+    for frame in make_road_frames(n_frames, width, width * 9 // 16):
+        detector.detect(frame)
+    return binaries
+
+
+def make_line_masks(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws the two fitted lines on blank bird's eye views and warps them back, like the overlay of consumer.py did."""
+    height, width = binary.shape
+    geometry = get_lane_geometry(height, width, LaneDetector().roi)
+    masks = []
+    for x in (width // 4, width * 3 // 4):
+        blank = np.zeros((height, width), dtype=np.uint8)
+        cv2.line(blank, (x, 0), (x, height - 1), 255, 3)
+        masks.append(cv2.warpPerspective(blank, geometry.inverse_homography, (width, height)))
+    return masks[0], masks[1]
+
+
+def extract_loop(binary: np.ndarray) -> Tuple[List[int], List[int]]:
+    """The original per point extraction of consumer.py."""
+    xs, ys = [], []
+    for point in np.argwhere(binary > 1):
+        xs.append(point[1])
+        ys.append(point[0])
+    return xs, ys
+
+
+def extract_argwhere(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Column slicing of the np.argwhere() result."""
+    points = np.argwhere(binary > 1)
+    return points[:, 1], points[:, 0]
+
+
+def extract_nonzero(binary: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """np.nonzero(), which gives the two coordinate arrays directly."""
+    ys, xs = np.nonzero(binary)
+    return xs, ys
+
+
+def overlay_loop(frame: np.ndarray, left_mask: np.ndarray, right_mask: np.ndarray) -> np.ndarray:
+    """The original per pixel overlay of consumer.py."""
+    colored = frame.copy()
+    for y, x in np.argwhere(left_mask > 1):
+        colored[y, x] = [0, 0, 255]
+    for y, x in np.argwhere(right_mask > 1):
+        colored[y, x] = [255, 0, 0]
+    return colored
+
+
+def overlay_masked(frame: np.ndarray, left_mask: np.ndarray, right_mask: np.ndarray) -> np.ndarray:
+    """Boolean mask assignment."""
+    colored = frame.copy()
+    colored[left_mask > 1] = [0, 0, 255]
+    colored[right_mask > 1] = [255, 0, 0]
+    return colored
+
+
+def time_per_frame_us(function: Callable, inputs: List[tuple], repeat: int) -> float:
+    """Returns the best average time of a function over the inputs, in microseconds."""
+    best_s = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in inputs:
+            function(*args)
+        best_s = min(best_s, (time.perf_counter() - start) / len(inputs))
+    return best_s * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the point extraction and overlay drawing of the lane pipeline.')
+    parser.add_argument('--widths', default='480,1280', help='comma separated working widths')
+    parser.add_argument('--frames', type=int, default=30, help='number of synthetic frames per width')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is kept')
+    args = parser.parse_args()
+
+    print(f'{"width":>6} {"stage":<8} {"variant":<12} {"points":>8} {"us/frame":>10} {"speedup":>8}')
+    for width in (int(width) for width in args.widths.split(',')):
+        binaries = make_binary_frames(args.frames, width)
+        frames = [frame for frame in make_road_frames(args.frames, width, width * 9 // 16)]
+        overlays = [(frame, *make_line_masks(binary)) for frame, binary in zip(frames, binaries)]
+
+        for binary in binaries:  # every variant must find the same points in the same order
+            for xs, ys in (extract_argwhere(binary), extract_nonzero(binary), extract_points(binary)):
+                assert np.array_equal(np.asarray(extract_loop(binary)), np.stack([xs, ys]))
+        for inputs in overlays:
+            assert np.array_equal(overlay_loop(*inputs), overlay_masked(*inputs))
+
+        n_points = np.mean([np.count_nonzero(binary) for binary in binaries])
+        n_pixels = np.mean([np.count_nonzero(left) + np.count_nonzero(right) for _, left, right in overlays])
+        for stage, variants, inputs, n in (
+                ('extract', (('loop', extract_loop), ('argwhere', extract_argwhere), ('nonzero', extract_nonzero), ('findnonzero', extract_points)),
+                 [(binary,) for binary in binaries], n_points),
+                ('overlay', (('loop', overlay_loop), ('mask', overlay_masked)), overlays, n_pixels)):
+            baseline_us = None
+            for name, function in variants:
+                us = time_per_frame_us(function, inputs, args.repeat)
+                baseline_us = baseline_us or us
+                print(f'{width:>6} {stage:<8} {name:<12} {n:>8.0f} {us:>10.1f} {baseline_us / us:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
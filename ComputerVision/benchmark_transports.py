@@ -0,0 +1,105 @@
+import argparse
+import math
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from typing import *
+
+import object_socket
+from shm_socket import SharedMemorySenderSocket, SharedMemoryReceiverSocket
+
+
+TRANSPORTS = ('tcp', 'unix', 'socketpair', 'shm')
+
+
+def parse_sizes(sizes: str) -> List[Tuple[int, int]]:
+    """Parses a comma separated list of WIDTHxHEIGHT frame sizes."""
+    return [tuple(int(value) for value in size.split('x')) for size in sizes.split(',')]
+
+
+def endpoint_for(transport: str, port: int) -> str:
+    """Returns the endpoint a transport listens on (the shared memory transport sends its control messages over unix sockets when available)."""
+    if transport == 'tcp' or not hasattr(socket, 'AF_UNIX'):
+        return f'tcp://127.0.0.1:{port}'
+    return 'unix://' + os.path.join(tempfile.gettempdir(), f'object_socket_benchmark_{transport}.sock')
+
+
+def send_all(sender: Any, frames: List[np.ndarray]):
+    """Sends the frames, then the end of stream marker, and closes the sender."""
+    for frame in frames:
+        sender.send_array(frame)
+    sender.send_array(None)
+    sender.close()
+
+
+def measure_transport(transport: str, frames: List[np.ndarray], port: int) -> Dict[str, float]:
+    """Sends all the frames from a thread to the main thread through the transport, returns the throughput and latency."""
+    if transport == 'socketpair':
+        sender, receiver = object_socket.object_socket_pair()
+        sender_thread = threading.Thread(target=send_all, args=(sender, frames))
+        sender_thread.start()
+    else:
+        endpoint = endpoint_for(transport, port)
+
+        def send():
+            if transport == 'shm':
+                sender = SharedMemorySenderSocket(endpoint, slot_size_bytes=frames[0].nbytes)
+            else:
+                sender = object_socket.ObjectSenderSocket(endpoint)
+            send_all(sender, frames)
+
+        sender_thread = threading.Thread(target=send)
+        sender_thread.start()
+        time.sleep(0.1)
+        if transport == 'shm':
+            receiver = SharedMemoryReceiverSocket(endpoint)
+        else:
+            receiver = object_socket.ObjectReceiverSocket(endpoint)
+    metrics = receiver.socket.metrics if transport == 'shm' else receiver.metrics
+
+    start = time.perf_counter()
+    n_received = 0
+    while receiver.recv_array() is not None:
+        n_received += 1
+    elapsed_s = time.perf_counter() - start
+
+    latencies_ms = metrics.latency_percentiles_ms()
+    receiver.close()
+    sender_thread.join()
+    return {'fps': n_received / elapsed_s,
+            'mb_per_s': n_received * frames[0].nbytes / elapsed_s / 1e6,
+            'latency_p50_ms': latencies_ms.get(50, math.nan),
+            'latency_p99_ms': latencies_ms.get(99, math.nan)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the transports of object_socket on the same host.')
+    parser.add_argument('--sizes', default='16x16,320x240,1280x720,1920x1080',
+                        help='comma separated WIDTHxHEIGHT sizes of the BGR frames')
+    parser.add_argument('--frames', type=int, default=200, help='number of frames per transport and size')
+    parser.add_argument('--transports', default=','.join(TRANSPORTS), help='comma separated transports to compare')
+    parser.add_argument('--port', type=int, default=5200, help='first port used by the tcp runs')
+    args = parser.parse_args()
+
+    transports = args.transports.split(',')
+    if not hasattr(socket, 'AF_UNIX') and 'unix' in transports:
+        print('unix domain sockets are not available on this platform, skipping the unix transport')
+        transports.remove('unix')
+
+    rng = np.random.default_rng(0)
+    print(f'{"size":>10} {"transport":<11} {"fps":>10} {"MB/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for i, (width, height) in enumerate(parse_sizes(args.sizes)):
+        frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8)] * args.frames
+        for j, transport in enumerate(transports):
+            stats = measure_transport(transport, frames, args.port + i * len(transports) + j)
+            print(f'{f"{width}x{height}":>10} {transport:<11} {stats["fps"]:>10.1f} {stats["mb_per_s"]:>9.1f} '
+                  f'{stats["latency_p50_ms"]:>8.3f} {stats["latency_p99_ms"]:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
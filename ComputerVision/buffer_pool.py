@@ -0,0 +1,79 @@
+import numpy as np
+
+from typing import *
+
+
+class BufferPool:
+    """Named, reusable arrays for the stages of a frame pipeline.
+
+    Every stage asks for its output buffer by name and writes into it through the dst= parameter of OpenCV
+    (or out= of NumPy). A buffer is only allocated the first time its name is requested, or when a bigger one or
+    another dtype is requested: smaller shapes are contiguous views of the start of the same memory, so stages
+    working on crops of varying size do not allocate either, and a pipeline processing frames of a constant size
+    does no large allocation in steady state. The allocation counters make regressions visible: frame_allocations
+    must stay at 0 after the first frame.
+
+    Attributes:
+        allocations: int -- The total number of buffers allocated.
+        allocated_bytes: int -- The total size of the buffers allocated.
+        frame_allocations: int -- The number of buffers allocated since the last begin_frame().
+        frames: int -- The number of calls to begin_frame().
+
+    Methods:
+        get(name: str, shape: Tuple[int, ...], dtype: Any = np.uint8) -> np.ndarray -- Returns the buffer of a stage.
+        begin_frame() -- Resets frame_allocations, to be called before the stages of every frame.
+        nbytes() -> int -- Returns the size of the buffers currently held.
+        clear() -- Releases all the buffers.
+    """
+    allocations: int
+    allocated_bytes: int
+    frame_allocations: int
+    frames: int
+
+    def __init__(self):
+        """Initializes an empty BufferPool."""
+        self._buffers = {}
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.frame_allocations = 0
+        self.frames = 0
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype: Any = np.uint8) -> np.ndarray:
+        """Returns the buffer of a stage, allocated if it does not exist yet with this dtype and at least this size.
+
+        The content of the buffer is whatever the previous frame left in it.
+
+        Args:
+            name: str -- The name of the stage.
+            shape: Tuple[int, ...] -- The shape of the buffer.
+            dtype = np.uint8: Any -- The dtype of the buffer.
+
+        Returns:
+            np.ndarray -- The buffer.
+        """
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+            self.frame_allocations += 1
+        return buffer[:size].reshape(shape)
+
+    def begin_frame(self):
+        """Resets frame_allocations, to be called before the stages of every frame."""
+        self.frame_allocations = 0
+        self.frames += 1
+
+    def nbytes(self) -> int:
+        """Returns the size of the buffers currently held.
+
+        Returns:
+            int -- The number of bytes.
+        """
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        """Releases all the buffers, they are allocated again when next requested."""
+        self._buffers.clear()
@@ -1,196 +1,127 @@
+import argparse
+
 import cv2
 import numpy as np
-import object_socket as s
 
-def main() -> None:
-    src = s.ObjectReceiverSocket('127.0.0.1', 5000, print_when_connecting_to_sender=True, print_when_receiving_object=True)
+from typing import *
 
-    bar_width = 30
+import object_socket as s
+from adaptive_resolution import AdaptiveLaneDetector
+from edge_detection import EdgeBackend, EdgeParams
+from lane_detector import LaneDetector, WindowDebugView
+from lane_tracking import TrackingLaneDetector
+from line_fitting import FitMethod, FitParams
+from parallel_lane_detector import ParallelLaneDetector
+from stream_multiplexer import StreamMultiplexer
 
-    left_top = (int(0), int(0))
-    left_bottom = (int(0), int(0))
-    right_top = (int(0), int(0))
-    right_bottom = (int(0), int(0))
 
+def receive_frames(src: s.ObjectReceiverSocket) -> Iterator[np.ndarray]:
+    """Yields the frames received until the end of the video."""
     while True:
-        ret, original_frame = src.recv_object()
-
-        if not ret:
-            print('Video ended')
-            break
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-        # cv2.imshow('Original', original_frame)
-        # cv2.moveWindow('Original', 0, 0)
-
-        # Exercise 2
-        ratio = original_frame.shape[0] / original_frame.shape[1]
-        width = 480
-        resized_frame = cv2.resize(original_frame, (int(width), int(width * ratio)))
-
-        cv2.imshow('Resized', resized_frame)
-        cv2.moveWindow('Resized', 0, 0)
-
-        # Exercise 3
-        grayscale_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
-        cv2.imshow('Grayscale', grayscale_frame)
-        cv2.moveWindow('Grayscale', width, 0)
-
-        # Exercise 4
-        width = grayscale_frame.shape[1]
-        height = grayscale_frame.shape[0]
-        upper_left = (int(width * 0.42), int(height * 0.77))
-        upper_right = (int(width * 0.6), int(height * 0.77))
-        lower_left = (int(0), int(height - 1))
-        lower_right = (int(width - 1), int(height - 1))
-
-        trapezoid_points = np.array([upper_left, upper_right, lower_right, lower_left], dtype='int32')
-
-        trapezoid_frame = np.zeros((height, width), dtype='uint8')
-        cv2.fillConvexPoly(trapezoid_frame, points=trapezoid_points, color=1)
-        trapezoid_frame *= grayscale_frame
-
-        cv2.imshow('Trapezoid', trapezoid_frame)
-        cv2.moveWindow('Trapezoid', width * 2, 0)
-
-        # Exercise 5
-        screen_points = np.array([(0, 0), (width - 1, 0), (width - 1, height - 1), (0, height - 1)], dtype='float32')
-        magical_matrix = cv2.getPerspectiveTransform(np.float32(trapezoid_points), screen_points)
-
-        stretched_trapezoid_frame = cv2.warpPerspective(trapezoid_frame, magical_matrix, (width, height))
-
-        cv2.imshow('Stretched Trapezoid', stretched_trapezoid_frame)
-        cv2.moveWindow('Stretched Trapezoid', 0, int(width * ratio) + bar_width)
-
-        # Exercise 6
-        blured_frame = cv2.blur(stretched_trapezoid_frame, ksize=(3, 3))
-
-        cv2.imshow('Blurred', blured_frame)
-        cv2.moveWindow('Blurred', width, int(width * ratio) + bar_width)
-
-        # Exercise 7
-        sobel_vertical = np.float32([
-            [-1, -2, -1],
-            [ 0,  0,  0],
-            [ 1,  2,  1]
-        ])
-
-        sobel_horizontal = np.transpose(sobel_vertical)
+        frame = src.recv_array()
+        if frame is None:
+            return
+        yield frame
 
-        frame_f = np.float32(blured_frame)
-
-        frame_1 = cv2.filter2D(frame_f, -1, sobel_vertical)
-        frame_2 = cv2.filter2D(frame_f, -1, sobel_horizontal)
 
-        combined = np.sqrt(frame_1 * frame_1 + frame_2 * frame_2)
-
-        sobel_frame = cv2.convertScaleAbs(combined)
-
-        cv2.imshow('Sobel', sobel_frame)
-        cv2.moveWindow('Sobel', width * 2, int(width * ratio) + bar_width)
-
-        # Exercise 8
-        threshold = int(120)
-
-        binary_frame = np.array(sobel_frame > threshold, dtype='uint8')
-        binary_frame *= 255
-        cv2.imshow('Binary', binary_frame)
-        cv2.moveWindow('Binary', 0, int(width * ratio * 2) + bar_width * 2)
-
-        # Exercise 9
-        # Remove the noise
-        no_noise_frame = binary_frame.copy()
-        margin = int(width * 0.08)
-        no_noise_frame[0:height, 0:margin] = 0
-        no_noise_frame[0:height, (width - margin): width] = 0
-        no_noise_frame[height - int(0.03*height):height, 0:width] = 0
-        cv2.imshow('No Noise', no_noise_frame)
-        cv2.moveWindow('No Noise', width, int(width * ratio * 2) + bar_width * 2)
-
-        # Find the coordinates of the white points
-        left_xs = []
-        left_ys = []
-        right_xs = []
-        right_ys = []
-
-        half = int(width // 2)
-        first_half = no_noise_frame[0:height, 0:half]
-        second_half = no_noise_frame[0:height, half:width]
-        cv2.imshow('First Half', first_half)
-        cv2.imshow('Second Half', second_half)
-
-        left_points = np.argwhere(first_half > 1) # stores the matrix coordinates of the white pixels
-        right_points = np.argwhere(second_half > 1) # stores the matrix coordinates of the white pixels
-
-        # since argwhere returns the coordinates reversed, this corrects that:
-        for point in left_points:
-            left_xs.append(point[1])
-            left_ys.append(point[0])
-        for point in right_points:
-            right_xs.append(point[1] + half)
-            right_ys.append(point[0])
-
-        # Exercise 10
-        lined_frame = binary_frame.copy()
-        # draw the middle line
-        cv2.line(lined_frame, (half, 0), (half, height), (100, 0, 0), 2)
-
-        # find the line that best fits the left and right points
-        b_left, a_left = np.polynomial.polynomial.polyfit(left_xs, left_ys, deg=1)
-        b_right, a_right = np.polynomial.polynomial.polyfit(right_xs, right_ys, deg=1)
-
-        left_top_y = int(0)
-        left_top_x = int((left_top_y - b_left) / a_left)
-
-        left_bottom_y = int(height - 1)
-        left_bottom_x = int((left_bottom_y - b_left) / a_left)
-
-        right_top_y = int(0)
-        right_top_x = int((right_top_y - b_right) / a_right)
-
-        right_bottom_y = int(height - 1)
-        right_bottom_x = int((right_bottom_y - b_right) / a_right)
-        
-        if np.abs(left_top_x) < 10 ** 8 and np.abs(left_bottom_x) < 10 ** 8:
-            left_top = (left_top_x, left_top_y)
-            left_bottom = (left_bottom_x, left_bottom_y)
-
-        if np.abs(right_top_x) < 10 ** 8 and np.abs(right_bottom_x) < 10 ** 8:
-            right_top = (right_top_x, right_top_y)
-            right_bottom = (right_bottom_x, right_bottom_y)
-
-        # Draw the lines
-        cv2.line(lined_frame, left_top, left_bottom, (200, 0, 0), 5)
-        cv2.line(lined_frame, right_top, right_bottom, (100, 0, 0), 5)
-        # Show the frame
-        cv2.imshow('Binary with lines', lined_frame)
-        cv2.moveWindow('Binary with lines', width * 2, int(width * ratio * 2) + bar_width * 2)
-
-        # Exercise 11
-        blank_frame_left = np.zeros((height, width), dtype='uint8')
-        blank_frame_right = np.zeros((height, width), dtype='uint8')
-
-        cv2.line(blank_frame_left, left_top, left_bottom, 255, 3)
-        cv2.line(blank_frame_right, right_top, right_bottom, 255, 3)
-
-        back_magic_matrix = cv2.getPerspectiveTransform(screen_points, np.float32(trapezoid_points))
-        reverted_left_line = cv2.warpPerspective(blank_frame_left, back_magic_matrix, (width, height))
-        reverted_right_line = cv2.warpPerspective(blank_frame_right, back_magic_matrix, (width, height))
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Detects the lane lines of the frames streamed by producer.py.')
+    parser.add_argument('--endpoint', nargs='+', default=['tcp://127.0.0.1:5000'],
+                        help='endpoint of the producer, or of every producer (e.g. one per camera) to detect in one process')
+    parser.add_argument('--debug-view', action='store_true', help='show every stage of the pipeline in its own window')
+    parser.add_argument('--edge-backend', choices=EdgeBackend.ALL, default=EdgeParams.DEFAULT_BACKEND,
+                        help='how the Sobel magnitude is computed, exact is the original float pipeline')
+    parser.add_argument('--fit-method', choices=FitMethod.ALL, default=FitParams.DEFAULT_METHOD,
+                        help='how the lines are fitted on the edge pixels, ransac ignores the pixels off the line')
+    parser.add_argument('--max-fit-points', type=int, default=None,
+                        help='fit every line on a stratified subsample of at most this many pixels')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of processes detecting frames in parallel (0 detects on the receiving thread)')
+    parser.add_argument('--track', action='store_true',
+                        help='search each line around its last fit instead of the whole frame (needs --workers 0)')
+    parser.add_argument('--latency-budget-ms', type=float, default=None,
+                        help='adapt the working width to keep the detection of a frame within this latency (needs --workers 0)')
+    parser.add_argument('--headless', action='store_true', help='do not open any window, only detect the lines')
+    args = parser.parse_args()
+    if args.debug_view and args.workers:
+        parser.error('--debug-view needs the detection to run in this process (--workers 0)')
+    if args.track and (args.workers or len(args.endpoint) > 1):
+        parser.error('--track follows the frames of one stream in order, it needs one --endpoint and --workers 0')
+    if args.latency_budget_ms is not None and (args.workers or len(args.endpoint) > 1):
+        parser.error('--latency-budget-ms times the detection in this process, it needs one --endpoint and --workers 0')
+
+    detector_kwargs = dict(width=480, roi=(0.42, 0.6, 0.77), threshold=120, side_margin=0.08, edge_backend=args.edge_backend,
+                           fit_method=args.fit_method, max_fit_points=args.max_fit_points)
+    if len(args.endpoint) > 1:
+        detect_streams(args, detector_kwargs)
+        return
+
+    src = s.ObjectReceiverSocket(args.endpoint[0], print_when_connecting_to_sender=True, metrics_log_interval_s=1)
+    frames = receive_frames(src)
+
+    pool = None
+    adaptive = None
+    if args.workers:
+        # frames are fitted in parallel, the detections still come out in order
+        pool = ParallelLaneDetector(args.workers, **detector_kwargs)
+        detector = pool.detector()
+        detections = pool.detect_frames(frames)
+    else:
+        detector_class = TrackingLaneDetector if args.track else LaneDetector
+        detector = detector_class(**detector_kwargs,
+                                  debug_view=WindowDebugView() if args.debug_view and not args.headless else None)
+        if args.latency_budget_ms is not None:
+            adaptive = AdaptiveLaneDetector(detector, args.latency_budget_ms / 1e3)
+            detections = (adaptive.detect(frame) for frame in frames)
+        else:
+            detections = (detector.detect(frame) for frame in frames)
+
+    n_frames = 0
+    overlay = None
+    for detection in detections:
+        n_frames += 1
+
+        if not args.headless:
+            overlay = detector.draw_overlay(detection, dst=overlay)
+            cv2.imshow('Colored Left Line', overlay)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    else:
+        print('Video ended')
+
+    if pool is not None:
+        pool.close()
+        print(f'{n_frames} frames processed by {pool.workers} workers')
+    else:
+        # every stage reuses its buffer: a number of allocations growing with the frames is a regression
+        print(f'{n_frames} frames processed, {detector.buffers.allocations} buffer allocations '
+              f'({detector.buffers.nbytes() / 1e6:.1f} MB held)')
+        if args.track:
+            print(f'{detector.windowed_searches} lines tracked, {detector.full_searches} searched in the whole frame')
+        if adaptive is not None:
+            print(adaptive.summary())
+    src.close()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+def detect_streams(args: argparse.Namespace, detector_kwargs: Dict[str, Any]) -> None:
+    """Detects the lane lines of several producers, with the workers shared by all of them."""
+    overlays = {}
+    with StreamMultiplexer(args.endpoint, workers=args.workers, metrics_log_interval_s=1, **detector_kwargs) as multiplexer:
+        for stream, detection in multiplexer.detections():
+            if not args.headless:
+                overlays[stream] = multiplexer.detector(stream).draw_overlay(detection, dst=overlays.get(stream))
+                cv2.imshow(f'Lanes {stream}', overlays[stream])
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        else:
+            print('Videos ended')
+
+        for stream in multiplexer.streams:
+            print(f'{stream}: {multiplexer.frames[stream]} frames processed, {multiplexer.dropped(stream)} dropped')
+    if not args.headless:
+        cv2.destroyAllWindows()
 
-        left_white_points = np.array(np.argwhere(reverted_left_line > 1))
-        right_white_points = np.array(np.argwhere(reverted_right_line > 1))
-
-        colored_img = resized_frame.copy()
-        for y, x in left_white_points:
-            colored_img[y, x] = [0, 0, 255]
-        for y, x in right_white_points:
-            colored_img[y, x] = [255, 0, 0]
-
-        cv2.imshow('Colored Left Line', colored_img)
-
-    cv2.destroyAllWindows()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
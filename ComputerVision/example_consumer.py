@@ -2,7 +2,7 @@ import cv2
 import object_socket
 
 
-s = object_socket.ObjectReceiverSocket('127.0.0.1', 5000, print_when_connecting_to_sender=True, print_when_receiving_object=True)
+s = object_socket.ObjectReceiverSocket('127.0.0.1', 5000, print_when_connecting_to_sender=True, metrics_log_interval_s=1)
 
 while True:
     ret, frame = s.recv_object()
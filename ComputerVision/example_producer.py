@@ -3,7 +3,7 @@ import numpy as np
 import object_socket
 
 
-s = object_socket.ObjectSenderSocket('127.0.0.1', 5000, print_when_awaiting_receiver=True, print_when_sending_object=True)
+s = object_socket.ObjectSenderSocket('127.0.0.1', 5000, print_when_awaiting_receiver=True, metrics_log_interval_s=1)
 
 video = cv2.VideoCapture('.\\Lane Detection Test Video 01.mp4')
 
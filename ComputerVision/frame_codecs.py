@@ -0,0 +1,205 @@
+import zlib
+
+import cv2
+import numpy as np
+
+from typing import *
+
+try:
+    import lz4.frame
+except ImportError:  # lz4 is optional, the codec is only registered when it is installed
+    lz4 = None
+
+
+class FrameCodec:
+    """Base class for the compression stages applied to arrays sent with send_array.
+
+    The id of the codec is recorded in the header of every array message, so the receiver always knows
+    how to decode a frame, whatever codec (and parameters) the sender picked.
+
+    Attributes:
+        name: str -- The name used to select the codec.
+        id: int -- The identifier written in the array header (0-255).
+
+    Methods:
+        encode(arr: np.ndarray) -> Any -- Compresses a contiguous array into a bytes-like payload.
+        decode(data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray -- Restores the array.
+    """
+    name: str
+    id: int
+
+    def encode(self, arr: np.ndarray) -> Any:
+        """Compresses an array.
+
+        Args:
+            arr: np.ndarray -- The C-contiguous array to compress.
+
+        Returns:
+            Any -- The bytes-like payload.
+        """
+        raise NotImplementedError
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        """Decompresses a payload created by encode.
+
+        Args:
+            data: memoryview -- The payload.
+            dtype: np.dtype -- The dtype of the original array.
+            shape: Tuple[int, ...] -- The shape of the original array.
+
+        Returns:
+            np.ndarray -- The decoded array.
+        """
+        raise NotImplementedError
+
+
+class RawCodec(FrameCodec):
+    """No compression, the array buffer is sent as it is (without any copy)."""
+    name = 'raw'
+    id = 0
+
+    def encode(self, arr: np.ndarray) -> Any:
+        return arr.reshape(-1).view(np.uint8)
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+
+class JpegCodec(FrameCodec):
+    """Lossy JPEG compression with cv2.imencode. Only for uint8 grayscale or BGR frames.
+
+    Attributes:
+        quality: int -- The JPEG quality, 0-100.
+    """
+    name = 'jpeg'
+    id = 1
+    quality: int
+
+    def __init__(self, quality: int = 90):
+        self.quality = quality
+
+    def encode(self, arr: np.ndarray) -> Any:
+        ok, data = cv2.imencode('.jpg', arr, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError(f'Could not encode array of dtype {arr.dtype} and shape {arr.shape} as JPEG')
+        return data
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED).reshape(shape)
+
+
+class PngCodec(FrameCodec):
+    """Lossless PNG compression with cv2.imencode. For uint8 or uint16 frames with 1, 3 or 4 channels.
+
+    Attributes:
+        compression: int -- The PNG compression level, 0-9 (lower is faster).
+    """
+    name = 'png'
+    id = 2
+    compression: int
+
+    def __init__(self, compression: int = 1):
+        self.compression = compression
+
+    def encode(self, arr: np.ndarray) -> Any:
+        ok, data = cv2.imencode('.png', arr, [cv2.IMWRITE_PNG_COMPRESSION, self.compression])
+        if not ok:
+            raise ValueError(f'Could not encode array of dtype {arr.dtype} and shape {arr.shape} as PNG')
+        return data
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED).reshape(shape)
+
+
+class ZlibCodec(FrameCodec):
+    """Lossless general purpose compression of the raw buffer with zlib, for any dtype.
+
+    Attributes:
+        level: int -- The zlib compression level, 1-9 (1 is the fastest).
+    """
+    name = 'zlib'
+    id = 3
+    level: int
+
+    def __init__(self, level: int = 1):
+        self.level = level
+
+    def encode(self, arr: np.ndarray) -> Any:
+        return zlib.compress(arr.reshape(-1).view(np.uint8), self.level)
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(shape)
+
+
+class Lz4Codec(FrameCodec):
+    """Lossless and very fast compression of the raw buffer with LZ4, for any dtype (requires lz4)."""
+    name = 'lz4'
+    id = 4
+
+    def encode(self, arr: np.ndarray) -> Any:
+        return lz4.frame.compress(arr.reshape(-1).view(np.uint8))
+
+    def decode(self, data: memoryview, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.frombuffer(lz4.frame.decompress(data), dtype=dtype).reshape(shape)
+
+
+FRAME_CODECS: Dict[str, FrameCodec] = {}
+_FRAME_CODECS_BY_ID: Dict[int, FrameCodec] = {}
+
+
+def register_frame_codec(codec: FrameCodec):
+    """Makes a codec available by name to senders and by id to receivers.
+
+    Args:
+        codec: FrameCodec -- The codec (with its default parameters).
+    """
+    FRAME_CODECS[codec.name] = codec
+    _FRAME_CODECS_BY_ID[codec.id] = codec
+
+
+def get_frame_codec(codec: Union[str, FrameCodec]) -> FrameCodec:
+    """Returns the registered codec with the given name, or the codec itself if an instance is given.
+
+    Args:
+        codec: Union[str, FrameCodec] -- The name of the codec, or a codec with custom parameters.
+
+    Returns:
+        FrameCodec -- The codec.
+
+    Raises:
+        KeyError -- If no codec with this name is registered.
+    """
+    if isinstance(codec, FrameCodec):
+        return codec
+    try:
+        return FRAME_CODECS[codec]
+    except KeyError:
+        raise KeyError(f'Unknown frame codec {codec!r}, registered codecs: {list(FRAME_CODECS)}') from None
+
+
+def get_frame_codec_by_id(codec_id: int) -> FrameCodec:
+    """Returns the registered codec which decodes payloads with the given id.
+
+    Args:
+        codec_id: int -- The id read from the array header.
+
+    Returns:
+        FrameCodec -- The codec.
+
+    Raises:
+        KeyError -- If no codec with this id is registered.
+    """
+    try:
+        return _FRAME_CODECS_BY_ID[codec_id]
+    except KeyError:
+        raise KeyError(f'Unknown frame codec id {codec_id}, registered codecs: {list(FRAME_CODECS)}') from None
+
+
+RAW_CODEC = RawCodec()
+
+register_frame_codec(RAW_CODEC)
+register_frame_codec(JpegCodec())
+register_frame_codec(PngCodec())
+register_frame_codec(ZlibCodec())
+if lz4 is not None:
+    register_frame_codec(Lz4Codec())
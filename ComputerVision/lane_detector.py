@@ -0,0 +1,417 @@
+import cv2
+import numpy as np
+
+from typing import *
+
+from buffer_pool import BufferPool
+from edge_detection import EdgeDetector, EdgeParams
+from lane_geometry import LaneGeometry, get_lane_geometry
+from line_fitting import FitParams, LineFitter
+
+
+class LaneDetectorParams:
+    """Wrapper for configuration constants"""
+    WIDTH = 480
+    ROI = (0.42, 0.6, 0.77)  # x of the top left corner, x of the top right corner, y of the top edge (fractions of the frame)
+    BLUR_KSIZE = (3, 3)
+    THRESHOLD = 120
+    OPENING_KSIZE = 0  # size of the morphological opening removing white noise, 0 to disable it
+    SIDE_MARGIN = 0.08  # fraction of the width ignored on each side of the bird's eye view
+    BOTTOM_MARGIN = 0.03  # fraction of the height ignored at the bottom of the bird's eye view
+    MIN_POINTS = 2
+    MAX_FIT_POINTS = None  # points the lines are fitted on at most (a stratified subsample), None for all
+    OVERLAY_THICKNESS = 3
+    LEFT_COLOR = (0, 0, 255)
+    RIGHT_COLOR = (255, 0, 0)
+
+
+DebugView = Callable[[str, np.ndarray], None]
+
+
+class LaneDetection:
+    """The lane lines detected in one frame.
+
+    Lines are fitted in the bird's eye view of the working resolution as x = c[0] + c[1] * y, which stays
+    well conditioned for the near vertical lane markings (fitting y = f(x) explodes on them).
+
+    Attributes:
+        frame: np.ndarray -- The BGR frame at the working resolution, which the lines can be drawn on. When it
+            was resized, it is a buffer of the detector, overwritten by the next detect() (copy it to keep it).
+        allocations: int -- The number of buffers the detector had to allocate for this frame, 0 in steady state.
+        left: Optional[np.ndarray] -- The (c0, c1) coefficients of the left line, None if it was never found.
+        right: Optional[np.ndarray] -- The (c0, c1) coefficients of the right line, None if it was never found.
+        left_found: bool -- Whether the left line was fitted on this frame, False if left is the last good fit.
+        right_found: bool -- Whether the right line was fitted on this frame, False if right is the last good fit.
+        left_points: int -- The number of pixels the left line was fitted on.
+        right_points: int -- The number of pixels the right line was fitted on.
+    """
+    frame: np.ndarray
+    left: Optional[np.ndarray]
+    right: Optional[np.ndarray]
+    left_found: bool
+    right_found: bool
+    left_points: int
+    right_points: int
+    allocations: int
+
+    def __init__(self, frame: np.ndarray, left: Optional[np.ndarray], right: Optional[np.ndarray],
+                 left_found: bool, right_found: bool, left_points: int, right_points: int, allocations: int = 0):
+        self.frame = frame
+        self.allocations = allocations
+        self.left = left
+        self.right = right
+        self.left_found = left_found
+        self.right_found = right_found
+        self.left_points = left_points
+        self.right_points = right_points
+
+
+class LaneDetector:
+    """Display free lane detection engine: takes BGR frames, returns the fitted lane lines.
+
+    The pipeline resizes the frame to the working width, crops it to the rows of the road trapezoid, converts
+    them to grayscale, masks the trapezoid, warps it to a bird's eye view, blurs it, binarizes its Sobel gradient
+    magnitude (see EdgeBackend), removes the noise at the borders and fits a line on the white pixels of each half
+    (see FitMethod). When a side has too few pixels, the last good fit of that side is returned instead. The mask and the warp only depend on the frame shape
+    and the trapezoid, they come from the shared LaneGeometry cache (see get_lane_geometry()).
+
+    Every stage writes into a buffer of the detector's BufferPool through dst=, so once the first frame of a
+    resolution is processed, detect() does no frame sized allocation (see LaneDetection.allocations).
+
+    Nothing is ever displayed unless a debug_view is given: it is then called with the name and the image of
+    every intermediate stage, which costs extra copies and drawing, so it should stay off in production.
+
+    Example:
+        detector = LaneDetector()
+        for frame in frames:
+            detection = detector.detect(frame)
+            cv2.imshow('Lanes', detector.draw_overlay(detection))
+
+    Attributes:
+        width: Optional[int] -- The working width the frames are resized to, None to process them at full resolution.
+        roi: Tuple[float, float, float] -- The road trapezoid, see LaneDetectorParams.ROI.
+        threshold: int -- The gradient magnitude above which a pixel belongs to an edge.
+        edge_backend: str -- How the gradient magnitude is computed and thresholded, one of EdgeBackend.
+        fit_method: str -- How the lines are fitted on the pixels, one of FitMethod.
+        max_fit_points: Optional[int] -- The number of pixels a line is fitted on at most, None for all of them.
+        opening_ksize: int -- The size of the morphological opening applied to the edges, 0 to disable it.
+        side_margin: float -- The fraction of the width ignored on each side of the bird's eye view.
+        bottom_margin: float -- The fraction of the height ignored at the bottom of the bird's eye view.
+        debug_view: Optional[DebugView] -- Called with (stage name, image) for every stage, None to skip them.
+        buffers: BufferPool -- The output buffers of the stages.
+        left: Optional[np.ndarray] -- The last good fit of the left line.
+        right: Optional[np.ndarray] -- The last good fit of the right line.
+
+    Methods:
+        detect(frame: np.ndarray) -> LaneDetection -- Detects the lane lines of a frame.
+        fit(frame: np.ndarray) -> LaneDetection -- Fits the lane lines of a frame on its own, without the fallback.
+        apply_fallback(detection: LaneDetection) -> LaneDetection -- Replaces the missing lines by the last good ones.
+        draw_overlay(detection: LaneDetection, dst: Optional[np.ndarray] = None) -> np.ndarray -- Draws the lines of a detection.
+        working_shape(shape: Tuple[int, ...]) -> Tuple[int, ...] -- Returns the shape a frame is processed at.
+        reset() -- Forgets the last good fits.
+    """
+    width: Optional[int]
+    roi: Tuple[float, float, float]
+    threshold: int
+    edge_backend: str
+    fit_method: str
+    max_fit_points: Optional[int]
+    opening_ksize: int
+    side_margin: float
+    bottom_margin: float
+    debug_view: Optional[DebugView]
+    buffers: BufferPool
+    left: Optional[np.ndarray]
+    right: Optional[np.ndarray]
+
+    def __init__(self, width: Optional[int] = LaneDetectorParams.WIDTH, roi: Tuple[float, float, float] = LaneDetectorParams.ROI,
+                 threshold: int = LaneDetectorParams.THRESHOLD, opening_ksize: int = LaneDetectorParams.OPENING_KSIZE,
+                 side_margin: float = LaneDetectorParams.SIDE_MARGIN, bottom_margin: float = LaneDetectorParams.BOTTOM_MARGIN,
+                 debug_view: Optional[DebugView] = None, edge_backend: str = EdgeParams.DEFAULT_BACKEND,
+                 fit_method: str = FitParams.DEFAULT_METHOD, max_fit_points: Optional[int] = LaneDetectorParams.MAX_FIT_POINTS):
+        """Initializes the LaneDetector.
+
+        Args:
+            width = LaneDetectorParams.WIDTH: Optional[int] -- The working width, None to process the frames at full resolution.
+            roi = LaneDetectorParams.ROI: Tuple[float, float, float] -- The road trapezoid, see LaneDetectorParams.ROI.
+            threshold = LaneDetectorParams.THRESHOLD: int -- The gradient magnitude above which a pixel belongs to an edge.
+            opening_ksize = LaneDetectorParams.OPENING_KSIZE: int -- The size of the morphological opening, 0 to disable it.
+            side_margin = LaneDetectorParams.SIDE_MARGIN: float -- The fraction of the width ignored on each side.
+            bottom_margin = LaneDetectorParams.BOTTOM_MARGIN: float -- The fraction of the height ignored at the bottom.
+            debug_view = None: Optional[DebugView] -- Called with (stage name, image) for every stage, e.g. a WindowDebugView.
+            edge_backend = EdgeParams.DEFAULT_BACKEND: str -- One of EdgeBackend, EXACT to compare with the original magnitude.
+            fit_method = FitParams.DEFAULT_METHOD: str -- One of FitMethod, RANSAC to ignore the pixels off the line.
+            max_fit_points = LaneDetectorParams.MAX_FIT_POINTS: Optional[int] -- The pixels a line is fitted on at most.
+        """
+        self.width = width
+        self.roi = tuple(roi)
+        self.threshold = threshold
+        self.edge_backend = edge_backend
+        self.fit_method = fit_method
+        self.max_fit_points = max_fit_points
+        self.opening_ksize = opening_ksize
+        self.side_margin = side_margin
+        self.bottom_margin = bottom_margin
+        self.debug_view = debug_view
+        self.buffers = BufferPool()
+        self._edges = EdgeDetector(threshold, edge_backend, self.buffers)
+        self._fitter = LineFitter(fit_method, max_fit_points)
+        self._opening_kernel = np.ones((opening_ksize, opening_ksize), np.uint8) if opening_ksize else None
+        self.reset()
+
+    def reset(self):
+        """Forgets the last good fits, e.g. when switching to another video."""
+        self.left = None
+        self.right = None
+        self._lines_shape = None
+
+    def detect(self, frame: np.ndarray) -> LaneDetection:
+        """Detects the lane lines of a frame, the frames of a video must be given in order.
+
+        Args:
+            frame: np.ndarray -- The BGR frame, at any resolution.
+
+        Returns:
+            LaneDetection -- The fitted lines, the last good ones for the sides which were not found.
+        """
+        return self.apply_fallback(self.fit(frame))
+
+    def fit(self, frame: np.ndarray) -> LaneDetection:
+        """Fits the lane lines of a frame on its own: the state of the detector is not used nor updated,
+        so frames can be fitted in any order (e.g. by several processes) and passed to apply_fallback() in order.
+
+        Args:
+            frame: np.ndarray -- The BGR frame, at any resolution.
+
+        Returns:
+            LaneDetection -- The fitted lines, None for the sides which were not found.
+        """
+        buffers = self.buffers
+        buffers.begin_frame()
+        frame, road, geometry = self._prepare(frame)
+        height, width = geometry.height, geometry.width
+
+        top_down = geometry.warp_roi(road, dst=buffers.get('top_down', (height, width)))
+        self._debug('top_down', top_down)
+        binary = self._binarize(top_down)
+
+        margin = int(width * self.side_margin)
+        binary[:, :margin] = 0
+        binary[:, width - margin:] = 0
+        binary[height - int(height * self.bottom_margin):, :] = 0
+        self._debug('markings', binary)
+
+        half = width // 2
+        left_fit, left_points = self._fit_half(binary[:, :half], 0)
+        right_fit, right_points = self._fit_half(binary[:, half:], half)
+
+        detection = LaneDetection(frame, left_fit, right_fit, left_fit is not None, right_fit is not None,
+                                  left_points, right_points, buffers.frame_allocations)
+        if self.debug_view is not None:
+            lined = cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+            cv2.line(lined, (half, 0), (half, height), (100, 100, 100), 2)
+            for line, color in ((left_fit, LaneDetectorParams.LEFT_COLOR), (right_fit, LaneDetectorParams.RIGHT_COLOR)):
+                if line is not None:
+                    top, bottom = line_endpoints(line, height)
+                    cv2.line(lined, _to_pixel(top), _to_pixel(bottom), color, 5)
+            self._debug('lines', lined)
+        return detection
+
+    def apply_fallback(self, detection: LaneDetection) -> LaneDetection:
+        """Remembers the lines found by fit() and replaces the missing ones by the last good fits.
+
+        When the working resolution changed since the last good fits (e.g. the width was adapted), they are
+        rescaled to the bird's eye view of the new one first.
+
+        Args:
+            detection: LaneDetection -- A detection returned by fit(), the detections of a video must be given in order.
+
+        Returns:
+            LaneDetection -- The same detection, updated.
+        """
+        self._rescale_lines(detection.frame.shape[:2])
+        if detection.left_found:
+            self.left = detection.left
+        if detection.right_found:
+            self.right = detection.right
+        detection.left = self.left
+        detection.right = self.right
+        return detection
+
+    def draw_overlay(self, detection: LaneDetection, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Draws the lines of a detection on a copy of its frame, projected back from the bird's eye view.
+
+        Args:
+            detection: LaneDetection -- A detection returned by detect().
+            dst = None: Optional[np.ndarray] -- The array to copy the frame to and draw on, a new one if None or
+                if its shape is not the one of the frame (e.g. the working width changed).
+
+        Returns:
+            np.ndarray -- The BGR frame with the left line in red and the right one in blue.
+        """
+        if dst is None or dst.shape != detection.frame.shape:
+            overlay = detection.frame.copy()
+        else:
+            overlay = dst
+            np.copyto(overlay, detection.frame)
+        height, width = overlay.shape[:2]
+        inverse = self._geometry(height, width).inverse_homography
+        for line, color in ((detection.left, LaneDetectorParams.LEFT_COLOR), (detection.right, LaneDetectorParams.RIGHT_COLOR)):
+            if line is None:
+                continue
+            top, bottom = cv2.perspectiveTransform(np.float32([line_endpoints(line, height)]), inverse)[0]
+            cv2.line(overlay, _to_pixel(top), _to_pixel(bottom), color, LaneDetectorParams.OVERLAY_THICKNESS)
+        return overlay
+
+    def _prepare(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, LaneGeometry]:
+        # resize, crop to the bounding box of the trapezoid, grayscale and road mask:
+        # returns the frame at the working resolution, the masked crop of the road and the geometry
+        frame = self._resize(frame)
+        self._debug('resized', frame)
+        geometry = self._geometry(*frame.shape[:2])
+        roi = frame[geometry.roi_top:]
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=self.buffers.get('gray', roi.shape[:2]))
+        self._debug('gray', gray)
+
+        road = cv2.multiply(gray, geometry.roi_mask, dst=self.buffers.get('road', roi.shape[:2]))
+        self._debug('road', road)
+        return frame, road, geometry
+
+    def _binarize(self, top_down: np.ndarray) -> np.ndarray:
+        # blur, edges and opening of (a part of) the bird's eye view
+        blurred = cv2.blur(top_down, LaneDetectorParams.BLUR_KSIZE, dst=self.buffers.get('blurred', top_down.shape))
+        self._debug('blurred', blurred)
+
+        if self.debug_view is not None:
+            self._debug('edges', self._edges.magnitude(blurred))
+        binary = self._edges.detect(blurred)
+        if self._opening_kernel is not None:
+            binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, self._opening_kernel, dst=self.buffers.get('opened', binary.shape))
+        self._debug('binary', binary)
+        return binary
+
+    def working_shape(self, shape: Tuple[int, ...]) -> Tuple[int, ...]:
+        """Returns the shape a frame is processed at, which is the shape of LaneDetection.frame.
+
+        Args:
+            shape: Tuple[int, ...] -- The (height, width, 3) shape of the frame.
+
+        Returns:
+            Tuple[int, ...] -- The shape of the frame at the working width, keeping its aspect ratio.
+        """
+        if self.width is None or shape[1] == self.width:
+            return tuple(shape)
+        return (int(self.width * shape[0] / shape[1]), self.width, *shape[2:])
+
+    def _rescale_lines(self, shape: Tuple[int, int]):
+        # moves the last good fits to the bird's eye view of a frame of this (height, width)
+        if self._lines_shape is not None and shape != self._lines_shape:
+            self.left = rescale_line(self.left, self._lines_shape, shape)
+            self.right = rescale_line(self.right, self._lines_shape, shape)
+        self._lines_shape = shape
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        shape = self.working_shape(frame.shape)
+        if shape == frame.shape:
+            return frame
+        return cv2.resize(frame, (shape[1], shape[0]), dst=self.buffers.get('resized', shape))
+
+    def _geometry(self, height: int, width: int) -> LaneGeometry:
+        return get_lane_geometry(height, width, self.roi)
+
+    def _fit_half(self, half_frame: np.ndarray, x_offset: int) -> Tuple[Optional[np.ndarray], int]:
+        return self._fit_points(*extract_points(half_frame, x_offset))
+
+    def _fit_points(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[Optional[np.ndarray], int]:
+        if len(ys) < LaneDetectorParams.MIN_POINTS:
+            return None, len(ys)
+        return self._fitter.fit(xs, ys), len(ys)  # None when x = f(y) is undefined (all the points on one row)
+
+    def _debug(self, stage: str, image: np.ndarray):
+        if self.debug_view is not None:
+            self.debug_view(stage, image)
+
+
+def extract_points(binary: np.ndarray, x_offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the coordinates of the white pixels of a binary frame, as two arrays.
+
+    cv2.findNonZero() scans the frame in a single pass and returns the (x, y) pairs in row major order, like
+    np.argwhere() but about 3x faster than np.argwhere() and np.nonzero() on uint8 frames.
+
+    Args:
+        binary: np.ndarray -- The uint8 binary frame (or a view of a part of it).
+        x_offset = 0: int -- Added to the x coordinates, e.g. the first column of the view in the whole frame.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The int32 x and y coordinates of the white pixels.
+    """
+    points = cv2.findNonZero(binary)
+    if points is None:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    points = points.reshape(-1, 2)  # (n, 1, 2) in older OpenCV versions
+    xs = points[:, 0] + x_offset if x_offset else points[:, 0]
+    return xs, points[:, 1]
+
+
+def line_endpoints(line: np.ndarray, height: int) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """Returns the points of a line x = c[0] + c[1] * y on the top and the bottom rows of a frame.
+
+    Args:
+        line: np.ndarray -- The (c0, c1) coefficients of the line.
+        height: int -- The height of the frame.
+
+    Returns:
+        Tuple[Tuple[float, float], Tuple[float, float]] -- The (x, y) top and bottom points.
+    """
+    return (line[0], 0.0), (line[0] + line[1] * (height - 1), float(height - 1))
+
+
+def rescale_line(line: Optional[np.ndarray], shape: Tuple[int, int], new_shape: Tuple[int, int]) -> Optional[np.ndarray]:
+    """Returns the coefficients of a line of the bird's eye view of a (height, width) frame in the bird's eye
+    view of a frame of another resolution.
+
+    Args:
+        line: Optional[np.ndarray] -- The (c0, c1) coefficients of the line, or None.
+        shape: Tuple[int, int] -- The (height, width) the line was fitted at.
+        new_shape: Tuple[int, int] -- The (height, width) to move the line to.
+
+    Returns:
+        Optional[np.ndarray] -- The (c0, c1) coefficients at the new resolution, None if line is None.
+    """
+    if line is None:
+        return None
+    # the corners of the bird's eye view are (0, 0) and (width - 1, height - 1) at every resolution
+    scale_x = (new_shape[1] - 1) / (shape[1] - 1)
+    scale_y = (new_shape[0] - 1) / (shape[0] - 1)
+    return np.array([line[0] * scale_x, line[1] * scale_x / scale_y])
+
+
+def _to_pixel(point: Sequence[float]) -> Tuple[int, int]:
+    return int(round(point[0])), int(round(point[1]))
+
+
+class WindowDebugView:
+    """DebugView showing every stage of a LaneDetector in its own window, tiled on a grid.
+
+    Attributes:
+        columns: int -- The number of windows per row.
+        size: Optional[Tuple[int, int]] -- The (width, height) the stages are resized to, None to show them as they are.
+        bar_height: int -- The space left between two rows for the title bars.
+    """
+    columns: int
+    size: Optional[Tuple[int, int]]
+    bar_height: int
+
+    def __init__(self, columns: int = 3, size: Optional[Tuple[int, int]] = None, bar_height: int = 30):
+        self.columns = columns
+        self.size = size
+        self.bar_height = bar_height
+        self._slots = {}
+
+    def __call__(self, stage: str, image: np.ndarray):
+        if self.size is not None:
+            image = cv2.resize(image, self.size)
+        slot = self._slots.setdefault(stage, len(self._slots))
+        height, width = image.shape[:2]
+        cv2.imshow(stage, image)
+        cv2.moveWindow(stage, (slot % self.columns) * width, (slot // self.columns) * (height + self.bar_height))
@@ -0,0 +1,139 @@
+import functools
+
+import cv2
+import numpy as np
+
+from typing import *
+
+
+class GeometryParams:
+    """Wrapper for configuration constants"""
+    CACHE_SIZE = 16
+
+
+class LaneGeometry:
+    """Everything the lane pipeline derives from the frame shape and the road trapezoid, computed once.
+
+    The perspective warp is precomputed as remap tables: cv2.remap() with them gives the same result as
+    cv2.warpPerspective() but skips projecting every pixel through the homography on every frame. The tables
+    are kept in float32, the fixed point ones of cv2.convertMaps() measured slower than warpPerspective itself.
+
+    Nothing above the trapezoid reaches the bird's eye view, so the stages before the warp only need the rows
+    of its bounding box: warp_roi() takes that crop directly (the trapezoid spans the whole width at the bottom,
+    so the box is the rows [roi_top, height)). The rows above are 0 after the mask and so is the border of the
+    remap, which makes the result identical to warping the whole masked frame.
+
+    Attributes:
+        height: int -- The height of the frames.
+        width: int -- The width of the frames.
+        roi: Tuple[float, float, float] -- The road trapezoid, see LaneDetectorParams.ROI.
+        trapezoid: np.ndarray -- The (4, 2) float32 corners of the trapezoid: upper left, upper right, lower right, lower left.
+        screen: np.ndarray -- The (4, 2) float32 corners of the frame, in the same order.
+        mask: np.ndarray -- The (height, width) uint8 mask, 1 inside the trapezoid and 0 outside.
+        homography: np.ndarray -- The 3x3 transform from the trapezoid to the bird's eye view.
+        inverse_homography: np.ndarray -- The 3x3 transform from the bird's eye view back to the trapezoid.
+        remap_x: np.ndarray -- The (height, width) float32 source x of every pixel of the bird's eye view.
+        remap_y: np.ndarray -- The (height, width) float32 source y of every pixel of the bird's eye view.
+        roi_top: int -- The first row of the bounding box of the trapezoid.
+        roi_mask: np.ndarray -- The rows [roi_top, height) of mask.
+        roi_remap_y: np.ndarray -- remap_y relative to roi_top, the source y in the crop of the bounding box.
+
+    Methods:
+        warp(frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray -- Warps a frame to the bird's eye view.
+        warp_roi(roi: np.ndarray, start: int = 0, stop: Optional[int] = None, dst: Optional[np.ndarray] = None) -> np.ndarray --
+            Warps the crop of the bounding box of the trapezoid to (some columns of) the bird's eye view.
+    """
+    height: int
+    width: int
+    roi: Tuple[float, float, float]
+    trapezoid: np.ndarray
+    screen: np.ndarray
+    mask: np.ndarray
+    homography: np.ndarray
+    inverse_homography: np.ndarray
+    remap_x: np.ndarray
+    remap_y: np.ndarray
+    roi_top: int
+    roi_mask: np.ndarray
+    roi_remap_y: np.ndarray
+
+    def __init__(self, height: int, width: int, roi: Tuple[float, float, float]):
+        """Builds the geometry of a frame shape. Use get_lane_geometry() to share it between frames and detectors.
+
+        Args:
+            height: int -- The height of the frames.
+            width: int -- The width of the frames.
+            roi: Tuple[float, float, float] -- The road trapezoid, see LaneDetectorParams.ROI.
+        """
+        self.height = height
+        self.width = width
+        self.roi = roi
+
+        top_left_x, top_right_x, top_y = roi
+        self.trapezoid = np.float32([(int(width * top_left_x), int(height * top_y)), (int(width * top_right_x), int(height * top_y)),
+                                     (width - 1, height - 1), (0, height - 1)])
+        self.screen = np.float32([(0, 0), (width - 1, 0), (width - 1, height - 1), (0, height - 1)])
+
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillConvexPoly(self.mask, self.trapezoid.astype(np.int32), 1)
+
+        self.homography = cv2.getPerspectiveTransform(self.trapezoid, self.screen)
+        self.inverse_homography = cv2.getPerspectiveTransform(self.screen, self.trapezoid)
+
+        # the source pixel of every bird's eye view pixel, like warpPerspective computes it on every call
+        xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+        projected = np.stack([xs, ys, np.ones_like(xs)], axis=-1) @ self.inverse_homography.T
+        self.remap_x = (projected[..., 0] / projected[..., 2]).astype(np.float32)
+        self.remap_y = (projected[..., 1] / projected[..., 2]).astype(np.float32)
+
+        self.roi_top = int(self.trapezoid[:, 1].min())
+        self.roi_mask = self.mask[self.roi_top:]
+        self.roi_remap_y = self.remap_y - np.float32(self.roi_top)  # exact in float32, the remap weights do not change
+
+        for array in (self.trapezoid, self.screen, self.mask, self.homography, self.inverse_homography, self.remap_x, self.remap_y,
+                      self.roi_mask, self.roi_remap_y):
+            array.flags.writeable = False  # shared by every frame and every detector using this shape
+
+    def warp(self, frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Warps a frame of this shape to the bird's eye view.
+
+        Args:
+            frame: np.ndarray -- The (height, width) frame.
+            dst = None: Optional[np.ndarray] -- The array to write the result to, a new one if None.
+
+        Returns:
+            np.ndarray -- The bird's eye view.
+        """
+        return cv2.remap(frame, self.remap_x, self.remap_y, cv2.INTER_LINEAR, dst=dst)
+
+    def warp_roi(self, roi: np.ndarray, start: int = 0, stop: Optional[int] = None, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Warps the crop of the bounding box of the trapezoid to the columns [start, stop) of the bird's eye view.
+
+        Every pixel of the remap is computed on its own, so the result is exactly warp(frame)[:, start:stop]
+        of the masked frame, at the cost of these columns only.
+
+        Args:
+            roi: np.ndarray -- The rows [roi_top, height) of the masked frame.
+            start = 0: int -- The first column of the bird's eye view.
+            stop = None: Optional[int] -- The column after the last one, width if None.
+            dst = None: Optional[np.ndarray] -- The (height, stop - start) array to write the result to, a new one if None.
+
+        Returns:
+            np.ndarray -- The columns of the bird's eye view.
+        """
+        return cv2.remap(roi, self.remap_x[:, start:stop], self.roi_remap_y[:, start:stop], cv2.INTER_LINEAR, dst=dst)
+
+
+@functools.lru_cache(maxsize=GeometryParams.CACHE_SIZE)
+def get_lane_geometry(height: int, width: int, roi: Tuple[float, float, float]) -> LaneGeometry:
+    """Returns the LaneGeometry of a frame shape, built on the first call and cached afterwards.
+
+    Args:
+        height: int -- The height of the frames.
+        width: int -- The width of the frames.
+        roi: Tuple[float, float, float] -- The road trapezoid, see LaneDetectorParams.ROI.
+
+    Returns:
+        LaneGeometry -- The (read only) geometry.
+    """
+    return LaneGeometry(height, width, tuple(roi))
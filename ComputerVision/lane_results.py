@@ -0,0 +1,203 @@
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+
+from typing import *
+
+from lane_detector import LaneDetection
+
+
+class ResultsParams:
+    """Wrapper for configuration constants"""
+    CHUNK_FRAMES = 4096  # rows written at once, at most this many frames are lost (and detected again) after a crash
+    METADATA_FILE = 'metadata.json'
+    CHUNK_PATTERN = 'chunk_{:06d}'
+    CHUNK_GLOB = 'chunk_[0-9][0-9][0-9][0-9][0-9][0-9]'
+
+
+class ResultColumn:
+    """The columns of the results of a batch run, with their dtype and the shape of one row."""
+    FRAME_INDEX = 'frame_index'
+    LEFT = 'left'
+    RIGHT = 'right'
+    LEFT_FOUND = 'left_found'
+    RIGHT_FOUND = 'right_found'
+    LEFT_POINTS = 'left_points'
+    RIGHT_POINTS = 'right_points'
+    TIME_MS = 'time_ms'
+    DTYPES = {FRAME_INDEX: (np.int64, ()),
+              LEFT: (np.float64, (2,)),  # (c0, c1) of x = c0 + c1 * y in the bird's eye view, NaN if never found
+              RIGHT: (np.float64, (2,)),
+              LEFT_FOUND: (np.bool_, ()),  # False when the line is the last good one (or NaN)
+              RIGHT_FOUND: (np.bool_, ()),
+              LEFT_POINTS: (np.int32, ()),  # the pixels the line was fitted on, its confidence
+              RIGHT_POINTS: (np.int32, ()),
+              TIME_MS: (np.float32, ())}
+
+
+class LaneResultsWriter:
+    """Writes the detections of a video to a directory, in chunks of columns, and resumes an interrupted run.
+
+    Every chunk is a directory holding one .npy file per column (see ResultColumn) for chunk_frames frames.
+    A chunk is written to a temporary directory then renamed, so the results on disk are always whole chunks:
+    when a run is killed, at most the frames of the chunk being filled are lost, and close() (which also runs
+    on KeyboardInterrupt when used as a context manager) writes them as a shorter chunk. The metadata of the
+    run (e.g. the video and the detector settings) are saved next to the chunks, and a run only resumes the
+    results of a run with the same metadata.
+
+    Example:
+        with LaneResultsWriter('results/video_01', {'video': 'video_01.mp4'}) as writer:
+            for frame_index, frame in enumerate(read_frames('video_01.mp4', writer.next_frame), writer.next_frame):
+                writer.append(frame_index, detector.detect(frame), time_s)
+
+    Attributes:
+        directory: str -- The directory of the results.
+        metadata: Dict[str, Any] -- The JSON serializable description of the run.
+        chunk_frames: int -- The number of frames per chunk.
+        next_frame: int -- The index of the first frame not written yet, where the run resumes.
+        frames: int -- The number of frames written, by this run and the previous ones.
+
+    Methods:
+        append(frame_index: int, detection: LaneDetection, time_s: float) -- Adds the detection of a frame.
+        flush() -- Writes the frames appended so far as a chunk.
+        close() -- Writes the remaining frames.
+    """
+    directory: str
+    metadata: Dict[str, Any]
+    chunk_frames: int
+    next_frame: int
+    frames: int
+
+    def __init__(self, directory: str, metadata: Dict[str, Any], chunk_frames: int = ResultsParams.CHUNK_FRAMES,
+                 restart: bool = False):
+        """Initializes the LaneResultsWriter, resuming the results already in the directory.
+
+        Args:
+            directory: str -- The directory of the results, created if needed.
+            metadata: Dict[str, Any] -- The JSON serializable description of the run, which must be the one of
+                the results already in the directory.
+            chunk_frames = ResultsParams.CHUNK_FRAMES: int -- The number of frames per chunk.
+            restart = False: bool -- Whether to delete the results already in the directory instead of resuming them.
+        """
+        self.directory = directory
+        self.metadata = json.loads(json.dumps(metadata))  # as it is read back from the file
+        self.chunk_frames = chunk_frames
+        metadata_path = os.path.join(directory, ResultsParams.METADATA_FILE)
+        os.makedirs(directory, exist_ok=True)
+        if restart:  # only the files of a LaneResultsWriter, the directory may hold others
+            for chunk in _chunk_directories(directory):
+                shutil.rmtree(chunk)
+            if os.path.exists(metadata_path):
+                os.remove(metadata_path)
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as file:
+                previous_metadata = json.load(file)
+            if previous_metadata != self.metadata:
+                raise ValueError(f'{directory!r} holds the results of another run ({previous_metadata}), '
+                                 f'use another directory or restart')
+        else:
+            with open(metadata_path, 'w') as file:
+                json.dump(self.metadata, file, indent=2)
+
+        for temporary in glob.glob(os.path.join(directory, ResultsParams.CHUNK_GLOB + '.tmp')):  # interrupted while being written
+            shutil.rmtree(temporary)
+        chunks = _chunk_directories(directory)
+        self._next_chunk = len(chunks)
+        self.frames = 0
+        self.next_frame = 0
+        for chunk in chunks:
+            frame_index = np.load(os.path.join(chunk, ResultColumn.FRAME_INDEX + '.npy'), mmap_mode='r')
+            self.frames += len(frame_index)
+            if len(frame_index):
+                self.next_frame = int(frame_index[-1]) + 1
+
+        self._columns = {name: np.empty((chunk_frames, *shape), dtype=dtype) for name, (dtype, shape) in ResultColumn.DTYPES.items()}
+        self._rows = 0
+
+    def append(self, frame_index: int, detection: LaneDetection, time_s: float):
+        """Adds the detection of a frame, written with the next chunk.
+
+        Args:
+            frame_index: int -- The index of the frame in the video.
+            detection: LaneDetection -- Its detection.
+            time_s: float -- The time it took to detect, in seconds.
+        """
+        row = self._rows
+        columns = self._columns
+        columns[ResultColumn.FRAME_INDEX][row] = frame_index
+        columns[ResultColumn.LEFT][row] = detection.left if detection.left is not None else np.nan
+        columns[ResultColumn.RIGHT][row] = detection.right if detection.right is not None else np.nan
+        columns[ResultColumn.LEFT_FOUND][row] = detection.left_found
+        columns[ResultColumn.RIGHT_FOUND][row] = detection.right_found
+        columns[ResultColumn.LEFT_POINTS][row] = detection.left_points
+        columns[ResultColumn.RIGHT_POINTS][row] = detection.right_points
+        columns[ResultColumn.TIME_MS][row] = time_s * 1e3
+        self._rows += 1
+        self.frames += 1
+        self.next_frame = frame_index + 1
+        if self._rows == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Writes the frames appended so far as a chunk, nothing if there is none."""
+        if not self._rows:
+            return
+        chunk = os.path.join(self.directory, ResultsParams.CHUNK_PATTERN.format(self._next_chunk))
+        temporary = chunk + '.tmp'
+        os.makedirs(temporary, exist_ok=True)
+        for name, column in self._columns.items():
+            np.save(os.path.join(temporary, name + '.npy'), column[:self._rows])
+        os.replace(temporary, chunk)  # the chunk appears whole or not at all
+        self._next_chunk += 1
+        self._rows = 0
+
+    def close(self):
+        """Writes the frames appended and not written yet."""
+        self.flush()
+
+    def __enter__(self) -> 'LaneResultsWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_lane_results(directory: str) -> Dict[str, np.ndarray]:
+    """Reads the results written by a LaneResultsWriter.
+
+    The chunks are memory mapped, so only the columns used are read from the disk. Use the chunks themselves
+    (one directory per chunk, one .npy file per column) to process results bigger than the memory.
+
+    Args:
+        directory: str -- The directory of the results.
+
+    Returns:
+        Dict[str, np.ndarray] -- Every column of ResultColumn, with one row per frame written, in order.
+    """
+    chunks = _chunk_directories(directory)
+    results = {}
+    for name, (dtype, shape) in ResultColumn.DTYPES.items():
+        parts = [np.load(os.path.join(chunk, name + '.npy'), mmap_mode='r') for chunk in chunks]
+        results[name] = np.concatenate(parts) if parts else np.empty((0, *shape), dtype=dtype)
+    return results
+
+
+def load_lane_metadata(directory: str) -> Dict[str, Any]:
+    """Reads the metadata of the run which wrote the results of a directory.
+
+    Args:
+        directory: str -- The directory of the results.
+
+    Returns:
+        Dict[str, Any] -- The metadata given to the LaneResultsWriter.
+    """
+    with open(os.path.join(directory, ResultsParams.METADATA_FILE)) as file:
+        return json.load(file)
+
+
+def _chunk_directories(directory: str) -> List[str]:
+    # zero padded indices: the lexicographic order is the order of the chunks
+    return sorted(path for path in glob.glob(os.path.join(directory, ResultsParams.CHUNK_GLOB)) if os.path.isdir(path))
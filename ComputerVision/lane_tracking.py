@@ -0,0 +1,144 @@
+import numpy as np
+
+from typing import *
+
+from lane_detector import LaneDetection, LaneDetector, extract_points
+from lane_geometry import LaneGeometry
+
+
+class TrackingParams:
+    """Wrapper for configuration constants"""
+    BAND_MARGIN = 0.04  # half width of the band searched around the predicted line (fraction of the working width)
+    MIN_POINTS = 20  # pixels a side must be fitted on to be tracked on the next frame
+    SMOOTHING = 0.5  # weight of the new fit in the exponential filter of the tracked coefficients, 1 to disable it
+
+
+class TrackingLaneDetector(LaneDetector):
+    """LaneDetector following the lines from frame to frame instead of searching the whole frame every time.
+
+    A side whose last fit was confident (at least track_min_points pixels) is tracked: only the columns of the
+    bird's eye view around its last line are warped, blurred and binarized, and only the pixels within
+    band_margin of that line are fitted. Its coefficients are smoothed with an exponential filter, which damps
+    the jitter of the fits without the latency of a longer window. A side which was lost, or never found, is
+    searched over its whole half of the frame, exactly like LaneDetector.fit() does, until it is found again.
+
+    The band is cut with enough extra columns for the blur, the Sobel filter and the opening, so the pixels
+    searched are binarized exactly as in a full frame search.
+
+    Tracking carries state from a frame to the next, so the frames of a video must be given to detect() in order
+    and cannot be fitted in parallel: fit() stays the stateless full search of LaneDetector.
+
+    Example:
+        detector = TrackingLaneDetector(width=480)
+        for frame in frames:
+            detection = detector.detect(frame)
+        print(detector.searched_pixels / detector.buffers.frames)
+
+    Attributes:
+        band_margin: float -- The half width of the band searched around a tracked line (fraction of the working width).
+        track_min_points: int -- The number of pixels a side must be fitted on to be tracked on the next frame.
+        smoothing: float -- The weight of the new fit in the smoothed coefficients of a tracked side.
+        left_tracked: bool -- Whether the left line is searched around its last fit on the next frame.
+        right_tracked: bool -- Whether the right line is searched around its last fit on the next frame.
+        full_searches: int -- The number of sides searched over their whole half of the frame.
+        windowed_searches: int -- The number of sides searched in the band around their last fit.
+        searched_pixels: int -- The number of bird's eye view pixels binarized, to compare with a full search.
+
+    Methods:
+        detect(frame: np.ndarray) -> LaneDetection -- Detects the lane lines of a frame, tracking them from the previous one.
+        reset() -- Forgets the last good fits and searches the whole frame again.
+    """
+    band_margin: float
+    track_min_points: int
+    smoothing: float
+    left_tracked: bool
+    right_tracked: bool
+    full_searches: int
+    windowed_searches: int
+    searched_pixels: int
+
+    def __init__(self, band_margin: float = TrackingParams.BAND_MARGIN, track_min_points: int = TrackingParams.MIN_POINTS,
+                 smoothing: float = TrackingParams.SMOOTHING, **detector_kwargs):
+        """Initializes the TrackingLaneDetector.
+
+        Args:
+            band_margin = TrackingParams.BAND_MARGIN: float -- The half width of the band searched around a tracked line.
+            track_min_points = TrackingParams.MIN_POINTS: int -- The pixels a side must be fitted on to be tracked.
+            smoothing = TrackingParams.SMOOTHING: float -- The weight of the new fit in the smoothed coefficients.
+            **detector_kwargs -- The arguments of LaneDetector.
+        """
+        if not 0 < smoothing <= 1:
+            raise ValueError(f'smoothing must be in (0, 1], got {smoothing}')
+        self.band_margin = band_margin
+        self.track_min_points = track_min_points
+        self.smoothing = smoothing
+        super().__init__(**detector_kwargs)
+        # columns the blur and the Sobel filter (1 each) and the opening (erosion and dilation) read around a pixel
+        self._pad = 2 + 2 * (self.opening_ksize // 2)
+        self.full_searches = 0
+        self.windowed_searches = 0
+        self.searched_pixels = 0
+
+    def reset(self):
+        """Forgets the last good fits, the next frame is searched as a whole."""
+        super().reset()
+        self.left_tracked = False
+        self.right_tracked = False
+
+    def detect(self, frame: np.ndarray) -> LaneDetection:
+        """Detects the lane lines of a frame, searching the tracked sides around their last fit only.
+
+        Args:
+            frame: np.ndarray -- The BGR frame, at any resolution.
+
+        Returns:
+            LaneDetection -- The fitted (and smoothed, for the tracked sides) lines, the last good ones for the
+                sides which were not found.
+        """
+        buffers = self.buffers
+        buffers.begin_frame()
+        frame, road, geometry = self._prepare(frame)
+        height, width = geometry.height, geometry.width
+        self._rescale_lines((height, width))  # the predictions must be in the bird's eye view of this frame
+        margin = int(width * self.side_margin)
+        half = width // 2
+        bottom = height - int(height * self.bottom_margin)
+
+        left_fit, left_points, self.left_tracked = self._search(
+            road, geometry, margin, half, bottom, self.left if self.left_tracked else None)
+        right_fit, right_points, self.right_tracked = self._search(
+            road, geometry, half, width - margin, bottom, self.right if self.right_tracked else None)
+
+        detection = LaneDetection(frame, left_fit, right_fit, left_fit is not None, right_fit is not None,
+                                  left_points, right_points, buffers.frame_allocations)
+        return self.apply_fallback(detection)
+
+    def _search(self, road: np.ndarray, geometry: LaneGeometry, start: int, stop: int, bottom: int,
+                predicted: Optional[np.ndarray]) -> Tuple[Optional[np.ndarray], int, bool]:
+        # fits the line of the side between the columns [start, stop), in the band around the predicted line if any
+        height, width = geometry.height, geometry.width
+        band = width * self.band_margin
+        if predicted is None:
+            self.full_searches += 1
+        else:
+            ends = (predicted[0], predicted[0] + predicted[1] * (bottom - 1))
+            start = max(start, int(np.floor(min(ends) - band)))
+            stop = min(stop, int(np.ceil(max(ends) + band)) + 1)
+            if start >= stop:  # the line left its side of the frame
+                return None, 0, False
+            self.windowed_searches += 1
+
+        crop_start = max(0, start - self._pad)
+        crop_stop = min(width, stop + self._pad)
+        top_down = geometry.warp_roi(road, crop_start, crop_stop, dst=self.buffers.get('top_down', (height, crop_stop - crop_start)))
+        binary = self._binarize(top_down)
+        self.searched_pixels += binary.size
+
+        xs, ys = extract_points(binary[:bottom, start - crop_start:stop - crop_start], start)
+        if predicted is not None:
+            inside = np.abs(xs - (predicted[0] + predicted[1] * ys)) <= band
+            xs, ys = xs[inside], ys[inside]
+        fit, points = self._fit_points(xs, ys)
+        if fit is not None and predicted is not None:
+            fit = self.smoothing * fit + (1 - self.smoothing) * predicted
+        return fit, points, fit is not None and points >= self.track_min_points
@@ -0,0 +1,236 @@
+import numpy as np
+
+from typing import *
+
+
+class FitMethod:
+    """How LineFitter fits a line x = c[0] + c[1] * y on the points of a lane marking.
+
+    LEAST_SQUARES -- Closed form least squares from the sums of the points: the same line as
+        np.polynomial.polynomial.polyfit(ys, xs, 1), without building and solving its Vandermonde system.
+    RANSAC -- The line through two points with the most points within RANSAC_THRESHOLD of it, over a fixed number
+        of candidate pairs scored on a subsample, refitted by least squares on all the points within
+        RANSAC_THRESHOLD of it: noise and other markings falling in the search area do not pull the line.
+    """
+    LEAST_SQUARES = 'least_squares'
+    RANSAC = 'ransac'
+    ALL = (LEAST_SQUARES, RANSAC)
+
+
+class FitParams:
+    """Wrapper for configuration constants"""
+    DEFAULT_METHOD = FitMethod.LEAST_SQUARES
+    STRATA = 16  # bands of rows the points are subsampled in, so every part of the line keeps points
+    RANSAC_ITERATIONS = 64  # candidate lines scored per fit
+    RANSAC_THRESHOLD = 10  # horizontal distance in pixels within which a point supports a candidate line
+    RANSAC_POINTS = 128  # points the candidates are drawn from and scored on (a stratified subsample)
+    RANSAC_SEED = 0
+
+
+class LineSums:
+    """Running sums of points, from which the least squares line x = c[0] + c[1] * y is computed in closed form.
+
+    Points can be added in several batches (e.g. the tiles of a frame) without keeping them. Unweighted
+    integer coordinates (pixels) are summed exactly, so the only rounding is in the final division.
+
+    Attributes:
+        n: float -- The number of points (the sum of their weights when weighted).
+        sum_x: float -- The sum of the x coordinates.
+        sum_y: float -- The sum of the y coordinates.
+        sum_yy: float -- The sum of the squared y coordinates.
+        sum_xy: float -- The sum of the products of the coordinates.
+
+    Methods:
+        add(xs: np.ndarray, ys: np.ndarray, weights: Optional[np.ndarray] = None) -- Adds points to the sums.
+        fit() -> Optional[np.ndarray] -- Returns the least squares line of the points added.
+    """
+    n: float
+    sum_x: float
+    sum_y: float
+    sum_yy: float
+    sum_xy: float
+
+    def __init__(self):
+        """Initializes empty LineSums."""
+        self.n = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.sum_yy = 0
+        self.sum_xy = 0
+
+    def add(self, xs: np.ndarray, ys: np.ndarray, weights: Optional[np.ndarray] = None):
+        """Adds points to the sums.
+
+        Args:
+            xs: np.ndarray -- The x coordinates of the points.
+            ys: np.ndarray -- The y coordinates of the points.
+            weights = None: Optional[np.ndarray] -- The weight of every point, 1 if None.
+        """
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        # float64 dot products run in BLAS and hold the sums of integer pixel coordinates exactly (up to 2^53)
+        exact = weights is None and np.issubdtype(xs.dtype, np.integer) and np.issubdtype(ys.dtype, np.integer)
+        xs = xs.astype(np.float64, copy=False)
+        ys = ys.astype(np.float64, copy=False)
+        if exact:
+            self.n += len(ys)
+            self.sum_x += int(xs.sum())
+            self.sum_y += int(ys.sum())
+            self.sum_yy += int(ys.dot(ys))
+            self.sum_xy += int(xs.dot(ys))
+        elif weights is None:
+            self.n += len(ys)
+            self.sum_x += float(xs.sum())
+            self.sum_y += float(ys.sum())
+            self.sum_yy += float(ys.dot(ys))
+            self.sum_xy += float(xs.dot(ys))
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            weighted_ys = weights * ys
+            self.n += float(weights.sum())
+            self.sum_x += float(weights.dot(xs))
+            self.sum_y += float(weighted_ys.sum())
+            self.sum_yy += float(weighted_ys.dot(ys))
+            self.sum_xy += float(weighted_ys.dot(xs))
+
+    def fit(self) -> Optional[np.ndarray]:
+        """Returns the least squares line x = c[0] + c[1] * y of the points added.
+
+        Returns:
+            Optional[np.ndarray] -- The (c0, c1) coefficients, None if the points do not span two rows.
+        """
+        # n * var(y) and n * cov(x, y), exact for unweighted integer sums (Python ints do not overflow)
+        spread_yy = self.n * self.sum_yy - self.sum_y * self.sum_y
+        spread_xy = self.n * self.sum_xy - self.sum_x * self.sum_y
+        if self.n <= 0 or spread_yy <= 1e-9 * self.n * self.sum_yy:
+            return None
+        slope = spread_xy / spread_yy
+        return np.array([(self.sum_x - slope * self.sum_y) / self.n, slope])
+
+
+def fit_line(xs: np.ndarray, ys: np.ndarray, weights: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Returns the least squares line x = c[0] + c[1] * y of points, in closed form (see LineSums).
+
+    Args:
+        xs: np.ndarray -- The x coordinates of the points.
+        ys: np.ndarray -- The y coordinates of the points.
+        weights = None: Optional[np.ndarray] -- The weight of every point, 1 if None.
+
+    Returns:
+        Optional[np.ndarray] -- The (c0, c1) coefficients, None if the points do not span two rows.
+    """
+    sums = LineSums()
+    sums.add(xs, ys, weights)
+    return sums.fit()
+
+
+def subsample_points(xs: np.ndarray, ys: np.ndarray, max_points: int,
+                     strata: int = FitParams.STRATA) -> Tuple[np.ndarray, np.ndarray]:
+    """Keeps at most about max_points of points, evenly within bands of rows.
+
+    The rows spanned by the points are split into strata bands, and every band keeps at most
+    max_points / strata of its points, evenly spaced. The close, dense part of a marking therefore cannot
+    outweigh its far, sparse part, which a uniform subsample (or no subsample) lets happen.
+
+    Args:
+        xs: np.ndarray -- The x coordinates of the points.
+        ys: np.ndarray -- The y coordinates of the points, in increasing order (like extract_points() returns them).
+        max_points: int -- The number of points to keep at most.
+        strata = FitParams.STRATA: int -- The number of bands of rows.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The x and y coordinates of the points kept, in the same order.
+    """
+    if len(ys) <= max_points:
+        return xs, ys
+    # the points are sorted by row: every band is a slice, found by binary search, and only the indices kept
+    # are computed, so the cost follows max_points rather than the number of points
+    y_min = int(ys[0])
+    edges = (y_min + np.arange(strata + 1) * (int(ys[-1]) - y_min + 1) // strata).astype(ys.dtype)
+    starts = np.searchsorted(ys, edges[:-1])
+    counts = np.searchsorted(ys, edges[1:]) - starts
+    kept = np.minimum(counts, max(1, max_points // strata))
+    first_kept = np.cumsum(kept) - kept
+    steps = counts / np.maximum(kept, 1)
+    bands = np.repeat(np.arange(strata), kept)
+    ranks = np.arange(len(bands)) - first_kept[bands]
+    indices = starts[bands] + (ranks * steps[bands]).astype(np.intp)
+    return xs[indices], ys[indices]
+
+
+class LineFitter:
+    """Fits the lines of the lane markings with one of FitMethod, on all their points or on a subsample.
+
+    The random pairs of RANSAC are drawn once, when the LineFitter is created: fitting the same points always
+    gives the same line, whatever was fitted before (e.g. in another process).
+
+    Attributes:
+        method: str -- One of FitMethod.
+        max_points: Optional[int] -- The number of points the lines are fitted on at most (see subsample_points()),
+            None to fit on all of them.
+        threshold: float -- The horizontal distance within which a point supports a RANSAC candidate line.
+        iterations: int -- The number of candidate lines RANSAC scores.
+
+    Methods:
+        fit(xs: np.ndarray, ys: np.ndarray) -> Optional[np.ndarray] -- Returns the line of the points.
+    """
+    method: str
+    max_points: Optional[int]
+    threshold: float
+    iterations: int
+
+    def __init__(self, method: str = FitParams.DEFAULT_METHOD, max_points: Optional[int] = None,
+                 threshold: float = FitParams.RANSAC_THRESHOLD, iterations: int = FitParams.RANSAC_ITERATIONS):
+        """Initializes the LineFitter.
+
+        Args:
+            method = FitParams.DEFAULT_METHOD: str -- One of FitMethod.
+            max_points = None: Optional[int] -- The number of points the lines are fitted on at most, None for all.
+            threshold = FitParams.RANSAC_THRESHOLD: float -- The inlier distance of RANSAC, in pixels.
+            iterations = FitParams.RANSAC_ITERATIONS: int -- The number of candidate lines of RANSAC.
+        """
+        if method not in FitMethod.ALL:
+            raise ValueError(f'Unknown fit method {method!r}, expected one of {FitMethod.ALL}')
+        self.method = method
+        self.max_points = max_points
+        self.threshold = threshold
+        self.iterations = iterations
+        self._pairs = np.random.default_rng(FitParams.RANSAC_SEED).random((2, iterations))
+
+    def fit(self, xs: np.ndarray, ys: np.ndarray) -> Optional[np.ndarray]:
+        """Returns the line x = c[0] + c[1] * y of points.
+
+        Args:
+            xs: np.ndarray -- The x coordinates of the points.
+            ys: np.ndarray -- The y coordinates of the points, in increasing order.
+
+        Returns:
+            Optional[np.ndarray] -- The (c0, c1) coefficients, None if the points do not span two rows.
+        """
+        if self.max_points is not None:
+            xs, ys = subsample_points(xs, ys, self.max_points)
+        if self.method == FitMethod.RANSAC:
+            return self._ransac(xs, ys)
+        return fit_line(xs, ys)
+
+    def _ransac(self, xs: np.ndarray, ys: np.ndarray) -> Optional[np.ndarray]:
+        if len(ys) < 2:
+            return None
+        sample_xs, sample_ys = subsample_points(xs, ys, FitParams.RANSAC_POINTS)
+        first, second = (self._pairs * len(sample_ys)).astype(np.intp)
+        dy = (sample_ys[second] - sample_ys[first]).astype(np.float64)
+        valid = dy != 0  # a pair on one row does not define x = f(y)
+        if not valid.any():
+            return None
+        first, second, dy = first[valid], second[valid], dy[valid]
+        slopes = (sample_xs[second] - sample_xs[first]) / dy
+        intercepts = sample_xs[first] - slopes * sample_ys[first]
+
+        # all the candidates are scored at once on the sample, in float32: (candidates, points) residuals
+        residuals = np.outer(slopes.astype(np.float32), sample_ys.astype(np.float32))
+        residuals += intercepts.astype(np.float32)[:, None]
+        residuals -= sample_xs.astype(np.float32)
+        np.abs(residuals, out=residuals)
+        best = np.argmax((residuals <= self.threshold).sum(axis=1))
+        inliers = np.abs(xs - (intercepts[best] + slopes[best] * ys)) <= self.threshold
+        return fit_line(xs[inliers], ys[inliers])
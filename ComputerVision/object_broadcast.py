@@ -0,0 +1,288 @@
+import socket
+import threading
+import datetime
+import time
+
+import numpy as np
+
+from typing import *
+
+from object_serializers import Serializer, get_serializer
+from frame_codecs import FrameCodec, RAW_CODEC, get_frame_codec
+from object_socket import (ObjectSocketParams, parse_endpoint, format_endpoint, _create_listening_socket,
+                           _close_listening_socket, _negotiate_sender_serializer, _encode_object_body,
+                           _encode_array_body, _encode_message_header, _sendmsg_all)
+from send_queue import BoundedSendQueue, SlowConsumerPolicy
+
+
+class BroadcastParams:
+    """Wrapper for configuration constants"""
+    LISTEN_BACKLOG = 16
+    QUEUE_CAPACITY = 4
+    CLOSE_TIMEOUT_S = 5  # time close() gives the receivers to read their pending messages before disconnecting them
+    JOIN_TIMEOUT_S = 1
+
+
+class Subscriber:
+    """A receiver connected to an ObjectBroadcastSocket, with its own queue and writer thread.
+
+    Attributes:
+        conn: socket.socket -- The connection to the receiver.
+        address: Any -- The address of the receiver.
+        serializer: Serializer -- The serializer negotiated with the receiver.
+        wire_version: int -- The wire version negotiated with the receiver.
+        queue: BoundedSendQueue -- The messages waiting to be written to the receiver.
+        sent: int -- The number of messages written to the receiver.
+        thread: threading.Thread -- The thread writing to the receiver.
+    """
+    conn: socket.socket
+    address: Any
+    serializer: Serializer
+    wire_version: int
+    queue: BoundedSendQueue
+    sent: int
+    thread: threading.Thread
+
+    def __init__(self, conn: socket.socket, address: Any, serializer: Serializer, wire_version: int,
+                 queue: BoundedSendQueue):
+        self.conn = conn
+        self.address = address
+        self.serializer = serializer
+        self.wire_version = wire_version
+        self.queue = queue
+        self.sent = 0
+        self.thread = threading.current_thread()
+
+    def disconnect(self):
+        """Stops the subscriber: pending messages are discarded and the connection is shut down."""
+        self.queue.close()
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class ObjectBroadcastSocket:
+    """Sends the same objects to any number of ObjectReceiverSockets.
+
+    Receivers may connect at any time. Every object is serialized once per serializer in use (usually
+    once in total) and the same buffers are queued for all the receivers, each of them being written to
+    by its own thread. What happens when a receiver falls behind is decided by its SlowConsumerPolicy.
+
+    Since the queued buffers may point straight into the sent objects (e.g. with pickle5 or send_array),
+    objects must not be modified after being sent.
+
+    Sequence numbers are shared by all the receivers: a receiver sees the messages dropped for it by its
+    policy (or sent before it connected) as gaps in its metrics.
+
+    Attributes:
+        ip: Optional[str] -- The IP the socket listens on (TCP endpoints only).
+        port: Optional[int] -- The port the socket listens on (TCP endpoints only).
+        endpoint: str -- The endpoint URI the socket listens on.
+        sock: socket.socket -- The listening socket.
+        serializers: List[str] -- The names of the accepted serializers, in order of preference.
+        queue_capacity: int -- The maximum number of messages pending for a single receiver.
+        slow_consumer_policy: str -- The default SlowConsumerPolicy of the receivers.
+        policy_for_receiver: Optional[Callable[[Any], str]] -- Chooses the policy of a receiver from its address.
+        subscribers: List[Subscriber] -- The connected receivers.
+        print_when_awaiting_receiver: bool -- Whether to print when receivers connect or disconnect.
+        frame_codec: FrameCodec -- The compression applied to the arrays sent with send_array.
+
+    Methods:
+        await_receivers(count: int = 1, timeout_s: Optional[float] = None) -> bool -- Waits for receivers to connect.
+        send_object(obj: Any) -- Sends an object to all the connected receivers.
+        send_array(arr: Optional[np.ndarray]) -- Sends an array as a raw buffer to all the connected receivers.
+        receiver_count() -> int -- Returns the number of connected receivers.
+        close(timeout_s: float = BroadcastParams.CLOSE_TIMEOUT_S) -- Stops accepting receivers and closes all the connections.
+    """
+    ip: Optional[str]
+    port: Optional[int]
+    endpoint: str
+    sock: socket.socket
+    serializers: List[str]
+    queue_capacity: int
+    slow_consumer_policy: str
+    policy_for_receiver: Optional[Callable[[Any], str]]
+    subscribers: List[Subscriber]
+    print_when_awaiting_receiver: bool
+    frame_codec: FrameCodec
+
+    def __init__(self, ip: str, port: Optional[int] = None,
+                 serializers: Optional[Sequence[str]] = None,
+                 queue_capacity: int = BroadcastParams.QUEUE_CAPACITY,
+                 slow_consumer_policy: str = SlowConsumerPolicy.DROP_OLDEST,
+                 policy_for_receiver: Optional[Callable[[Any], str]] = None,
+                 print_when_awaiting_receiver: bool = False,
+                 frame_codec: Union[str, FrameCodec] = RAW_CODEC):
+        """Initializes the ObjectBroadcastSocket and starts accepting receivers in the background.
+
+        Args:
+            ip: str -- The IP to listen on, or an endpoint URI (see object_socket.parse_endpoint).
+            port = None: Optional[int] -- The port to listen on, only with an IP.
+            serializers = None: Optional[Sequence[str]] -- The names of the accepted serializers, in order of
+                preference, defaults to ObjectSocketParams.DEFAULT_SERIALIZERS.
+            queue_capacity = BroadcastParams.QUEUE_CAPACITY: int -- The maximum number of messages pending for a receiver.
+            slow_consumer_policy = SlowConsumerPolicy.DROP_OLDEST: str -- The default policy for slow receivers.
+            policy_for_receiver = None: Optional[Callable[[Any], str]] -- Called with the address of every new
+                receiver, returns its policy. Overrides slow_consumer_policy.
+            print_when_awaiting_receiver = False: bool -- Whether to print when receivers connect or disconnect.
+            frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with
+                send_array. Frames are compressed once for all the receivers.
+        """
+        family, address = parse_endpoint(ip, port)
+        self.ip, self.port = address if family != getattr(socket, 'AF_UNIX', None) else (None, None)
+        self.endpoint = format_endpoint(family, address)
+        self.serializers = list(serializers or ObjectSocketParams.DEFAULT_SERIALIZERS)
+        for name in self.serializers:
+            get_serializer(name)
+        self.queue_capacity = queue_capacity
+        self.slow_consumer_policy = slow_consumer_policy
+        self.policy_for_receiver = policy_for_receiver
+        self.subscribers = []
+        self.print_when_awaiting_receiver = print_when_awaiting_receiver
+        self.frame_codec = get_frame_codec(frame_codec)
+
+        self._lock = threading.Condition()
+        self._closed = False
+        self._seq = 0
+
+        self.sock = _create_listening_socket(family, address, BroadcastParams.LISTEN_BACKLOG)
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    def await_receivers(self, count: int = 1, timeout_s: Optional[float] = None) -> bool:
+        """Blocks until at least count receivers are connected.
+
+        Args:
+            count = 1: int -- The number of receivers to wait for.
+            timeout_s = None: Optional[float] -- How long to wait, None to wait forever.
+
+        Returns:
+            bool -- True if enough receivers are connected, False if the timeout elapsed.
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: len(self.subscribers) >= count, timeout_s)
+
+    def receiver_count(self) -> int:
+        """Returns the number of connected receivers.
+
+        Returns:
+            int -- The number of connected receivers.
+        """
+        with self._lock:
+            return len(self.subscribers)
+
+    def send_object(self, obj: Any):
+        """Sends an object to all the connected receivers.
+
+        The object is serialized once for every serializer used by the receivers and the resulting
+        buffers are shared by all the receivers using that serializer.
+
+        Args:
+            obj: Any -- The object to send.
+        """
+        seq, sent_ns = self._stamp()
+        bodies = {}
+        for subscriber in self._snapshot():
+            name = subscriber.serializer.name
+            if name not in bodies:
+                bodies[name] = _encode_object_body(subscriber.serializer, obj)
+            self._enqueue(subscriber, bodies[name], seq, sent_ns)
+
+    def send_array(self, arr: Optional[np.ndarray]):
+        """Sends an array to all the connected receivers, to be received with recv_array.
+
+        Args:
+            arr: Optional[np.ndarray] -- The array to send, or None to signal the end of the stream.
+        """
+        seq, sent_ns = self._stamp()
+        subscribers = self._snapshot()
+        if subscribers:
+            body = _encode_array_body(arr, self.frame_codec)
+            for subscriber in subscribers:
+                self._enqueue(subscriber, body, seq, sent_ns)
+
+    def close(self, timeout_s: float = BroadcastParams.CLOSE_TIMEOUT_S):
+        """Stops accepting receivers, writes the pending messages and closes all the connections.
+
+        A receiver which has not read its pending messages within timeout_s (e.g. one which stopped reading)
+        is disconnected, so it cannot keep the sender from closing.
+
+        Args:
+            timeout_s = BroadcastParams.CLOSE_TIMEOUT_S: float -- How long to wait for the pending messages to be written.
+        """
+        with self._lock:
+            self._closed = True
+            subscribers = list(self.subscribers)
+        _close_listening_socket(self.sock)
+        for subscriber in subscribers:
+            subscriber.queue.close()
+        deadline = time.monotonic() + timeout_s
+        for subscriber in subscribers:
+            subscriber.thread.join(max(0.0, deadline - time.monotonic()))
+        for subscriber in subscribers:
+            if subscriber.thread.is_alive():  # stuck writing to a receiver which does not read
+                self._log(f'receiver {subscriber.address} did not read its pending messages, disconnecting it')
+                subscriber.disconnect()
+                subscriber.thread.join(BroadcastParams.JOIN_TIMEOUT_S)
+
+    def _snapshot(self) -> List[Subscriber]:
+        with self._lock:
+            return list(self.subscribers)
+
+    def _stamp(self) -> Tuple[int, int]:
+        seq = self._seq
+        self._seq += 1
+        return seq, time.monotonic_ns()
+
+    def _enqueue(self, subscriber: Subscriber, body: Tuple[int, List[Any]], seq: int, sent_ns: int):
+        body_size, buffers = body
+        message = [_encode_message_header(body_size, subscriber.wire_version, seq, sent_ns), *buffers]
+        if not subscriber.queue.put(message) and subscriber.queue.policy == SlowConsumerPolicy.DISCONNECT:
+            subscriber.disconnect()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, address = self.sock.accept()
+            except OSError:  # the listening socket was closed
+                return
+            threading.Thread(target=self._serve_receiver, args=(conn, address), daemon=True).start()
+
+    def _serve_receiver(self, conn: socket.socket, address: Any):
+        try:
+            serializer, wire_version = _negotiate_sender_serializer(conn, self.serializers)
+        except OSError:
+            conn.close()
+            return
+
+        policy = self.policy_for_receiver(address) if self.policy_for_receiver else self.slow_consumer_policy
+        subscriber = Subscriber(conn, address, serializer, wire_version, BoundedSendQueue(self.queue_capacity, policy))
+        with self._lock:
+            if self._closed:
+                conn.close()
+                return
+            self.subscribers.append(subscriber)
+            self._lock.notify_all()
+        self._log(f'receiver {address} connected (serializer: {serializer.name}, policy: {policy})')
+
+        try:
+            while True:
+                message = subscriber.queue.get()
+                if message is None:
+                    break
+                _sendmsg_all(conn, message)
+                subscriber.sent += 1
+                subscriber.queue.task_done()
+        except OSError:
+            pass
+        finally:
+            subscriber.queue.close()
+            conn.close()
+            with self._lock:
+                self.subscribers.remove(subscriber)
+            self._log(f'receiver {address} disconnected ({subscriber.sent} sent, {subscriber.queue.dropped} dropped)')
+
+    def _log(self, message: str):
+        if self.print_when_awaiting_receiver:
+            print(f'[{datetime.datetime.now()}][ObjectBroadcastSocket/{self.endpoint}] {message}')
@@ -0,0 +1,178 @@
+import json
+import pickle
+import struct
+
+from typing import *
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, the codec is only registered when it is installed
+    msgpack = None
+
+
+class Serializer:
+    """Base class for the codecs used by object_socket to turn objects into bytes and back.
+
+    A serializer returns a list of buffers instead of a single bytes object, so payloads which already
+    live in memory (e.g. numpy arrays) can be handed to the socket as they are, without being copied
+    into one contiguous bytestring. The concatenation of the buffers is the body of one message.
+
+    Attributes:
+        name: str -- The name used to negotiate the serializer between peers (at most 255 ascii characters).
+
+    Methods:
+        dumps(obj: Any) -> List[Any] -- Serializes an object into a list of bytes-like buffers.
+        loads(data: memoryview) -> Any -- Deserializes an object from the body of a message.
+    """
+    name: str
+
+    def dumps(self, obj: Any) -> List[Any]:
+        """Serializes an object.
+
+        Args:
+            obj: Any -- The object to serialize.
+
+        Returns:
+            List[Any] -- Bytes-like buffers which, concatenated, form the body of the message.
+        """
+        raise NotImplementedError
+
+    def loads(self, data: memoryview) -> Any:
+        """Deserializes an object.
+
+        Args:
+            data: memoryview -- The body of the message.
+
+        Returns:
+            Any -- The deserialized object.
+        """
+        raise NotImplementedError
+
+
+class PickleSerializer(Serializer):
+    """Pickles the object with the default protocol. This is the wire format of peers which do not negotiate."""
+    name = 'pickle'
+
+    def dumps(self, obj: Any) -> List[Any]:
+        return [pickle.dumps(obj)]
+
+    def loads(self, data: memoryview) -> Any:
+        return pickle.loads(data)
+
+
+class Pickle5Serializer(Serializer):
+    """Pickles the object with protocol 5, shipping large buffers (e.g. numpy arrays) out-of-band.
+
+    Body layout: number of out-of-band buffers (4 bytes), the size of the pickle stream and of every
+    buffer (8 bytes each), the pickle stream, then the buffers. All integers are little endian.
+    The buffers are sent straight from the memory of the original objects and, on the receiving side,
+    the objects are rebuilt on top of the received body, so the payloads are never copied into
+    or out of the pickle stream.
+    """
+    name = 'pickle5'
+
+    def dumps(self, obj: Any) -> List[Any]:
+        buffers = []
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        table = struct.pack(f'<I{len(raw_buffers) + 1}Q', len(raw_buffers), len(data), *map(len, raw_buffers))
+        return [table, data, *raw_buffers]
+
+    def loads(self, data: memoryview) -> Any:
+        n_buffers, = struct.unpack_from('<I', data)
+        sizes = struct.unpack_from(f'<{n_buffers + 1}Q', data, 4)
+        offset = 4 + 8 * (n_buffers + 1)
+        segments = []
+        for size in sizes:
+            segments.append(data[offset:offset + size])
+            offset += size
+        return pickle.loads(segments[0], buffers=segments[1:])
+
+
+class JsonSerializer(Serializer):
+    """Encodes the object as utf-8 JSON. Meant for small control messages exchanged with non-python peers."""
+    name = 'json'
+
+    def dumps(self, obj: Any) -> List[Any]:
+        return [json.dumps(obj, separators=(',', ':')).encode('utf-8')]
+
+    def loads(self, data: memoryview) -> Any:
+        return json.loads(bytes(data))
+
+
+class MsgpackSerializer(Serializer):
+    """Encodes the object with msgpack. Compact and fast for small control messages (requires msgpack)."""
+    name = 'msgpack'
+
+    def dumps(self, obj: Any) -> List[Any]:
+        return [msgpack.packb(obj, use_bin_type=True)]
+
+    def loads(self, data: memoryview) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class StructSerializer(Serializer):
+    """Packs tuples of a fixed layout with the struct module. The cheapest codec for fixed-format messages.
+
+    Both peers have to register a StructSerializer with the same name and format.
+
+    Attributes:
+        name: str -- The name used to negotiate the serializer.
+        fmt: struct.Struct -- The compiled struct format.
+    """
+    fmt: struct.Struct
+
+    def __init__(self, name: str, fmt: str):
+        """Initializes the StructSerializer.
+
+        Args:
+            name: str -- The name used to negotiate the serializer, e.g. 'lane-lines'.
+            fmt: str -- The struct format of the messages, e.g. '<4d'.
+        """
+        self.name = name
+        self.fmt = struct.Struct(fmt)
+
+    def dumps(self, obj: Any) -> List[Any]:
+        return [self.fmt.pack(*obj)]
+
+    def loads(self, data: memoryview) -> Any:
+        return self.fmt.unpack(data)
+
+
+SERIALIZERS: Dict[str, Serializer] = {}
+
+
+def register_serializer(serializer: Serializer):
+    """Makes a serializer available for negotiation by the object sockets.
+
+    Args:
+        serializer: Serializer -- The serializer to register. Replaces any serializer with the same name.
+    """
+    if len(serializer.name.encode('ascii')) > 255:
+        raise ValueError(f'Serializer name too long: {serializer.name}')
+    SERIALIZERS[serializer.name] = serializer
+
+
+def get_serializer(name: str) -> Serializer:
+    """Returns the registered serializer with the given name.
+
+    Args:
+        name: str -- The name of the serializer.
+
+    Returns:
+        Serializer -- The serializer.
+
+    Raises:
+        KeyError -- If no serializer with this name is registered.
+    """
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise KeyError(f'Unknown serializer {name!r}, registered serializers: {list(SERIALIZERS)}') from None
+
+
+register_serializer(Pickle5Serializer())
+register_serializer(PickleSerializer())
+register_serializer(JsonSerializer())
+if msgpack is not None:
+    register_serializer(MsgpackSerializer())
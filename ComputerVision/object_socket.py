@@ -1,59 +1,577 @@
-import socket
+import os
 import select
-import pickle
+import socket
+import stat
+import struct
+import sys
 import datetime
+import time
+import threading
+import warnings
+
+import numpy as np
 
 from typing import *
 
+from object_serializers import Serializer, SERIALIZERS, get_serializer
+from frame_codecs import FrameCodec, RAW_CODEC, get_frame_codec, get_frame_codec_by_id
+from send_queue import BoundedSendQueue, SlowConsumerPolicy
+from socket_metrics import SocketMetrics
+
 
 class ObjectSocketParams:
     """Wrapper for configuration constants"""
     OBJECT_HEADER_SIZE_BYTES = 4
+    STAMPED_HEADER_FORMAT = '<IQQ'
+    ARRAY_PAYLOAD_SIZE_BYTES = 8
+    ARRAY_DIM_SIZE_BYTES = 4
     DEFAULT_TIMEOUT_S = 1
-    CHUNK_SIZE_BYTES = 1024
+    CHUNK_SIZE_BYTES = 1024 * 1024
+    MAX_SENDMSG_BUFFERS = 512
+    HANDSHAKE_MAGIC = b'\xffOSK'
+    HANDSHAKE_VERSION = 2
+    STAMPED_HEADER_VERSION = 2
+    HANDSHAKE_TIMEOUT_S = 0.5
+    LEGACY_SERIALIZER = 'pickle'
+    DEFAULT_SERIALIZERS = ('pickle5', 'pickle')
+    SEND_QUEUE_CAPACITY = 1
+    BATCH_MAX_DELAY_S = 0.005
+    METRICS_LOG_INTERVAL_S = 1
+    RECONNECT_INITIAL_BACKOFF_S = 0.05
+    RECONNECT_MAX_BACKOFF_S = 2
+    RECONNECT_SEND_TIMEOUT_S = 5
+    ACCEPT_POLL_INTERVAL_S = 0.1
+    MAX_MESSAGE_SIZE_BYTES = 512 * 1024 * 1024  # larger sizes are read as a stream out of sync, not allocated
+    KEEPALIVE_IDLE_S = 5  # a reconnecting receiver detects a vanished sender after IDLE + INTERVAL * PROBES
+    KEEPALIVE_INTERVAL_S = 1
+    KEEPALIVE_PROBES = 3
+    SERVER_LISTEN_BACKLOG = 100
+
+
+class ConnectionState:
+    """Wrapper for the states of the connection of an ObjectSenderSocket or ObjectReceiverSocket
+
+    CONNECTING -> CONNECTED -> DISCONNECTED -> CONNECTING -> ..., and any state -> CLOSED (final).
+    """
+    CONNECTING = 'connecting'  # awaiting the receiver / connecting to the sender, then handshaking
+    CONNECTED = 'connected'  # messages can be exchanged
+    DISCONNECTED = 'disconnected'  # the connection was lost, no message can be exchanged until the next one
+    CLOSED = 'closed'  # closed by the user
+
+    TRANSITIONS = {CONNECTING: (CONNECTED, DISCONNECTED, CLOSED),
+                   CONNECTED: (DISCONNECTED, CLOSED),
+                   DISCONNECTED: (CONNECTING, CLOSED),
+                   CLOSED: (CLOSED,)}
+
+
+def _check_transition(state: str, new_state: str):
+    """Raises a RuntimeError if the connection cannot go from state to new_state."""
+    if new_state not in ConnectionState.TRANSITIONS[state]:
+        raise RuntimeError(f'Invalid connection state transition: {state} -> {new_state}')
+
+
+def _encode_array_header(dtype: np.dtype, shape: Tuple[int, ...], codec_id: int, payload_size: int) -> bytes:
+    """Encodes the codec, the payload size, the dtype and the shape of an array into a compact header.
+
+    Layout: codec id (1 byte), payload size (ARRAY_PAYLOAD_SIZE_BYTES bytes), dtype string length (1 byte),
+    dtype string (ascii), number of dimensions (1 byte), then every dimension as an unsigned int of
+    ARRAY_DIM_SIZE_BYTES bytes. All integers are little endian.
+
+    Args:
+        dtype: np.dtype -- The dtype of the array.
+        shape: Tuple[int, ...] -- The shape of the array.
+        codec_id: int -- The id of the FrameCodec the payload was encoded with.
+        payload_size: int -- The size of the (encoded) payload which follows the header.
+
+    Returns:
+        bytes -- The encoded header.
+    """
+    if dtype.hasobject:
+        raise ValueError(f'Arrays of dtype {dtype} cannot be sent as raw buffers, use send_object instead.')
+    dtype_str = dtype.str.encode('ascii')
+    header = bytes([codec_id]) + payload_size.to_bytes(ObjectSocketParams.ARRAY_PAYLOAD_SIZE_BYTES, 'little')
+    header += struct.pack('<B', len(dtype_str)) + dtype_str + struct.pack('<B', len(shape))
+    for dim in shape:
+        header += dim.to_bytes(ObjectSocketParams.ARRAY_DIM_SIZE_BYTES, 'little')
+    return header
+
+
+def _decode_array_header(header: bytes) -> Tuple[int, int, np.dtype, Tuple[int, ...]]:
+    """Decodes a header created by _encode_array_header.
+
+    Args:
+        header: bytes -- The encoded header.
+
+    Returns:
+        Tuple[int, int, np.dtype, Tuple[int, ...]] -- The codec id, the payload size, the dtype and the shape of the array.
+
+    Raises:
+        socket.error -- If the payload size is above MAX_MESSAGE_SIZE_BYTES.
+    """
+    codec_id = header[0]
+    offset = 1 + ObjectSocketParams.ARRAY_PAYLOAD_SIZE_BYTES
+    payload_size = _check_size(int.from_bytes(header[1:offset], 'little'))
+    dtype_str_len = header[offset]
+    dtype = np.dtype(header[offset + 1:offset + 1 + dtype_str_len].decode('ascii'))
+    ndim = header[offset + 1 + dtype_str_len]
+    offset += 2 + dtype_str_len
+    dim_size = ObjectSocketParams.ARRAY_DIM_SIZE_BYTES
+    shape = tuple(int.from_bytes(header[offset + i * dim_size:offset + (i + 1) * dim_size], 'little')
+                  for i in range(ndim))
+    return codec_id, payload_size, dtype, shape
+
+
+def parse_endpoint(endpoint: str, port: Optional[int] = None) -> Tuple[int, Any]:
+    """Parses an endpoint into the socket family and the address to bind or connect to.
+
+    Accepted endpoints are 'tcp://host:port' (IPv6 hosts between brackets), 'unix:///path/to.sock'
+    (or 'unix://@name' for the Linux abstract namespace) and, as before endpoints existed, a bare IP with a port.
+
+    Args:
+        endpoint: str -- The endpoint URI, or an IP if port is given.
+        port = None: Optional[int] -- The TCP port, only with a bare IP.
+
+    Returns:
+        Tuple[int, Any] -- The socket family (socket.AF_INET, AF_INET6 or AF_UNIX) and the address.
+
+    Raises:
+        ValueError -- If the endpoint is malformed or its scheme is not supported.
+    """
+    if port is not None:
+        return (socket.AF_INET6 if ':' in endpoint else socket.AF_INET), (endpoint, port)
+
+    scheme, separator, rest = endpoint.partition('://')
+    if scheme == 'tcp' and separator:
+        host, separator, port_str = rest.rpartition(':')
+        if not separator or not port_str.isdigit():
+            raise ValueError(f'Invalid TCP endpoint {endpoint!r}, expected tcp://host:port')
+        if host.startswith('['):
+            return socket.AF_INET6, (host[1:-1], int(port_str))
+        return socket.AF_INET, (host, int(port_str))
+    if scheme == 'unix' and separator:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError(f'Unix domain sockets are not supported on this platform ({endpoint!r})')
+        if not rest:
+            raise ValueError(f'Invalid unix endpoint {endpoint!r}, expected unix:///path/to.sock')
+        return socket.AF_UNIX, ('\0' + rest[1:] if rest.startswith('@') else rest)
+    raise ValueError(f'Invalid endpoint {endpoint!r}, expected tcp://host:port or unix:///path, or an IP and a port')
+
+
+def format_endpoint(family: int, address: Any) -> str:
+    """Formats a socket family and address as an endpoint URI, the inverse of parse_endpoint.
+
+    Args:
+        family: int -- The socket family.
+        address: Any -- The address.
+
+    Returns:
+        str -- The endpoint URI.
+    """
+    if family == getattr(socket, 'AF_UNIX', None):
+        return 'unix://' + ('@' + address[1:] if address.startswith('\0') else address)
+    if family == socket.AF_INET6:
+        return f'tcp://[{address[0]}]:{address[1]}'
+    return f'tcp://{address[0]}:{address[1]}'
+
+
+def _create_listening_socket(family: int, address: Any, backlog: int) -> socket.socket:
+    """Creates a socket listening on the address, which may be reused right after a previous sender.
+
+    A unix socket file left behind by a sender which did not close properly is removed, but not the file
+    of a sender which is still listening.
+    """
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    if family == getattr(socket, 'AF_UNIX', None):
+        if not address.startswith('\0') and os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(address)
+            except ConnectionRefusedError:
+                os.unlink(address)
+            finally:
+                probe.close()
+    elif sys.platform != 'win32':  # a restarted sender can listen again while the old connection is in TIME_WAIT
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.listen(backlog)
+    return sock
+
+
+def _close_listening_socket(sock: socket.socket):
+    """Closes a socket created by _create_listening_socket, removing its unix socket file."""
+    address = sock.getsockname() if sock.family == getattr(socket, 'AF_UNIX', None) else None
+    sock.close()
+    if isinstance(address, str) and address and not address.startswith('\0'):  # abstract addresses are bytes
+        try:
+            os.unlink(address)
+        except FileNotFoundError:
+            pass
+
+
+def _message_header_size(wire_version: int) -> int:
+    """Returns the size of the header preceding every message with the given wire version."""
+    if wire_version >= ObjectSocketParams.STAMPED_HEADER_VERSION:
+        return struct.calcsize(ObjectSocketParams.STAMPED_HEADER_FORMAT)
+    return ObjectSocketParams.OBJECT_HEADER_SIZE_BYTES
+
+
+def _encode_message_header(body_size: int, wire_version: int, seq: int, sent_ns: int) -> bytes:
+    """Encodes the header preceding every message.
+
+    Up to wire version 1, the header is only the size of the body (OBJECT_HEADER_SIZE_BYTES bytes, little endian).
+    From STAMPED_HEADER_VERSION on, the size is followed by the sequence number of the message and the
+    time.monotonic_ns() of the sender when it was sent, both as 8-byte unsigned integers (STAMPED_HEADER_FORMAT).
+
+    Args:
+        body_size: int -- The size field (the size of the serialized object, or of the array header).
+        wire_version: int -- The version negotiated with the peer (0 for peers without handshake).
+        seq: int -- The sequence number of the message.
+        sent_ns: int -- The send timestamp of the message.
+
+    Returns:
+        bytes -- The encoded header.
+    """
+    if wire_version >= ObjectSocketParams.STAMPED_HEADER_VERSION:
+        return struct.pack(ObjectSocketParams.STAMPED_HEADER_FORMAT, body_size, seq, sent_ns)
+    return body_size.to_bytes(ObjectSocketParams.OBJECT_HEADER_SIZE_BYTES, 'little')
+
+
+def _decode_message_header(header: Any, wire_version: int) -> Tuple[int, Optional[int], Optional[int]]:
+    """Decodes a header created by _encode_message_header.
+
+    Args:
+        header: Any -- The bytes-like header, of _message_header_size(wire_version) bytes.
+        wire_version: int -- The version negotiated with the peer.
+
+    Returns:
+        Tuple[int, Optional[int], Optional[int]] -- The size field, the sequence number and the send timestamp
+            (None for both if the wire version has no stamps).
+
+    Raises:
+        socket.error -- If the size field is above MAX_MESSAGE_SIZE_BYTES.
+    """
+    if wire_version >= ObjectSocketParams.STAMPED_HEADER_VERSION:
+        size, seq, sent_ns = struct.unpack(ObjectSocketParams.STAMPED_HEADER_FORMAT, header)
+        return _check_size(size), seq, sent_ns
+    return _check_size(int.from_bytes(header, 'little')), None, None
+
+
+def _check_size(n_bytes: int) -> int:
+    """Returns a size read from the stream, raising a socket.error if it is too large to be genuine."""
+    if n_bytes > ObjectSocketParams.MAX_MESSAGE_SIZE_BYTES:
+        # e.g. the handshake or the header of another wire version read as a size: the stream is out of sync
+        raise socket.error(f'Size of {n_bytes} bytes above MAX_MESSAGE_SIZE_BYTES '
+                           f'({ObjectSocketParams.MAX_MESSAGE_SIZE_BYTES}), the stream is out of sync.')
+    return n_bytes
+
+
+def _sendmsg_all(conn: socket.socket, buffers: List[Any]):
+    """Sends several buffers back to back, like calling sendall on their concatenation.
+
+    The buffers are handed to the kernel together with sendmsg (scatter/gather), so they are neither
+    joined in python nor sent with one syscall each. Falls back to sendall on platforms without sendmsg.
+
+    Args:
+        conn: socket.socket -- The connected socket.
+        buffers: List[Any] -- The bytes-like buffers to send, in order.
+    """
+    if not hasattr(conn, 'sendmsg'):
+        for buffer in buffers:
+            conn.sendall(buffer)
+        return
+
+    views = [memoryview(buffer).cast('B') for buffer in buffers]
+    first = 0
+    while first < len(views):
+        n_sent = conn.sendmsg(views[first:first + ObjectSocketParams.MAX_SENDMSG_BUFFERS])
+        while first < len(views) and n_sent >= len(views[first]):
+            n_sent -= len(views[first])
+            first += 1
+        if n_sent:
+            views[first] = views[first][n_sent:]
+
+
+def _recv_into(conn: socket.socket, view: memoryview, timeout_s: float, chunk_size_bytes: int):
+    """Fills the given memoryview with data from the connection.
+
+    Data is received with recv_into in reads of at most chunk_size_bytes, directly into the target.
+    The timeout applies to the whole view (a single deadline), not to every read.
+
+    Args:
+        conn: socket.socket -- The connected socket.
+        view: memoryview -- The writable target which is filled completely.
+        timeout_s: float -- Time allowed for the whole view to be received.
+        chunk_size_bytes: int -- The maximum number of bytes requested by a single read.
+
+    Raises:
+        socket.error -- If the deadline passes or the peer closes the connection before the view is filled.
+    """
+    n_bytes = len(view)
+    bytes_received = 0
+    deadline = time.monotonic() + timeout_s
+    while bytes_received < n_bytes:
+        time_left_s = deadline - time.monotonic()
+        if time_left_s <= 0:
+            raise socket.error(f'Timeout elapsed before the whole data was received. '
+                               f'{bytes_received} / {n_bytes} bytes received.')
+        conn.settimeout(time_left_s)
+        try:
+            n_received = conn.recv_into(view[bytes_received:], min(chunk_size_bytes, n_bytes - bytes_received))
+        except socket.timeout:
+            raise socket.error(f'Timeout elapsed before the whole data was received. '
+                               f'{bytes_received} / {n_bytes} bytes received.')
+        if n_received == 0:
+            raise socket.error(f'Connection closed by the peer. {bytes_received} / {n_bytes} bytes received.')
+        bytes_received += n_received
+
+
+def _recv_exactly(conn: socket.socket, n_bytes: int, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S) -> bytearray:
+    data = bytearray(n_bytes)
+    _recv_into(conn, memoryview(data), timeout_s, ObjectSocketParams.CHUNK_SIZE_BYTES)
+    return data
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = name.encode('ascii')
+    return bytes([len(encoded)]) + encoded
+
+
+def _recv_name(conn: socket.socket, timeout_s: float) -> str:
+    name_size = _recv_exactly(conn, 1, timeout_s)[0]
+    return _recv_exactly(conn, name_size, timeout_s).decode('ascii')
+
+
+def _enable_keepalive(conn: socket.socket):
+    """Enables TCP keepalive on a connection, so that a peer which vanished without closing it is detected."""
+    if conn.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', ObjectSocketParams.KEEPALIVE_IDLE_S),
+                          ('TCP_KEEPINTVL', ObjectSocketParams.KEEPALIVE_INTERVAL_S),
+                          ('TCP_KEEPCNT', ObjectSocketParams.KEEPALIVE_PROBES)):
+        if hasattr(socket, option):  # the system defaults (hours) are kept where they cannot be set
+            conn.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+def _negotiate_sender_serializer(conn: socket.socket, serializers: List[str]) -> Tuple[Serializer, int]:
+    """Sender side of the handshake: waits for the receiver's list of serializers and answers with the chosen one.
+
+    The wire version of the connection is the lowest of the two versions. If the receiver does not send a
+    handshake within HANDSHAKE_TIMEOUT_S, it is assumed to be an older receiver and the legacy pickle format
+    is used, with wire version 0.
+
+    Args:
+        conn: socket.socket -- The connection to the receiver.
+        serializers: List[str] -- The names of the serializers accepted by the sender, in order of preference.
+
+    Returns:
+        Tuple[Serializer, int] -- The serializer and the wire version to use on this connection.
+
+    Raises:
+        socket.error -- If the receiver does not offer any of the accepted serializers.
+    """
+    magic = ObjectSocketParams.HANDSHAKE_MAGIC
+    timeout_s = ObjectSocketParams.HANDSHAKE_TIMEOUT_S
+    try:
+        hello = _recv_exactly(conn, len(magic) + 2, timeout_s)
+    except socket.error:
+        hello = None
+    if hello is None or hello[:len(magic)] != magic:
+        conn.settimeout(None)
+        return get_serializer(ObjectSocketParams.LEGACY_SERIALIZER), 0
+
+    wire_version = min(hello[len(magic)], ObjectSocketParams.HANDSHAKE_VERSION)
+    offered = [_recv_name(conn, timeout_s) for _ in range(hello[len(magic) + 1])]
+    common = [name for name in serializers if name in offered]
+    if not common:
+        raise socket.error(f'No common serializer with the receiver. Offered: {offered}, accepted: {serializers}')
+
+    serializer = get_serializer(common[0])
+    conn.sendall(magic + bytes([wire_version]) + _encode_name(serializer.name))
+    conn.settimeout(None)
+    return serializer, wire_version
+
+
+def _encode_object_body(serializer: Serializer, obj: Any) -> Tuple[int, List[Any]]:
+    """Serializes an object into the body of one message. Returns the size field of the header and the buffers."""
+    buffers = serializer.dumps(obj)
+    return _message_size(buffers), buffers
+
+
+def _encode_array_body(arr: Optional[np.ndarray], codec: FrameCodec = RAW_CODEC) -> Tuple[int, List[Any]]:
+    """Encodes an array (or the end of stream marker, for None) into the body of one array message.
+
+    The size field of an array message is the size of the array header, 0 marking the end of the stream.
+    """
+    if arr is None:
+        return 0, []
+
+    arr = np.ascontiguousarray(arr)
+    payload = codec.encode(arr)
+    header = _encode_array_header(arr.dtype, arr.shape, codec.id, memoryview(payload).nbytes)
+    return len(header), [header, payload]
+
+
+def _encode_object_message(serializer: Serializer, obj: Any, wire_version: int = 0, seq: int = 0,
+                           sent_ns: int = 0) -> List[Any]:
+    """Serializes an object into the buffers of one message: the header followed by the serialized body."""
+    body_size, body = _encode_object_body(serializer, obj)
+    return [_encode_message_header(body_size, wire_version, seq, sent_ns), *body]
+
+
+def _encode_array_message(arr: Optional[np.ndarray], codec: FrameCodec = RAW_CODEC, wire_version: int = 0,
+                          seq: int = 0, sent_ns: int = 0) -> List[Any]:
+    """Encodes an array (or the end of stream marker, for None) into the buffers of one array message."""
+    body_size, body = _encode_array_body(arr, codec)
+    return [_encode_message_header(body_size, wire_version, seq, sent_ns), *body]
+
+
+def _message_size(buffers: List[Any]) -> int:
+    return sum(memoryview(buffer).nbytes for buffer in buffers)
 
 
 class ObjectSenderSocket:
-    """Sends objects to a receiver socket. Uses pickle to serialize the objects.
+    """Sends objects to a receiver socket.
+
+    The serializer is negotiated with the receiver when it connects: the first serializer from
+    serializers which the receiver also supports is used. Receivers which do not take part in the
+    handshake (older versions of this module) are served with plain pickle.
+    Every message is stamped with a sequence number and a send timestamp when the receiver supports it.
+
+    With reconnect enabled, losing the receiver is not an error: the message being written is discarded
+    (the next connection starts on a message boundary) and the messages sent while no receiver is connected
+    are dropped, until a new receiver connects. New receivers are accepted (and answered the handshake) in
+    the background as soon as they connect, not on the next send. Sequence numbers go on across
+    connections, so a receiver which comes back sees the messages it missed as a gap.
+
+    The sender listens on a TCP or a unix domain socket endpoint (see parse_endpoint), the latter being
+    faster between processes of the same host. It can also be given an already connected socket, e.g. one
+    end of a socket.socketpair() (see object_socket_pair).
     
     Attributes:
-        ip: str -- The IP of the receiver socket.
-        port: int -- The port of the receiver socket.
-        sock: socket.socket -- The socket used to send the objects.
+        ip: Optional[str] -- The IP of the receiver socket (TCP endpoints only).
+        port: Optional[int] -- The port of the receiver socket (TCP endpoints only).
+        endpoint: str -- The endpoint URI the socket listens on.
+        sock: Optional[socket.socket] -- The listening socket (None if the sender was given a connected socket).
         conn: socket.socket -- The connection socket.
+        state: str -- The ConnectionState of the socket.
+        reconnect: bool -- Whether a new receiver is accepted when the connection is lost.
+        reconnects: int -- The number of receivers accepted after the first one.
         print_when_awaiting_receiver: bool -- Whether to print when awaiting the receiver.
-        print_when_sending_object: bool -- Whether to print when sending an object.
+        print_when_sending_object: bool -- Deprecated, see metrics_log_interval_s.
+        serializers: List[str] -- The names of the accepted serializers, in order of preference.
+        serializer: Serializer -- The serializer negotiated with the connected receiver.
+        wire_version: int -- The wire version negotiated with the connected receiver (0 for older receivers).
+        metrics: SocketMetrics -- The throughput of the sent messages.
+        frame_codec: FrameCodec -- The compression applied to the arrays sent with send_array.
+        batch_max_bytes: int -- Size of the pending messages which triggers a flush, 0 when batching is disabled.
+        batch_max_delay_s: float -- Maximum time a message is kept pending when batching.
     
     Methods:
         await_receiver_conection() -- Awaits the receiver connection.
         close() -- Closes the connection.
         is_connected() -> bool -- Returns whether the connection is active.
         send_object(obj: Any) -- Sends an object to the receiver socket.
+        send_array(arr: Optional[np.ndarray]) -- Sends an array as a raw buffer to the receiver socket.
+        flush() -- Sends the messages pending in the current batch.
+        dropped_objects() -> int -- Returns the number of messages dropped because no receiver was connected.
     """
-    ip: str
-    port: int
-    sock: socket.socket
+    ip: Optional[str]
+    port: Optional[int]
+    endpoint: str
+    sock: Optional[socket.socket]
     conn: socket.socket
+    state: str
+    reconnect: bool
+    reconnects: int
     print_when_awaiting_receiver: bool
     print_when_sending_object: bool
+    serializers: List[str]
+    serializer: Serializer
+    wire_version: int
+    metrics: SocketMetrics
+    frame_codec: FrameCodec
+    batch_max_bytes: int
+    batch_max_delay_s: float
 
-    def __init__(self, ip: str, port: int,
+    def __init__(self, ip: Union[str, socket.socket], port: Optional[int] = None,
                  print_when_awaiting_receiver: bool = False,
-                 print_when_sending_object: bool = False):
+                 print_when_sending_object: bool = False,
+                 serializers: Optional[Sequence[str]] = None,
+                 frame_codec: Union[str, FrameCodec] = RAW_CODEC,
+                 batch_max_bytes: int = 0,
+                 batch_max_delay_s: float = ObjectSocketParams.BATCH_MAX_DELAY_S,
+                 metrics_log_interval_s: Optional[float] = None,
+                 reconnect: bool = False):
         """Initializes the ObjectSenderSocket and awaits the receiver connection.
 
+        With batching enabled (batch_max_bytes > 0), messages are not written right away: they are
+        coalesced and written together with a single sendmsg once batch_max_bytes are pending or the
+        oldest pending message is batch_max_delay_s old (or on flush/close). Objects must not be
+        modified until they are flushed. The delayed writes are done by a flusher thread: when one fails
+        (without reconnect), the error is raised by the next send or flush.
+
         Args:
-            ip: str -- The IP of the receiver socket.
-            port: int -- The port of the receiver socket.
+            ip: Union[str, socket.socket] -- The IP to listen on, an endpoint URI (e.g. 'unix:///run/lane.sock')
+                or a connected socket.
+            port = None: Optional[int] -- The port to listen on, only with an IP.
             print_when_awaiting_receiver = False: bool -- Whether to print when awaiting the receiver.
-            print_when_sending_object = False: bool -- Whether to print when sending an object.
+            print_when_sending_object = False: bool -- Deprecated: prints the metrics every
+                ObjectSocketParams.METRICS_LOG_INTERVAL_S instead of a line per object.
+            serializers = None: Optional[Sequence[str]] -- The names of the accepted serializers, in order of
+                preference, defaults to ObjectSocketParams.DEFAULT_SERIALIZERS.
+            frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with
+                send_array, either the name of a registered codec or a codec with custom parameters
+                (e.g. JpegCodec(quality=70)). The receiver reads the codec from the array header.
+            batch_max_bytes = 0: int -- Size of the pending messages which triggers a flush, 0 disables batching.
+            batch_max_delay_s = ObjectSocketParams.BATCH_MAX_DELAY_S: float -- Maximum time a message is kept pending.
+            metrics_log_interval_s = None: Optional[float] -- The interval between two printed metrics summaries,
+                None to never print them.
+            reconnect = False: bool -- Whether to accept a new receiver when the connection is lost, instead of
+                raising. A receiver which stops reading for RECONNECT_SEND_TIMEOUT_S is considered lost.
+                Not possible with a connected socket.
         """
-        self.ip = ip
-        self.port = port
+        if isinstance(ip, socket.socket) and reconnect:
+            raise ValueError('A sender given a connected socket cannot accept a new receiver, reconnect must be False')
+        self.serializers = list(serializers or ObjectSocketParams.DEFAULT_SERIALIZERS)
+        for name in self.serializers:
+            get_serializer(name)
+        self.serializer = get_serializer(ObjectSocketParams.LEGACY_SERIALIZER)
+        self.wire_version = 0
+        if print_when_sending_object:
+            warnings.warn('print_when_sending_object is deprecated, use metrics_log_interval_s instead',
+                          DeprecationWarning, stacklevel=2)
+            metrics_log_interval_s = metrics_log_interval_s or ObjectSocketParams.METRICS_LOG_INTERVAL_S
+        self.metrics = SocketMetrics(log_interval_s=metrics_log_interval_s)
+        self._seq = 0
+        self.frame_codec = get_frame_codec(frame_codec)
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_max_delay_s = batch_max_delay_s
+        self._batch = []
+        self._batch_size = 0
+        self._batch_count = 0
+        self._batch_lock = threading.Lock()
+        self._batch_ready = threading.Condition(self._batch_lock)
+        self._batch_deadline = None  # time.monotonic() by which the pending batch must be written
+        self._flusher = None
+        self._error = None
+        self.state = ConnectionState.DISCONNECTED
+        self.reconnect = reconnect
+        self.reconnects = 0
+        self._connection_id = 0
+        self._dropped = 0
+        self._connect_lock = threading.Lock()
+        self._accept_thread = None
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.bind((self.ip, self.port))
-        self.conn = None
+        if isinstance(ip, socket.socket):
+            self.ip, self.port, self.endpoint = None, None, f'fd://{ip.fileno()}'
+            self.sock, self.conn = None, ip
+        else:
+            family, address = parse_endpoint(ip, port)
+            self.ip, self.port = address if family != getattr(socket, 'AF_UNIX', None) else (None, None)
+            self.endpoint = format_endpoint(family, address)
+            self.sock = _create_listening_socket(family, address, 1)
+            self.conn = None
 
         self.print_when_awaiting_receiver = print_when_awaiting_receiver
         self.print_when_sending_object = print_when_sending_object
@@ -65,19 +583,59 @@ class ObjectSenderSocket:
 
         Prints a message if print_when_awaiting_receiver is True.
         """
+        self._set_state(ConnectionState.CONNECTING)
         if self.print_when_awaiting_receiver:
-            print(f'[{datetime.datetime.now()}][ObjectSenderSocket/{self.ip}:{self.port}] awaiting receiver connection...')
+            print(f'[{datetime.datetime.now()}][ObjectSenderSocket/{self.endpoint}] awaiting receiver connection...')
 
-        self.sock.listen(1)
-        self.conn, _ = self.sock.accept()
+        if self.sock is not None:
+            self.conn, _ = self.sock.accept()
+        self._negotiate_serializer()
+        if self.reconnect:
+            self.conn.settimeout(ObjectSocketParams.RECONNECT_SEND_TIMEOUT_S)
+        if self._connection_id > 0:
+            self.reconnects += 1
+        self._connection_id += 1
+        self._set_state(ConnectionState.CONNECTED)
 
         if self.print_when_awaiting_receiver:
-            print(f'[{datetime.datetime.now()}][ObjectSenderSocket/{self.ip}:{self.port}] receiver connected')
+            print(f'[{datetime.datetime.now()}][ObjectSenderSocket/{self.endpoint}] receiver connected '
+                  f'(serializer: {self.serializer.name}, wire version: {self.wire_version})')
+
+    def _negotiate_serializer(self):
+        try:
+            self.serializer, self.wire_version = _negotiate_sender_serializer(self.conn, self.serializers)
+        except socket.error:
+            if not self.reconnect:
+                self.close()
+                raise
+            self._connection_lost('handshake failed')
+            raise
 
     def close(self):
-        """Closes the connection."""
-        self.conn.close()
-        self.conn = None
+        """Sends the pending messages, closes the connection and stops listening."""
+        with self._connect_lock:  # waits for a receiver being accepted in the background
+            if self.state == ConnectionState.CONNECTED:
+                with self._batch_lock:  # not flush(), which subclasses override (e.g. to wait for their queue)
+                    self._flush_batch()
+            self._set_state(ConnectionState.CLOSED)
+            with self._batch_ready:  # stops the flusher thread
+                self._batch_ready.notify_all()
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+            if self.sock is not None:
+                _close_listening_socket(self.sock)
+                self.sock = None
+
+    def flush(self):
+        """Sends the messages pending in the current batch (if batching is enabled) with a single sendmsg.
+
+        Raises:
+            socket.error -- If the flusher thread failed to write an earlier batch.
+        """
+        self._raise_error()
+        with self._batch_lock:
+            self._flush_batch()
 
     def is_connected(self) -> bool:
         """Returns whether the connection is active.
@@ -85,83 +643,568 @@ class ObjectSenderSocket:
         Returns:
             bool -- True if the connection is active, false otherwise.
         """
-        return self.conn is not None
+        return self.state == ConnectionState.CONNECTED
+
+    def dropped_objects(self) -> int:
+        """Returns the number of messages dropped because no receiver was connected (only with reconnect).
+
+        Returns:
+            int -- The number of dropped messages.
+        """
+        return self._dropped
 
     def send_object(self, obj: Any):
         """Sends an object to the receiver socket.
 
-        The object is serialized using pickle.
-        Also prints a message if print_when_sending_object is True.
+        The object is serialized using the negotiated serializer and the header and the serialized
+        buffers are sent together with a single sendmsg (or added to the current batch).
 
         Args:
             obj: Any -- The object to send.
         """
-        data = pickle.dumps(obj)
-        data_size = len(data)
-        data_size_encoded = data_size.to_bytes(ObjectSocketParams.OBJECT_HEADER_SIZE_BYTES, 'little')
-        self.conn.sendall(data_size_encoded)
-        self.conn.sendall(data)
-        if self.print_when_sending_object:
-            print(f'[{datetime.datetime.now()}][ObjectSenderSocket/{self.ip}:{self.port}] Sent object of size {data_size} bytes.')
+        if self._ensure_connected():
+            self._send_message(_encode_object_message(self.serializer, obj, *self._stamp()))
+        else:
+            self._drop_message()
+
+    def send_array(self, arr: Optional[np.ndarray]):
+        """Sends an array to the receiver socket without pickling it.
+
+        A small header with the codec, the dtype and the shape of the array is sent first, followed by the
+        array buffer compressed with frame_codec. With the default raw codec, the buffer is handed to the
+        socket through a memoryview (no serialization copy).
+        Sending None signals the end of the stream (recv_array will return None).
+
+        Args:
+            arr: Optional[np.ndarray] -- The array to send, or None to signal the end of the stream.
+        """
+        if self._ensure_connected():
+            self._send_message(_encode_array_message(arr, self.frame_codec, *self._stamp()))
+        else:
+            self._drop_message()
+
+    def _set_state(self, state: str):
+        _check_transition(self.state, state)
+        self.state = state
+
+    def _ensure_connected(self) -> bool:
+        """Returns whether a receiver is connected, False while a new one is awaited in the background."""
+        self._raise_error()
+        if self.state == ConnectionState.CONNECTED:
+            return True
+        if not self.reconnect or self.state == ConnectionState.CLOSED:
+            raise socket.error(f'Not connected to a receiver (state: {self.state}).')
+        return False
+
+    def _raise_error(self):
+        """Raises the error which stopped a background writer (the flusher thread, or the writer of a subclass)."""
+        if self._error is not None:
+            raise socket.error(f'Sending to the receiver failed: {self._error}')
+
+    def _connection_lost(self, reason: Any):
+        self._set_state(ConnectionState.DISCONNECTED)
+        self.conn.close()
+        self.conn = None
+        if self.print_when_awaiting_receiver:
+            print(f'[{datetime.datetime.now()}][{type(self).__name__}/{self.endpoint}] receiver lost ({reason}), '
+                  f'awaiting a new one')
+        self._start_accepting()
+
+    def _start_accepting(self):
+        """Starts the thread accepting the next receiver, unless it is already running."""
+        if self._accept_thread is None or not self._accept_thread.is_alive():
+            self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+            self._accept_thread.start()
+
+    def _accept_loop(self):
+        # a receiver which connects waits for the answer to its handshake: it is accepted right away, whether
+        # messages are being sent or not (the state only becomes CONNECTED once the handshake is done)
+        while self.state == ConnectionState.DISCONNECTED:
+            try:
+                readable = select.select([self.sock], [], [], ObjectSocketParams.ACCEPT_POLL_INTERVAL_S)[0]
+            except (OSError, ValueError):  # the listening socket was closed
+                return
+            if not readable:
+                continue
+            with self._connect_lock:
+                if self.state != ConnectionState.DISCONNECTED:
+                    return
+                try:
+                    self.await_receiver_conection()
+                except socket.error:
+                    pass
+
+    def _drop_message(self):
+        self._seq += 1  # the receiver sees the dropped message as a gap
+        self._dropped += 1
+
+    def _write(self, buffers: List[Any]) -> bool:
+        """Writes buffers to the receiver. Returns False if the connection was lost (only with reconnect)."""
+        try:
+            _sendmsg_all(self.conn, buffers)
+        except OSError as e:
+            if not self.reconnect:
+                raise
+            self._connection_lost(e)
+            return False
+        return True
+
+    def _stamp(self) -> Tuple[int, int, int]:
+        """Returns the wire version, the sequence number and the send timestamp of the next message."""
+        seq = self._seq
+        self._seq += 1
+        return self.wire_version, seq, time.monotonic_ns()
+
+    def _log_metrics(self):
+        if self.metrics.log_due():
+            print(f'[{datetime.datetime.now()}][{type(self).__name__}/{self.endpoint}] {self.metrics.summary()}')
+
+    def _send_message(self, buffers: List[Any]):
+        self.metrics.record(_message_size(buffers))
+        self._log_metrics()
+        if self.batch_max_bytes <= 0:
+            if not self._write(buffers):
+                self._dropped += 1
+            return
+
+        with self._batch_lock:
+            self._batch += buffers
+            self._batch_size += _message_size(buffers)
+            self._batch_count += 1
+            if self._batch_size >= self.batch_max_bytes:
+                self._flush_batch()
+            elif self._batch_deadline is None:
+                self._batch_deadline = time.monotonic() + self.batch_max_delay_s
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+                self._batch_ready.notify()
+
+    def _flush_batch(self):
+        # must be called with _batch_lock held
+        self._batch_deadline = None
+        if self._batch:
+            batch, batch_count = self._batch, self._batch_count
+            self._batch, self._batch_size, self._batch_count = [], 0, 0
+            if self.state != ConnectionState.CONNECTED:
+                self._dropped += batch_count
+                return
+            try:
+                if not self._write(batch):
+                    self._dropped += batch_count
+            except OSError:
+                self._dropped += batch_count
+                raise
+
+    def _flush_loop(self):
+        """Writes every batch once its oldest message is batch_max_delay_s old, until the socket is closed."""
+        with self._batch_ready:
+            while self.state != ConnectionState.CLOSED:
+                if self._batch_deadline is None:
+                    self._batch_ready.wait()
+                    continue
+                time_left_s = self._batch_deadline - time.monotonic()
+                if time_left_s > 0:
+                    self._batch_ready.wait(time_left_s)
+                    continue
+                try:
+                    self._flush_batch()
+                except OSError as e:  # only without reconnect, raised by the next send or flush
+                    self._error = e
+                    self._set_state(ConnectionState.DISCONNECTED)
+                    return
+
+
+class ObjectAsyncSenderSocket(ObjectSenderSocket):
+    """ObjectSenderSocket which writes to the receiver from a background thread.
+
+    send_object and send_array only serialize the object and put the message in a bounded queue, so the
+    caller (e.g. a capture loop) never waits for a slow receiver. When the queue is full, the policy decides
+    what happens: with the default SlowConsumerPolicy.LATEST every new message replaces the pending ones,
+    so the receiver always gets the freshest frame. Messages are stamped when they are queued, so the
+    receiver sees the dropped ones as gaps in the sequence numbers and the queueing time as latency.
+
+    Since the queued buffers may point straight into the sent objects (e.g. with pickle5 or send_array),
+    objects must not be modified after being sent.
+
+    With reconnect enabled, the writer thread awaits a new receiver when the connection is lost. The messages
+    queued for the previous connection are dropped, the capture loop is never blocked.
+
+    Attributes:
+        queue: BoundedSendQueue -- The messages waiting to be written to the receiver.
+        sent_objects: int -- The number of messages written to the receiver.
+
+    Methods:
+        dropped_objects() -> int -- Returns the number of messages dropped because the receiver was too slow or lost.
+        queue_depth() -> int -- Returns the number of messages waiting to be written.
+        flush(timeout_s: Optional[float] = None) -> bool -- Waits until the pending messages are written.
+    """
+    queue: BoundedSendQueue
+    sent_objects: int
+
+    def __init__(self, ip: Union[str, socket.socket], port: Optional[int] = None,
+                 print_when_awaiting_receiver: bool = False,
+                 print_when_sending_object: bool = False,
+                 serializers: Optional[Sequence[str]] = None,
+                 queue_capacity: int = ObjectSocketParams.SEND_QUEUE_CAPACITY,
+                 slow_consumer_policy: str = SlowConsumerPolicy.LATEST,
+                 frame_codec: Union[str, FrameCodec] = RAW_CODEC,
+                 metrics_log_interval_s: Optional[float] = None,
+                 reconnect: bool = False):
+        """Initializes the ObjectAsyncSenderSocket, awaits the receiver connection and starts the writer thread.
+
+        Args:
+            ip: Union[str, socket.socket] -- The IP to listen on, an endpoint URI or a connected socket.
+            port = None: Optional[int] -- The port to listen on, only with an IP.
+            print_when_awaiting_receiver = False: bool -- Whether to print when awaiting the receiver.
+            print_when_sending_object = False: bool -- Deprecated, see metrics_log_interval_s.
+            serializers = None: Optional[Sequence[str]] -- The names of the accepted serializers, in order of
+                preference, defaults to ObjectSocketParams.DEFAULT_SERIALIZERS.
+            queue_capacity = ObjectSocketParams.SEND_QUEUE_CAPACITY: int -- The maximum number of pending messages.
+            slow_consumer_policy = SlowConsumerPolicy.LATEST: str -- What to do when the queue is full.
+            frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with send_array.
+            metrics_log_interval_s = None: Optional[float] -- The interval between two printed metrics summaries,
+                None to never print them.
+            reconnect = False: bool -- Whether to accept a new receiver when the connection is lost, instead of failing.
+        """
+        self.queue = BoundedSendQueue(queue_capacity, slow_consumer_policy)
+        self.sent_objects = 0
+        super().__init__(ip, port, print_when_awaiting_receiver, print_when_sending_object, serializers, frame_codec,
+                         metrics_log_interval_s=metrics_log_interval_s, reconnect=reconnect)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def send_object(self, obj: Any):
+        """Queues an object to be sent to the receiver socket.
+
+        Args:
+            obj: Any -- The object to send.
+
+        Raises:
+            socket.error -- If the writer thread failed to write an earlier message.
+        """
+        self._enqueue(_encode_object_message(self.serializer, obj, *self._stamp()))
+
+    def send_array(self, arr: Optional[np.ndarray]):
+        """Queues an array to be sent to the receiver socket, to be received with recv_array.
+
+        Args:
+            arr: Optional[np.ndarray] -- The array to send, or None to signal the end of the stream.
+
+        Raises:
+            socket.error -- If the writer thread failed to write an earlier message.
+        """
+        self._enqueue(_encode_array_message(arr, self.frame_codec, *self._stamp()))
+
+    def dropped_objects(self) -> int:
+        """Returns the number of messages dropped because the receiver was too slow.
+
+        Returns:
+            int -- The number of dropped messages.
+        """
+        return self.queue.dropped + self._dropped
+
+    def queue_depth(self) -> int:
+        """Returns the number of messages waiting to be written.
+
+        Returns:
+            int -- The number of pending messages.
+        """
+        return self.queue.depth()
+
+    def flush(self, timeout_s: Optional[float] = None) -> bool:
+        """Waits until the pending messages are written to the socket.
+
+        Args:
+            timeout_s = None: Optional[float] -- How long to wait, None to wait forever.
+
+        Returns:
+            bool -- True if all the messages were written, False if the timeout elapsed.
+        """
+        return self.queue.join(timeout_s)
+
+    def close(self):
+        """Writes the pending messages, stops the writer thread and closes the connection."""
+        self.queue.close()
+        self._writer.join()
+        super().close()
+
+    def _enqueue(self, message: List[Any]):
+        self._raise_error()
+        # the message is stamped for the current connection (wire version), it is dropped if that one is lost
+        self.queue.put((self._connection_id, message))
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            connection_id, message = item
+            try:
+                if connection_id != self._connection_id or not self._write(message):
+                    self._dropped += 1
+                else:
+                    self.sent_objects += 1
+                    self.metrics.record(_message_size(message))
+            except OSError as e:
+                self._stop_writing(e)
+                return
+            self.queue.task_done()
+            self._log_metrics()
+            if self.state == ConnectionState.DISCONNECTED:
+                self._await_new_receiver()
+
+    def _stop_writing(self, error: OSError):
+        """Stops the writer thread after a failed write, which the next send raises.
+
+        The message being written and the ones still queued are dropped and marked as done, so that flush()
+        and close() return.
+        """
+        self._error = error
+        self._set_state(ConnectionState.DISCONNECTED)
+        self.queue.close()
+        self._dropped += 1
+        self.queue.task_done()
+        while self.queue.get(timeout_s=0) is not None:
+            self._dropped += 1
+            self.queue.task_done()
+
+    def _start_accepting(self):
+        pass  # the writer thread accepts the next receiver, see _await_new_receiver
+
+    def _await_new_receiver(self):
+        """Accepts a new receiver, giving up when the queue is closed."""
+        while not self.queue.closed:
+            if select.select([self.sock], [], [], ObjectSocketParams.ACCEPT_POLL_INTERVAL_S)[0]:
+                try:
+                    self.await_receiver_conection()
+                    return
+                except socket.error:
+                    pass
 
 
 class ObjectReceiverSocket:
-    """Receives objects from a sender socket. Uses pickle to deserialize the objects.
+    """Receives objects from a sender socket.
+
+    After connecting, the receiver offers its serializers to the sender, which picks the one to use.
+    Senders which do not answer the handshake (older versions of this module) are read as plain pickle.
+    Every received message is recorded in metrics: with senders which stamp their messages (wire version 2),
+    this includes the transit latency and the gaps in the sequence numbers (e.g. frames dropped by the sender).
+
+    With reconnect enabled, a failed read (connection closed or reset, or a message not completed within the
+    timeout) does not raise: the connection is dropped and reestablished with exponential backoff, then the
+    read starts over with the first message of the new connection. A message cut by the failure is discarded.
+    An idle sender is not a failure: the next message (or the answer to the handshake, which a sender may
+    only send once it noticed that its previous receiver is gone) is awaited however long it takes, and a
+    sender which vanished without closing the connection is detected by TCP keepalive. Once a sender
+    answered the handshake, the senders of the next connections must answer it too, they are never read
+    as older senders.
+
+    The sender is reached through a TCP or a unix domain socket endpoint (see parse_endpoint). The receiver
+    can also be given an already connected socket, e.g. one end of a socket.socketpair() (see object_socket_pair).
     
     Attributes:
-        ip: str -- The IP of the sender socket.
-        port: int -- The port of the sender socket.
+        ip: Optional[str] -- The IP of the sender socket (TCP endpoints only).
+        port: Optional[int] -- The port of the sender socket (TCP endpoints only).
+        endpoint: str -- The endpoint URI of the sender socket.
         conn: socket.socket -- The connection socket.
+        state: str -- The ConnectionState of the socket.
+        reconnect: bool -- Whether to reconnect to the sender when the connection is lost.
+        reconnects: int -- The number of times the connection was reestablished.
         print_when_connecting_to_sender: bool -- Whether to print when connecting to the sender.
-        print_when_receiving_object: bool -- Whether to print when receiving an object.
+        print_when_receiving_object: bool -- Deprecated, see metrics_log_interval_s.
+        chunk_size_bytes: int -- The maximum number of bytes requested from the socket by a single read.
+        serializers: List[str] -- The names of the serializers offered to the sender, in order of preference.
+        serializer: Serializer -- The serializer chosen by the sender.
+        wire_version: int -- The wire version chosen by the sender (0 for older senders).
+        metrics: SocketMetrics -- The latency, throughput and gap statistics of the received messages.
     
     Methods:
         connect_to_sender() -- Connects to the sender socket.
         close() -- Closes the connection.
         is_connected() -> bool -- Returns whether the connection is active.
         recv_object() -> Any -- Receives an object from the sender socket.
+        recv_objects() -> List[Any] -- Receives all the objects available after one large read.
+        recv_array(copy: bool = False) -> Optional[np.ndarray] -- Receives an array sent with send_array.
     """
-    ip: str
-    port: int
+    ip: Optional[str]
+    port: Optional[int]
+    endpoint: str
     conn: socket.socket
+    state: str
+    reconnect: bool
+    reconnects: int
     print_when_connecting_to_sender: bool
     print_when_receiving_object: bool
+    chunk_size_bytes: int
+    serializers: List[str]
+    serializer: Serializer
+    wire_version: int
+    metrics: SocketMetrics
+    _array_buffer: bytearray
+    _rx_data: bytearray
+    _rx_start: int
+    _rx_end: int
 
-    def __init__(self, ip: str, port: int,
+    def __init__(self, ip: Union[str, socket.socket], port: Optional[int] = None,
                  print_when_connecting_to_sender: bool = False,
-                 print_when_receiving_object: bool = False):
+                 print_when_receiving_object: bool = False,
+                 chunk_size_bytes: Optional[int] = None,
+                 serializers: Optional[Sequence[str]] = None,
+                 metrics_log_interval_s: Optional[float] = None,
+                 reconnect: bool = False):
         """Initializes the ObjectReceiverSocket and initiates the connection to the sender socket.
         
         Args:
-            ip: str -- The IP of the sender socket.
-            port: int -- The port of the sender socket.
+            ip: Union[str, socket.socket] -- The IP of the sender socket, its endpoint URI (e.g.
+                'unix:///run/lane.sock') or a connected socket.
+            port = None: Optional[int] -- The port of the sender socket, only with an IP.
             print_when_connecting_to_sender = False: bool -- Whether to print when connecting to the sender.
-            print_when_receiving_object = False: bool -- Whether to print when receiving an object.
+            print_when_receiving_object = False: bool -- Deprecated: prints the metrics every
+                ObjectSocketParams.METRICS_LOG_INTERVAL_S instead of a line per object.
+            chunk_size_bytes = None: Optional[int] -- The maximum size of a single read,
+                defaults to ObjectSocketParams.CHUNK_SIZE_BYTES.
+            serializers = None: Optional[Sequence[str]] -- The names of the serializers offered to the sender,
+                defaults to all the registered serializers.
+            metrics_log_interval_s = None: Optional[float] -- The interval between two printed metrics summaries,
+                None to never print them.
+            reconnect = False: bool -- Whether to (re)connect with exponential backoff, until close is called,
+                instead of raising when the sender cannot be reached or the connection is lost.
+                Not possible with a connected socket.
         """
-        self.ip = ip
-        self.port = port
+        if isinstance(ip, socket.socket):
+            if reconnect:
+                raise ValueError('A receiver given a connected socket cannot reconnect, reconnect must be False')
+            self.ip, self.port, self.endpoint = None, None, f'fd://{ip.fileno()}'
+            self._family, self._address, self._connected_socket = ip.family, None, ip
+        else:
+            self._family, self._address = parse_endpoint(ip, port)
+            self.ip, self.port = self._address if self._family != getattr(socket, 'AF_UNIX', None) else (None, None)
+            self.endpoint = format_endpoint(self._family, self._address)
+            self._connected_socket = None
+        self.state = ConnectionState.DISCONNECTED
+        self.reconnect = reconnect
+        self.reconnects = 0
+        self.conn = None
         self.print_when_connecting_to_sender = print_when_connecting_to_sender
         self.print_when_receiving_object = print_when_receiving_object
+        self.chunk_size_bytes = chunk_size_bytes or ObjectSocketParams.CHUNK_SIZE_BYTES
+        self.serializers = list(serializers or SERIALIZERS)
+        for name in self.serializers:
+            get_serializer(name)
+        self.serializer = get_serializer(ObjectSocketParams.LEGACY_SERIALIZER)
+        self.wire_version = 0
+        if print_when_receiving_object:
+            warnings.warn('print_when_receiving_object is deprecated, use metrics_log_interval_s instead',
+                          DeprecationWarning, stacklevel=2)
+            metrics_log_interval_s = metrics_log_interval_s or ObjectSocketParams.METRICS_LOG_INTERVAL_S
+        self.metrics = SocketMetrics(log_interval_s=metrics_log_interval_s)
+        self._array_buffer = bytearray()
+        self._rx_data = bytearray()
+        self._rx_start = self._rx_end = 0
+        self._handshake_answered = False
 
         self.connect_to_sender()
 
     def connect_to_sender(self):
         """Connects to the sender socket.
-        
+
+        With reconnect enabled, failed attempts are retried after a delay which doubles from
+        RECONNECT_INITIAL_BACKOFF_S up to RECONNECT_MAX_BACKOFF_S.
         Prints a message if print_when_connecting_to_sender is True.
 
         Returns:
             None
         """
-
+        self._set_state(ConnectionState.CONNECTING)
         if self.print_when_connecting_to_sender:
-            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.ip}:{self.port}] connecting to sender...')
+            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.endpoint}] connecting to sender...')
+
+        backoff_s = ObjectSocketParams.RECONNECT_INITIAL_BACKOFF_S
+        while True:
+            if self._connected_socket is not None:
+                self.conn, self._connected_socket = self._connected_socket, None
+            else:
+                self.conn = socket.socket(self._family, socket.SOCK_STREAM)
+            try:
+                if self._address is not None:
+                    self.conn.connect(self._address)
+                if self.reconnect:
+                    _enable_keepalive(self.conn)
+                self._negotiate_serializer()
+                break
+            except OSError as e:
+                self.conn.close()
+                self.conn = None
+                if not self.reconnect or self.state == ConnectionState.CLOSED:
+                    if self.state != ConnectionState.CLOSED:
+                        self._set_state(ConnectionState.DISCONNECTED)
+                    raise
+                if self.print_when_connecting_to_sender:
+                    print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.endpoint}] connection failed '
+                          f'({e}), retrying in {backoff_s:.2f}s')
+                time.sleep(backoff_s)
+                backoff_s = min(2 * backoff_s, ObjectSocketParams.RECONNECT_MAX_BACKOFF_S)
 
-        self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.conn.connect((self.ip, self.port))
+        # a new connection starts on a message boundary: nothing read from the previous one is kept
+        self._rx_data = bytearray()
+        self._rx_start = self._rx_end = 0
+        self._set_state(ConnectionState.CONNECTED)
 
         if self.print_when_connecting_to_sender:
-            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.ip}:{self.port}] connected to sender')
+            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.endpoint}] connected to sender '
+                  f'(serializer: {self.serializer.name}, wire version: {self.wire_version})')
+
+    def _negotiate_serializer(self):
+        """Offers the serializers to the sender and reads its choice.
+
+        The answer is only peeked at first: if the sender starts with anything else than the handshake magic
+        (or stays silent), it is an older sender which ignores the offer and the legacy pickle format is used.
+        Note that an older sender never reads the offer, so closing its socket resets the connection: messages
+        it sent right before closing may be lost.
+
+        A reconnecting receiver waits for the first bytes however long it takes, since a sender may only accept
+        the connection later (e.g. once it noticed that the previous receiver is gone); an older sender is then
+        recognized by its first message. Once a sender answered the handshake, a sender which does not fails
+        the connection instead of being read in the legacy format.
+        """
+        magic = ObjectSocketParams.HANDSHAKE_MAGIC
+        hello = magic + bytes([ObjectSocketParams.HANDSHAKE_VERSION, len(self.serializers)])
+        hello += b''.join(_encode_name(name) for name in self.serializers)
+        self.conn.sendall(hello)
+
+        if self._peek_handshake_reply(None if self.reconnect else ObjectSocketParams.DEFAULT_TIMEOUT_S):
+            self.wire_version = self._recv_all(len(magic) + 1)[len(magic)]
+            self.serializer = get_serializer(_recv_name(self.conn, ObjectSocketParams.DEFAULT_TIMEOUT_S))
+            self._handshake_answered = True
+        elif self._handshake_answered:
+            raise socket.error('The sender did not answer the handshake, while the previous one did.')
+        else:
+            self.serializer = get_serializer(ObjectSocketParams.LEGACY_SERIALIZER)
+            self.wire_version = 0
+
+    def _peek_handshake_reply(self, timeout_s: Optional[float]) -> bool:
+        """Returns whether the sender starts with the handshake magic, waiting for it forever if timeout_s is None."""
+        magic = ObjectSocketParams.HANDSHAKE_MAGIC
+        deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+        while True:
+            if self.state == ConnectionState.CLOSED:
+                raise socket.error('The receiver was closed while connecting.')
+            poll_s = ObjectSocketParams.DEFAULT_TIMEOUT_S
+            if deadline is not None:
+                poll_s = deadline - time.monotonic()
+                if poll_s <= 0:
+                    return False
+            self.conn.settimeout(poll_s)
+            try:
+                peeked = self.conn.recv(len(magic), socket.MSG_PEEK)
+            except socket.timeout:
+                continue  # returns False once the deadline passed, checks whether the receiver was closed otherwise
+            if not peeked or not magic.startswith(peeked):
+                return False
+            if len(peeked) == len(magic):
+                return True
+            time.sleep(0.001)  # only part of the magic arrived yet
 
     def close(self):
         """Closes the connection.
@@ -169,8 +1212,10 @@ class ObjectReceiverSocket:
         Returns:
             None
         """
-        self.conn.close()
-        self.conn = None
+        self._set_state(ConnectionState.CLOSED)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
 
     def is_connected(self) -> bool:
         """Returns whether the connection is active.
@@ -178,48 +1223,194 @@ class ObjectReceiverSocket:
         Returns:
             bool -- True if the connection is active, false otherwise.
         """
-        return self.conn is not None
+        return self.state == ConnectionState.CONNECTED
 
     def recv_object(self) -> Any:
         """Receives an object from the sender socket and deserializes it.
-        
-        Also prints a message if print_when_receiving_object is True.
 
         Returns:
             Any -- The object received.
         """
-        obj_size_bytes = self._recv_object_size()
+        return self._recv_resuming(self._recv_object)
+
+    def _recv_object(self) -> Any:
+        obj_size_bytes, seq, sent_ns = self._recv_message_header()
         data = self._recv_all(obj_size_bytes)
-        obj = pickle.loads(data)
-        if self.print_when_receiving_object:
-            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.ip}:{self.port}] Received object of size {obj_size_bytes} bytes.')
-        return obj
-
-    def _recv_with_timeout(self, n_bytes: int, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S) -> Optional[bytes]:
-        rlist, _1, _2 = select.select([self.conn], [], [], timeout_s)
-        if rlist:
-            data = self.conn.recv(n_bytes)
-            return data
-        else:
-            return None  # Only returned on timeout
-
-    def _recv_all(self, n_bytes: int, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S) -> bytes:
-        data = []
-        left_to_recv = n_bytes
-        while left_to_recv > 0:
-            desired_chunk_size = min(ObjectSocketParams.CHUNK_SIZE_BYTES, left_to_recv)
-            chunk = self._recv_with_timeout(desired_chunk_size, timeout_s)
-            if chunk is not None:
-                data += [chunk]
-                left_to_recv -= len(chunk)
-            else:  # no more data incoming, timeout
-                bytes_received = sum(map(len, data))
-                raise socket.error(f'Timeout elapsed without any new data being received. '
-                                   f'{bytes_received} / {n_bytes} bytes received.')
-        data = b''.join(data)
+        self._record_message(_message_header_size(self.wire_version) + obj_size_bytes, seq, sent_ns)
+        return self.serializer.loads(memoryview(data))
+
+    def recv_objects(self, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S) -> List[Any]:
+        """Receives all the objects which are available, parsing as many messages as possible from one large read.
+
+        Meant for streams of small objects (e.g. from a batching sender): a single read of up to
+        chunk_size_bytes usually brings many messages, which are deserialized in place.
+        Waits until at least one complete object is available. Only for objects, not for arrays sent with send_array.
+
+        Args:
+            timeout_s = DEFAULT_TIMEOUT_S: float -- Time allowed for each read.
+
+        Returns:
+            List[Any] -- The objects received, in order (at least one).
+        """
+        return self._recv_resuming(self._recv_objects, timeout_s)
+
+    def _recv_objects(self, timeout_s: float) -> List[Any]:
+        header_size = _message_header_size(self.wire_version)
+        objects = []
+        while True:
+            while self._rx_end - self._rx_start >= header_size:
+                header = self._rx_data[self._rx_start:self._rx_start + header_size]
+                obj_size_bytes, seq, sent_ns = _decode_message_header(header, self.wire_version)
+                message_end = self._rx_start + header_size + obj_size_bytes
+                if message_end > self._rx_end:
+                    break
+                objects.append(self.serializer.loads(memoryview(self._rx_data)[self._rx_start + header_size:message_end]))
+                self._rx_start = message_end
+                self._record_message(header_size + obj_size_bytes, seq, sent_ns)
+            if objects:
+                return objects
+            self._fill_rx_buffer(timeout_s)
+
+    def recv_array(self, copy: bool = False) -> Optional[np.ndarray]:
+        """Receives an array sent with ObjectSenderSocket.send_array.
+
+        The array data is received directly into a preallocated buffer which is reused between calls.
+        Raw arrays are returned as views of that buffer, so by default they are only valid until the next
+        call to recv_array. Compressed arrays are decoded (with the codec recorded in the header) into new arrays.
+
+        Args:
+            copy = False: bool -- Whether to return a copy which owns its data instead of a view of the reused buffer.
+
+        Returns:
+            Optional[np.ndarray] -- The array received, or None if the sender signaled the end of the stream.
+        """
+        return self._recv_resuming(self._recv_array, copy)
+
+    def _recv_array(self, copy: bool) -> Optional[np.ndarray]:
+        header_size, seq, sent_ns = self._recv_message_header()
+        message_size = _message_header_size(self.wire_version) + header_size
+        if header_size == 0:
+            self._record_message(message_size, seq, sent_ns)
+            return None
+
+        codec_id, payload_size, dtype, shape = _decode_array_header(self._recv_all(header_size))
+        codec = get_frame_codec_by_id(codec_id)
+        if len(self._array_buffer) < payload_size:
+            # a new buffer is allocated (instead of resizing) since arrays returned earlier may still reference the old one
+            self._array_buffer = bytearray(payload_size)
+        view = memoryview(self._array_buffer)[:payload_size]
+        self._recv_into(view)
+
+        arr = codec.decode(view, dtype, shape)
+        self._record_message(message_size + payload_size, seq, sent_ns)
+        return arr.copy() if copy and codec is RAW_CODEC else arr
+
+    def _set_state(self, state: str):
+        _check_transition(self.state, state)
+        self.state = state
+
+    def _recv_resuming(self, recv: Callable[..., Any], *args: Any) -> Any:
+        """Calls recv, reconnecting and calling it again when the connection fails (only with reconnect)."""
+        while True:
+            try:
+                if self.reconnect:
+                    self._await_message()
+                return recv(*args)
+            except OSError as e:
+                if not self.reconnect or self.state == ConnectionState.CLOSED:
+                    raise
+                self._set_state(ConnectionState.DISCONNECTED)
+                self.conn.close()
+                self.conn = None
+                if self.print_when_connecting_to_sender:
+                    print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.endpoint}] connection lost ({e})')
+                self.connect_to_sender()
+                self.reconnects += 1
+
+    def _await_message(self):
+        """Waits until the next message starts arriving, so that a sender idle between messages is not taken for a
+        lost one: the read timeouts then only apply within a message."""
+        while self._rx_start == self._rx_end:
+            conn = self.conn
+            if self.state == ConnectionState.CLOSED or conn is None:
+                raise socket.error('The receiver was closed.')
+            try:
+                readable = select.select([conn], [], [], ObjectSocketParams.DEFAULT_TIMEOUT_S)[0]
+            except ValueError:  # closed by another thread, reported above
+                continue
+            if readable and self.state != ConnectionState.CLOSED:
+                return  # data, or the end of the connection which the read reports
+
+    def _recv_into(self, view: memoryview, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S):
+        n_buffered = min(len(view), self._rx_end - self._rx_start)
+        if n_buffered:  # data already read by recv_objects comes first
+            view[:n_buffered] = memoryview(self._rx_data)[self._rx_start:self._rx_start + n_buffered]
+            self._rx_start += n_buffered
+        if n_buffered < len(view):
+            _recv_into(self.conn, view[n_buffered:], timeout_s, self.chunk_size_bytes)
+
+    def _fill_rx_buffer(self, timeout_s: float):
+        """Performs one large read, after the unparsed data left from the previous read.
+
+        A new buffer is used for every read, since the objects deserialized from the previous one may still
+        reference it. Only the unparsed tail (an incomplete message) is copied over.
+        """
+        header_size = _message_header_size(self.wire_version)
+        n_buffered = self._rx_end - self._rx_start
+        n_needed = header_size
+        if n_buffered >= header_size:
+            header = self._rx_data[self._rx_start:self._rx_start + header_size]
+            n_needed += _decode_message_header(header, self.wire_version)[0]
+
+        data = bytearray(max(self.chunk_size_bytes, n_needed))
+        data[:n_buffered] = memoryview(self._rx_data)[self._rx_start:self._rx_end]
+        self.conn.settimeout(timeout_s)
+        try:
+            n_received = self.conn.recv_into(memoryview(data)[n_buffered:])
+        except socket.timeout:
+            raise socket.error(f'Timeout elapsed without any new data being received. {n_buffered} bytes buffered.')
+        if n_received == 0:
+            raise socket.error(f'Connection closed by the sender. {n_buffered} bytes buffered.')
+        self._rx_data, self._rx_start, self._rx_end = data, 0, n_buffered + n_received
+
+    def _recv_all(self, n_bytes: int, timeout_s: float = ObjectSocketParams.DEFAULT_TIMEOUT_S) -> bytearray:
+        data = bytearray(n_bytes)
+        self._recv_into(memoryview(data), timeout_s)
         return data
 
-    def _recv_object_size(self) -> int:
-        data = self._recv_all(ObjectSocketParams.OBJECT_HEADER_SIZE_BYTES)
-        obj_size_bytes = int.from_bytes(data, 'little')
-        return obj_size_bytes
\ No newline at end of file
+    def _recv_message_header(self) -> Tuple[int, Optional[int], Optional[int]]:
+        data = self._recv_all(_message_header_size(self.wire_version))
+        return _decode_message_header(data, self.wire_version)
+
+    def _record_message(self, n_bytes: int, seq: Optional[int], sent_ns: Optional[int]):
+        self.metrics.record(n_bytes, seq, sent_ns)
+        if self.metrics.log_due():
+            print(f'[{datetime.datetime.now()}][ObjectReceiverSocket/{self.endpoint}] {self.metrics.summary()}')
+
+def object_socket_pair(serializers: Optional[Sequence[str]] = None,
+                       frame_codec: Union[str, FrameCodec] = RAW_CODEC) -> Tuple[ObjectSenderSocket, ObjectReceiverSocket]:
+    """Creates a sender and a receiver connected to each other through socket.socketpair().
+
+    No address is involved, which makes it the simplest transport between two threads, or between a
+    process and a child started with fork.
+
+    Args:
+        serializers = None: Optional[Sequence[str]] -- The names of the serializers accepted by the sender,
+            defaults to ObjectSocketParams.DEFAULT_SERIALIZERS.
+        frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with send_array.
+
+    Returns:
+        Tuple[ObjectSenderSocket, ObjectReceiverSocket] -- The connected sender and receiver.
+    """
+    sender_conn, receiver_conn = socket.socketpair()
+    senders = []
+    # both ends take part in the handshake, the sender side runs in a thread while the receiver side runs here
+    handshake = threading.Thread(target=lambda: senders.append(
+        ObjectSenderSocket(sender_conn, serializers=serializers, frame_codec=frame_codec)))
+    handshake.start()
+    receiver = ObjectReceiverSocket(receiver_conn)
+    handshake.join()
+    if not senders:
+        receiver.close()
+        raise socket.error('The handshake of the socket pair failed.')
+    return senders[0], receiver
@@ -0,0 +1,283 @@
+import asyncio
+import socket
+import time
+
+import numpy as np
+
+from typing import *
+
+from object_serializers import Serializer, SERIALIZERS, get_serializer
+from frame_codecs import FrameCodec, RAW_CODEC, get_frame_codec, get_frame_codec_by_id
+from object_socket import (ObjectSocketParams, parse_endpoint, _create_listening_socket, _decode_array_header, _decode_message_header, _encode_array_message,
+                           _encode_name, _encode_object_message, _message_header_size)
+from socket_metrics import SocketMetrics
+
+
+class ObjectStream:
+    """asyncio counterpart of ObjectSenderSocket/ObjectReceiverSocket, built on StreamReader/StreamWriter.
+
+    Uses the same wire format (length prefixed messages, stamped from wire version 2, negotiated serializer,
+    raw arrays) and the same handshake, so an ObjectStream talks to the blocking sockets as well as to other streams.
+    Streams are created with open_object_stream (receiver side of the handshake) or by
+    start_object_server (sender side). Objects can be sent and received in both directions.
+
+    Example:
+        async with await open_object_stream('127.0.0.1', 5000) as stream:
+            async for obj in stream:
+                ...
+
+    Attributes:
+        reader: asyncio.StreamReader -- The reading end of the connection.
+        writer: asyncio.StreamWriter -- The writing end of the connection.
+        serializer: Serializer -- The negotiated serializer.
+        frame_codec: FrameCodec -- The compression applied to the arrays sent with send_array.
+        wire_version: int -- The negotiated wire version (0 with peers which do not take part in the handshake).
+        metrics: SocketMetrics -- The latency, throughput and gap statistics of the received messages.
+
+    Methods:
+        send_object(obj: Any) -- Sends an object.
+        send_array(arr: Optional[np.ndarray]) -- Sends an array as a raw buffer.
+        recv_object() -> Any -- Receives an object.
+        recv_array() -> Optional[np.ndarray] -- Receives an array sent with send_array.
+        iter_arrays() -> AsyncIterator[np.ndarray] -- Yields arrays until the end of stream marker.
+        close() -- Closes the connection.
+    """
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    serializer: Serializer
+    frame_codec: FrameCodec
+    wire_version: int
+    metrics: SocketMetrics
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, serializer: Serializer,
+                 pending: bytes = b'', frame_codec: Union[str, FrameCodec] = RAW_CODEC, wire_version: int = 0):
+        """Initializes the ObjectStream over an established connection.
+
+        Args:
+            reader: asyncio.StreamReader -- The reading end of the connection.
+            writer: asyncio.StreamWriter -- The writing end of the connection.
+            serializer: Serializer -- The serializer negotiated with the peer.
+            pending = b'': bytes -- Bytes already read from reader which belong to the first message.
+            frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with send_array.
+            wire_version = 0: int -- The wire version negotiated with the peer.
+        """
+        self.reader = reader
+        self.writer = writer
+        self.serializer = serializer
+        self.frame_codec = get_frame_codec(frame_codec)
+        self.wire_version = wire_version
+        self.metrics = SocketMetrics()
+        self._pending = pending
+        self._seq = 0
+
+    async def send_object(self, obj: Any):
+        """Sends an object, waiting if the peer does not keep up (the write buffer is drained).
+
+        Args:
+            obj: Any -- The object to send.
+        """
+        await self._write(_encode_object_message(self.serializer, obj, *self._stamp()))
+
+    async def send_array(self, arr: Optional[np.ndarray]):
+        """Sends an array, to be received with recv_array (on a stream or an ObjectReceiverSocket).
+
+        Args:
+            arr: Optional[np.ndarray] -- The array to send, or None to signal the end of the stream.
+        """
+        await self._write(_encode_array_message(arr, self.frame_codec, *self._stamp()))
+
+    async def recv_object(self) -> Any:
+        """Receives an object.
+
+        Returns:
+            Any -- The object received.
+
+        Raises:
+            asyncio.IncompleteReadError -- If the peer closes the connection.
+        """
+        return await self._recv_object(*await self._recv_message_header())
+
+    async def recv_array(self) -> Optional[np.ndarray]:
+        """Receives an array sent with send_array, decoding it with the codec recorded in its header.
+
+        The returned array may be read-only.
+
+        Returns:
+            Optional[np.ndarray] -- The array received, or None if the peer signaled the end of the stream.
+
+        Raises:
+            asyncio.IncompleteReadError -- If the peer closes the connection.
+        """
+        header_size, seq, sent_ns = await self._recv_message_header()
+        message_size = _message_header_size(self.wire_version) + header_size
+        if header_size == 0:
+            self.metrics.record(message_size, seq, sent_ns)
+            return None
+
+        codec_id, payload_size, dtype, shape = _decode_array_header(await self.reader.readexactly(header_size))
+        data = await self.reader.readexactly(payload_size)
+        self.metrics.record(message_size + payload_size, seq, sent_ns)
+        return get_frame_codec_by_id(codec_id).decode(memoryview(data), dtype, shape)
+
+    async def iter_arrays(self) -> AsyncIterator[np.ndarray]:
+        """Yields the arrays received until the peer sends the end of stream marker (None).
+
+        Returns:
+            AsyncIterator[np.ndarray] -- The received arrays.
+        """
+        while True:
+            arr = await self.recv_array()
+            if arr is None:
+                return
+            yield arr
+
+    async def close(self):
+        """Closes the connection."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    def __aiter__(self) -> 'ObjectStream':
+        return self
+
+    async def __anext__(self) -> Any:
+        """Receives the next object. The iteration stops when the peer closes the connection between two objects."""
+        try:
+            header = await self._recv_message_header()
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            raise StopAsyncIteration
+        except ConnectionResetError:  # older senders reset the connection when closing (see open_object_stream)
+            raise StopAsyncIteration
+        return await self._recv_object(*header)
+
+    async def __aenter__(self) -> 'ObjectStream':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _stamp(self) -> Tuple[int, int, int]:
+        seq = self._seq
+        self._seq += 1
+        return self.wire_version, seq, time.monotonic_ns()
+
+    async def _write(self, buffers: List[Any]):
+        # separate writes: writelines would join the buffers into one copy
+        for buffer in buffers:
+            self.writer.write(memoryview(buffer))
+        await self.writer.drain()
+
+    async def _recv_object(self, obj_size_bytes: int, seq: Optional[int], sent_ns: Optional[int]) -> Any:
+        data = await self.reader.readexactly(obj_size_bytes)
+        self.metrics.record(_message_header_size(self.wire_version) + obj_size_bytes, seq, sent_ns)
+        return self.serializer.loads(memoryview(data))
+
+    async def _recv_message_header(self) -> Tuple[int, Optional[int], Optional[int]]:
+        header_size = _message_header_size(self.wire_version)
+        data, self._pending = self._pending, b''
+        if len(data) < header_size:
+            data += await self.reader.readexactly(header_size - len(data))
+        return _decode_message_header(data, self.wire_version)
+
+
+async def open_object_stream(host: str, port: Optional[int] = None, serializers: Optional[Sequence[str]] = None,
+                             frame_codec: Union[str, FrameCodec] = RAW_CODEC) -> ObjectStream:
+    """Connects to an ObjectSenderSocket (or an object server) and negotiates the serializer.
+
+    Args:
+        host: str -- The IP of the sender, or its endpoint URI (see object_socket.parse_endpoint).
+        port = None: Optional[int] -- The port of the sender, only with an IP.
+        serializers = None: Optional[Sequence[str]] -- The names of the serializers offered to the sender,
+            defaults to all the registered serializers.
+        frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with send_array.
+
+    Returns:
+        ObjectStream -- The connected stream.
+    """
+    serializers = list(serializers or SERIALIZERS)
+    family, address = parse_endpoint(host, port)
+    if family == getattr(socket, 'AF_UNIX', None):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+
+    magic = ObjectSocketParams.HANDSHAKE_MAGIC
+    writer.write(magic + bytes([ObjectSocketParams.HANDSHAKE_VERSION, len(serializers)])
+                 + b''.join(_encode_name(name) for name in serializers))
+    await writer.drain()
+
+    # an older sender ignores the offer and its first bytes are already the size of the first message.
+    # As it never reads the offer, closing its socket resets the connection instead of closing it cleanly
+    try:
+        prefix = await asyncio.wait_for(reader.readexactly(len(magic)), ObjectSocketParams.DEFAULT_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        return ObjectStream(reader, writer, get_serializer(ObjectSocketParams.LEGACY_SERIALIZER), b'', frame_codec)
+    if prefix != magic:
+        return ObjectStream(reader, writer, get_serializer(ObjectSocketParams.LEGACY_SERIALIZER), prefix, frame_codec)
+
+    wire_version, name_size = await reader.readexactly(2)
+    name = (await reader.readexactly(name_size)).decode('ascii')
+    return ObjectStream(reader, writer, get_serializer(name), b'', frame_codec, wire_version)
+
+
+async def start_object_server(handler: Callable[[ObjectStream], Awaitable[None]], host: str, port: Optional[int] = None,
+                              serializers: Optional[Sequence[str]] = None,
+                              frame_codec: Union[str, FrameCodec] = RAW_CODEC) -> asyncio.AbstractServer:
+    """Starts a server which plays the sender side of the handshake for every receiver that connects.
+
+    Args:
+        handler: Callable[[ObjectStream], Awaitable[None]] -- Coroutine function called with the stream of
+            every new receiver. The stream is closed when the handler returns.
+        host: str -- The IP to listen on, or an endpoint URI (see object_socket.parse_endpoint).
+        port = None: Optional[int] -- The port to listen on, only with an IP.
+        serializers = None: Optional[Sequence[str]] -- The names of the accepted serializers, in order of
+            preference, defaults to ObjectSocketParams.DEFAULT_SERIALIZERS.
+        frame_codec = RAW_CODEC: Union[str, FrameCodec] -- The compression applied to the arrays sent with send_array.
+
+    Returns:
+        asyncio.AbstractServer -- The listening server.
+    """
+    serializers = list(serializers or ObjectSocketParams.DEFAULT_SERIALIZERS)
+    for name in serializers:
+        get_serializer(name)
+
+    async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        negotiated = await _negotiate_sender_serializer(reader, writer, serializers)
+        if negotiated is None:
+            writer.close()
+            return
+        serializer, wire_version = negotiated
+        async with ObjectStream(reader, writer, serializer, b'', frame_codec, wire_version) as stream:
+            await handler(stream)
+
+    family, address = parse_endpoint(host, port)
+    sock = _create_listening_socket(family, address, ObjectSocketParams.SERVER_LISTEN_BACKLOG)
+    if family == getattr(socket, 'AF_UNIX', None):
+        return await asyncio.start_unix_server(on_connection, sock=sock)
+    return await asyncio.start_server(on_connection, sock=sock)
+
+
+async def _negotiate_sender_serializer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                       serializers: List[str]) -> Optional[Tuple[Serializer, int]]:
+    magic = ObjectSocketParams.HANDSHAKE_MAGIC
+    try:
+        hello = await asyncio.wait_for(reader.readexactly(len(magic) + 2), ObjectSocketParams.HANDSHAKE_TIMEOUT_S)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+        hello = None
+    if hello is None or hello[:len(magic)] != magic:
+        return get_serializer(ObjectSocketParams.LEGACY_SERIALIZER), 0
+
+    offered = []
+    for _ in range(hello[len(magic) + 1]):
+        name_size, = await reader.readexactly(1)
+        offered.append((await reader.readexactly(name_size)).decode('ascii'))
+    common = [name for name in serializers if name in offered]
+    if not common:
+        return None
+
+    serializer = get_serializer(common[0])
+    wire_version = min(hello[len(magic)], ObjectSocketParams.HANDSHAKE_VERSION)
+    writer.write(magic + bytes([wire_version]) + _encode_name(serializer.name))
+    await writer.drain()
+    return serializer, wire_version
@@ -0,0 +1,252 @@
+import collections
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from typing import *
+
+from lane_detector import LaneDetection, LaneDetector
+
+
+class ParallelParams:
+    """Wrapper for configuration constants"""
+    PENDING_PER_WORKER = 2  # frames in flight per worker, so a worker never waits for the next frame
+    SLOT_ALIGNMENT = 64
+
+
+_worker_detector = None  # the LaneDetector of a worker process
+_worker_blocks = {}  # the shared memory blocks a worker process is attached to, by name
+
+
+def _init_worker(detector_kwargs: Dict[str, Any]):
+    global _worker_detector
+    _worker_detector = LaneDetector(**detector_kwargs)
+
+
+def _fit_in_worker(block_name: str, offset: int, shape: Tuple[int, ...], dtype: str,
+                   out_offset: int) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], int, int, int, bool]:
+    """Fits the frame of a slot and writes the frame at the working resolution after it.
+
+    Returns the fitted lines, their number of points, the allocations of the worker's detector and whether
+    a resized frame was written (False if the frame was processed at its own resolution).
+    """
+    block = _worker_blocks.get(block_name)
+    if block is None:
+        for old_block in _worker_blocks.values():  # the parent only replaces a block by a bigger one
+            old_block.close()
+        _worker_blocks.clear()
+        block = _worker_blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+
+    frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf, offset=offset)
+    detection = _worker_detector.fit(frame)
+    resized = detection.frame is not frame
+    if resized:
+        out = np.ndarray(detection.frame.shape, dtype=detection.frame.dtype, buffer=block.buf, offset=out_offset)
+        out[...] = detection.frame
+    return (detection.left, detection.right, detection.left_points, detection.right_points,
+            detection.allocations, resized)
+
+
+class _Pending:
+    """A frame submitted to the workers and not collected yet."""
+
+    def __init__(self, future: concurrent.futures.Future, block: shared_memory.SharedMemory, offset: int,
+                 shape: Tuple[int, ...], dtype: np.dtype, out_offset: int, stream: Hashable):
+        self.future = future
+        self.block = block
+        self.offset = offset
+        self.shape = shape
+        self.dtype = dtype
+        self.out_offset = out_offset
+        self.stream = stream
+
+
+class ParallelLaneDetector:
+    """Detects the lane lines of frames with a pool of processes, and returns the detections in order.
+
+    Fitting a frame only depends on that frame (see LaneDetector.fit()), so the frames are fitted in parallel by
+    the workers, each with its own LaneDetector. The only state carried from a frame to the next, the last good
+    lines, is applied afterwards by LaneDetector.apply_fallback() in the parent process, once the detections are
+    back in submission order. The results are therefore exactly those of a single LaneDetector.detect() loop.
+
+    Frames are not pickled to the workers: each frame in flight has a slot in a shared memory block, holding the
+    frame and, after it, the frame at the working resolution written back by the worker for the overlay.
+
+    Frames can belong to several streams (e.g. cameras): each stream keeps its own last good lines.
+
+    Example:
+        with ParallelLaneDetector(workers=4, width=480) as detector:
+            for detection in detector.detect_frames(frames):
+                cv2.imshow('Lanes', detector.detector().draw_overlay(detection))
+
+    Attributes:
+        workers: int -- The number of worker processes.
+        max_pending: int -- The maximum number of frames in flight.
+
+    Methods:
+        detect_frames(frames: Iterable[np.ndarray]) -> Iterator[LaneDetection] -- Detects the lines of frames, in order.
+        submit(frame: np.ndarray, stream: Hashable = None) -- Sends a frame to the workers.
+        collect() -> Tuple[Hashable, LaneDetection] -- Waits for the detection of the oldest frame submitted.
+        full() -> bool -- Returns whether collect() must be called before the next submit().
+        ready() -> bool -- Returns whether collect() would return without waiting.
+        pending() -> int -- Returns the number of frames in flight.
+        detector(stream: Hashable = None) -> LaneDetector -- Returns the detector holding the state of a stream.
+        close() -- Stops the workers and releases the shared memory.
+    """
+    workers: int
+    max_pending: int
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None, **detector_kwargs):
+        """Initializes the ParallelLaneDetector and starts the worker processes.
+
+        Args:
+            workers = None: Optional[int] -- The number of worker processes, defaults to the number of CPUs.
+            max_pending = None: Optional[int] -- The maximum number of frames in flight, defaults to
+                ParallelParams.PENDING_PER_WORKER per worker.
+            **detector_kwargs -- The arguments of the LaneDetector of every worker (a debug_view cannot be used).
+        """
+        if detector_kwargs.get('debug_view') is not None:
+            raise ValueError('debug_view cannot be used with the worker processes of a ParallelLaneDetector')
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * ParallelParams.PENDING_PER_WORKER
+        self._detector_kwargs = detector_kwargs
+        self._detectors = {}
+        self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                                initargs=(detector_kwargs,))
+        self._pending = collections.deque()
+        self._block = None
+        self._slot_bytes = 0
+        self._next_slot = 0
+
+    def detector(self, stream: Hashable = None) -> LaneDetector:
+        """Returns the LaneDetector of the parent process holding the last good lines of a stream.
+
+        Args:
+            stream = None: Hashable -- The stream.
+
+        Returns:
+            LaneDetector -- The detector, e.g. to draw the overlay of the detections of the stream.
+        """
+        detector = self._detectors.get(stream)
+        if detector is None:
+            detector = self._detectors[stream] = LaneDetector(**self._detector_kwargs)
+        return detector
+
+    def full(self) -> bool:
+        """Returns whether max_pending frames are in flight, in which case collect() must be called before submit().
+
+        Returns:
+            bool -- Whether no more frame can be submitted.
+        """
+        return len(self._pending) >= self.max_pending
+
+    def ready(self) -> bool:
+        """Returns whether the detection of the oldest frame in flight is available.
+
+        Returns:
+            bool -- Whether collect() would return without waiting.
+        """
+        return bool(self._pending) and self._pending[0].future.done()
+
+    def pending(self) -> int:
+        """Returns the number of frames submitted and not collected yet.
+
+        Returns:
+            int -- The number of frames in flight.
+        """
+        return len(self._pending)
+
+    def submit(self, frame: np.ndarray, stream: Hashable = None):
+        """Copies a frame to a free slot of the shared memory and sends it to the workers.
+
+        Args:
+            frame: np.ndarray -- The BGR frame.
+            stream = None: Hashable -- The stream of the frame, whose detections must be collected in order.
+        """
+        if self.full():
+            raise RuntimeError(f'{self.max_pending} frames are already in flight, collect() one first')
+        out_shape = self.detector(stream).working_shape(frame.shape)
+        out_bytes = int(np.prod(out_shape)) * frame.itemsize
+        self._ensure_block(_align(frame.nbytes) + _align(out_bytes))
+
+        offset = self._next_slot * self._slot_bytes
+        self._next_slot = (self._next_slot + 1) % self.max_pending
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._block.buf, offset=offset)[...] = frame
+        out_offset = offset + _align(frame.nbytes)
+        future = self._executor.submit(_fit_in_worker, self._block.name, offset, frame.shape, frame.dtype.str, out_offset)
+        self._pending.append(_Pending(future, self._block, offset, frame.shape, frame.dtype, out_offset, stream))
+
+    def collect(self) -> Tuple[Hashable, LaneDetection]:
+        """Waits for the detection of the oldest frame submitted and applies the fallback of its stream.
+
+        Returns:
+            Tuple[Hashable, LaneDetection] -- The stream of the frame and its detection, whose frame is a copy.
+        """
+        pending = self._pending.popleft()
+        left, right, left_points, right_points, allocations, resized = pending.future.result()
+        detector = self.detector(pending.stream)
+        shape = detector.working_shape(pending.shape) if resized else pending.shape
+        frame = np.ndarray(shape, dtype=pending.dtype, buffer=pending.block.buf,
+                           offset=pending.out_offset if resized else pending.offset).copy()
+        if pending.block is not self._block and all(other.block is not pending.block for other in self._pending):
+            _release_block(pending.block)
+
+        detection = LaneDetection(frame, left, right, left is not None, right is not None, left_points, right_points, allocations)
+        return pending.stream, detector.apply_fallback(detection)
+
+    def detect_frames(self, frames: Iterable[np.ndarray], stream: Hashable = None) -> Iterator[LaneDetection]:
+        """Detects the lane lines of frames, keeping max_pending of them in flight.
+
+        Args:
+            frames: Iterable[np.ndarray] -- The BGR frames, in order.
+            stream = None: Hashable -- The stream of the frames.
+
+        Returns:
+            Iterator[LaneDetection] -- The detections, in the order of the frames.
+        """
+        for frame in frames:
+            if self.full():
+                yield self.collect()[1]
+            self.submit(frame, stream)
+        while self._pending:
+            yield self.collect()[1]
+
+    def close(self):
+        """Stops the workers and releases the shared memory, the frames in flight are discarded."""
+        for pending in self._pending:
+            pending.future.cancel()
+        self._executor.shutdown(wait=True)
+        for block in {id(pending.block): pending.block for pending in self._pending}.values():
+            if block is not self._block:
+                _release_block(block)
+        self._pending.clear()
+        if self._block is not None:
+            _release_block(self._block)
+            self._block = None
+
+    def __enter__(self) -> 'ParallelLaneDetector':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _ensure_block(self, slot_bytes: int):
+        if self._block is not None and slot_bytes <= self._slot_bytes:
+            return
+        # the frames in flight keep the previous block, it is released once they are collected
+        if self._block is not None and all(pending.block is not self._block for pending in self._pending):
+            _release_block(self._block)
+        self._slot_bytes = slot_bytes
+        self._block = shared_memory.SharedMemory(create=True, size=slot_bytes * self.max_pending)
+        self._next_slot = 0
+
+
+def _align(n_bytes: int) -> int:
+    return -(-n_bytes // ParallelParams.SLOT_ALIGNMENT) * ParallelParams.SLOT_ALIGNMENT
+
+
+def _release_block(block: shared_memory.SharedMemory):
+    block.close()
+    block.unlink()
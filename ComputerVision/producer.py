@@ -1,20 +1,48 @@
+import argparse
+
 import cv2
 import numpy as np
-import object_socket
 
+import object_broadcast
+from send_queue import SlowConsumerPolicy
+from video_decode_pool import DecodePoolParams, VideoDecodePool, read_frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Streams the frames of a video to any number of consumers.')
+    parser.add_argument('--video', default='.\\Lane Detection Test Video 01.mp4', help='video file to stream')
+    parser.add_argument('--endpoint', default='tcp://127.0.0.1:5000', help='endpoint the consumers connect to')
+    parser.add_argument('--decode-workers', type=int, default=0,
+                        help='number of processes decoding segments of the video in parallel (0 decodes on the sending thread)')
+    parser.add_argument('--segment-frames', type=int, default=DecodePoolParams.SEGMENT_FRAMES, help='number of frames per decoded segment')
+    args = parser.parse_args()
 
-s = object_socket.ObjectSenderSocket('127.0.0.1', 5000, print_when_awaiting_receiver=True, print_when_sending_object=True)
+    # any number of consumers can connect, the producer waits (BLOCK) for the slowest one
+    s = object_broadcast.ObjectBroadcastSocket(args.endpoint, slow_consumer_policy=SlowConsumerPolicy.BLOCK,
+                                               print_when_awaiting_receiver=True)
+    s.await_receivers()
 
-video = cv2.VideoCapture('.\\Lane Detection Test Video 01.mp4')
+    pool = None
+    if args.decode_workers > 0:
+        # decodes segments of the video in parallel, the frames still come out in order
+        pool = VideoDecodePool(args.video, args.decode_workers, args.segment_frames)
+        frames = iter(pool)
+    else:
+        frames = read_frames(args.video)
 
-while True:
-    ret, frame = video.read()
-    s.send_object((ret, frame))
+    try:
+        for frame in frames:
+            s.send_array(frame)
 
-    if not ret:
-        break
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+        s.send_array(None)
+    finally:
+        frames.close()
+        if pool is not None:
+            pool.close()
+        s.close()
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-video.release()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
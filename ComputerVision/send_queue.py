@@ -0,0 +1,141 @@
+import collections
+import threading
+
+from typing import *
+
+
+class SlowConsumerPolicy:
+    """Wrapper for the policies applied when a receiver cannot keep up with the sender"""
+    DROP_OLDEST = 'drop_oldest'  # discard the oldest pending message to make room for the new one
+    BLOCK = 'block'  # make the sender wait until there is room in the queue
+    DISCONNECT = 'disconnect'  # close the queue (and the connection behind it)
+    LATEST = 'latest'  # latest frame wins: every new message replaces all the pending ones
+
+    ALL = (DROP_OLDEST, BLOCK, DISCONNECT, LATEST)
+
+
+class BoundedSendQueue:
+    """Thread safe queue of pending messages with a fixed capacity and a policy for when it is full.
+
+    Attributes:
+        capacity: int -- The maximum number of pending messages.
+        policy: str -- One of SlowConsumerPolicy, applied when a message is put in a full queue.
+        dropped: int -- The number of messages discarded so far.
+        closed: bool -- Whether the queue was closed (no more messages are accepted).
+
+    Methods:
+        put(item: Any) -> bool -- Adds a message, applying the policy if the queue is full.
+        get(timeout_s: Optional[float] = None) -> Optional[Any] -- Removes and returns the oldest message.
+        close() -- Closes the queue, the pending messages can still be taken out.
+        task_done() -- Marks a message taken out with get as processed.
+        join(timeout_s: Optional[float] = None) -> bool -- Waits until all the messages were processed or dropped.
+        depth() -> int -- Returns the number of pending messages.
+    """
+    capacity: int
+    policy: str
+    dropped: int
+    closed: bool
+
+    def __init__(self, capacity: int, policy: str = SlowConsumerPolicy.DROP_OLDEST):
+        """Initializes the BoundedSendQueue.
+
+        Args:
+            capacity: int -- The maximum number of pending messages.
+            policy = SlowConsumerPolicy.DROP_OLDEST: str -- What to do when a message is put in a full queue.
+        """
+        if capacity < 1:
+            raise ValueError(f'Capacity must be at least 1, got {capacity}')
+        if policy not in SlowConsumerPolicy.ALL:
+            raise ValueError(f'Unknown slow consumer policy {policy!r}, expected one of {SlowConsumerPolicy.ALL}')
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._items = collections.deque()
+        self._unfinished = 0
+        self._cond = threading.Condition()
+
+    def put(self, item: Any) -> bool:
+        """Adds a message to the queue, applying the policy if the queue is full.
+
+        Args:
+            item: Any -- The message.
+
+        Returns:
+            bool -- False if the queue is closed (the message was not queued), True otherwise.
+        """
+        with self._cond:
+            if self.policy == SlowConsumerPolicy.BLOCK:
+                while not self.closed and len(self._items) >= self.capacity:
+                    self._cond.wait()
+            if self.closed:
+                return False
+
+            if self.policy == SlowConsumerPolicy.LATEST:
+                self.dropped += len(self._items)
+                self._unfinished -= len(self._items)
+                self._items.clear()
+            elif len(self._items) >= self.capacity:
+                if self.policy == SlowConsumerPolicy.DISCONNECT:
+                    self.closed = True
+                    self._cond.notify_all()
+                    return False
+                self._items.popleft()
+                self.dropped += 1
+                self._unfinished -= 1
+
+            self._items.append(item)
+            self._unfinished += 1
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout_s: Optional[float] = None) -> Optional[Any]:
+        """Removes and returns the oldest message, waiting for one if the queue is empty.
+
+        Args:
+            timeout_s = None: Optional[float] -- How long to wait for a message, None to wait forever.
+
+        Returns:
+            Optional[Any] -- The message, or None if the queue is closed and empty or the timeout elapsed.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout_s):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Closes the queue. Pending messages can still be taken out with get."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def task_done(self):
+        """Marks a message taken out with get as processed (e.g. written to the socket)."""
+        with self._cond:
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def join(self, timeout_s: Optional[float] = None) -> bool:
+        """Blocks until every queued message was either dropped or taken out and marked with task_done.
+
+        Args:
+            timeout_s = None: Optional[float] -- How long to wait, None to wait forever.
+
+        Returns:
+            bool -- True if no message is pending or in progress, False if the timeout elapsed.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished <= 0, timeout_s)
+
+    def depth(self) -> int:
+        """Returns the number of pending messages.
+
+        Returns:
+            int -- The number of messages waiting in the queue.
+        """
+        with self._cond:
+            return len(self._items)
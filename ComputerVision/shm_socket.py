@@ -0,0 +1,257 @@
+import collections
+import pickle
+import select
+import struct
+import sys
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from typing import *
+
+from object_socket import ObjectSenderSocket, ObjectReceiverSocket
+
+
+class SharedMemoryParams:
+    """Wrapper for configuration constants"""
+    SLOT_SIZE_BYTES = 1920 * 1080 * 3
+    SLOT_COUNT = 4
+    BUFFER_ALIGNMENT_BYTES = 64
+    ACK_SIZE_BYTES = 4
+
+
+class SharedMemorySenderSocket:
+    """Sends objects to a SharedMemoryReceiverSocket running on the same host, through shared memory.
+
+    The sender owns a ring of slots in a multiprocessing.shared_memory block. Objects are pickled with
+    protocol 5: their large buffers (e.g. the data of numpy frames) are written into a free slot and only
+    the small pickle stream, the slot index and a sequence number go through the socket. The receiver
+    hands the slot back once it is done with it, so a slot is never overwritten while it is being read.
+    Objects whose buffers do not fit in a slot are sent through the socket as a whole.
+
+    Attributes:
+        socket: ObjectSenderSocket -- The socket carrying the slot indices and sequence numbers.
+        shm: shared_memory.SharedMemory -- The block holding the slots.
+        slot_size_bytes: int -- The size of a single slot.
+        slot_count: int -- The number of slots.
+        seq: int -- The sequence number of the next object.
+
+    Methods:
+        send_object(obj: Any) -- Sends an object to the receiver.
+        send_array(arr: Optional[np.ndarray]) -- Sends an array (or None as end of stream marker) to the receiver.
+        close() -- Closes the connection and releases the shared memory.
+        is_connected() -> bool -- Returns whether the connection is active.
+    """
+    socket: ObjectSenderSocket
+    shm: shared_memory.SharedMemory
+    slot_size_bytes: int
+    slot_count: int
+    seq: int
+
+    def __init__(self, ip: str, port: Optional[int] = None,
+                 slot_size_bytes: int = SharedMemoryParams.SLOT_SIZE_BYTES,
+                 slot_count: int = SharedMemoryParams.SLOT_COUNT,
+                 print_when_awaiting_receiver: bool = False,
+                 print_when_sending_object: bool = False,
+                 metrics_log_interval_s: Optional[float] = None):
+        """Initializes the SharedMemorySenderSocket, allocates the slots and awaits the receiver connection.
+
+        Args:
+            ip: str -- The IP to listen on, or an endpoint URI (unix:// is the natural choice on the same host).
+            port = None: Optional[int] -- The port to listen on, only with an IP.
+            slot_size_bytes = SharedMemoryParams.SLOT_SIZE_BYTES: int -- The size of a slot (one 1080p BGR frame).
+            slot_count = SharedMemoryParams.SLOT_COUNT: int -- The number of slots, at least 2.
+            print_when_awaiting_receiver = False: bool -- Whether to print when awaiting the receiver.
+            print_when_sending_object = False: bool -- Deprecated, see metrics_log_interval_s.
+            metrics_log_interval_s = None: Optional[float] -- The interval between two printed metrics summaries.
+        """
+        if slot_count < 2:
+            raise ValueError(f'At least 2 slots are needed, got {slot_count}')
+        self.slot_size_bytes = slot_size_bytes
+        self.slot_count = slot_count
+        self.seq = 0
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_size_bytes * slot_count)
+        self._free_slots = collections.deque(range(slot_count))
+        self._acks = bytearray()
+
+        self.socket = ObjectSenderSocket(ip, port, print_when_awaiting_receiver, print_when_sending_object,
+                                         metrics_log_interval_s=metrics_log_interval_s)
+        self.socket.send_object((self.shm.name, slot_size_bytes, slot_count))
+
+    def send_object(self, obj: Any):
+        """Sends an object to the receiver.
+
+        Blocks if the receiver still holds all the slots.
+
+        Args:
+            obj: Any -- The object to send.
+        """
+        buffers = []
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        offsets = _slot_offsets([len(raw_buffer) for raw_buffer in raw_buffers])
+
+        if not raw_buffers:  # nothing to share, the pickle stream is the whole object
+            self.socket.send_object((self.seq, None, data, None))
+        elif offsets[-1] + len(raw_buffers[-1]) > self.slot_size_bytes:  # too big for a slot
+            self.socket.send_object((self.seq, None, pickle.dumps(obj, protocol=5), None))
+        else:
+            slot = self._acquire_slot()
+            slot_start = slot * self.slot_size_bytes
+            for offset, raw_buffer in zip(offsets, raw_buffers):
+                self.shm.buf[slot_start + offset:slot_start + offset + len(raw_buffer)] = raw_buffer
+            layout = [(offset, len(raw_buffer)) for offset, raw_buffer in zip(offsets, raw_buffers)]
+            self.socket.send_object((self.seq, slot, data, layout))
+        self.seq += 1
+
+    def send_array(self, arr: Optional[np.ndarray]):
+        """Sends an array, or None to signal the end of the stream. Equivalent to send_object.
+
+        Args:
+            arr: Optional[np.ndarray] -- The array to send.
+        """
+        self.send_object(arr if arr is None else np.ascontiguousarray(arr))
+
+    def close(self):
+        """Closes the connection and releases the shared memory."""
+        self.socket.close()
+        self.shm.close()
+        self.shm.unlink()
+
+    def is_connected(self) -> bool:
+        """Returns whether the connection is active.
+
+        Returns:
+            bool -- True if the connection is active, false otherwise.
+        """
+        return self.socket.is_connected()
+
+    def _acquire_slot(self) -> int:
+        self._collect_acks(block=not self._free_slots)
+        return self._free_slots.popleft()
+
+    def _collect_acks(self, block: bool):
+        """Reads the slots handed back by the receiver. Waits for at least one if block is True."""
+        conn = self.socket.conn
+        ack_size = SharedMemoryParams.ACK_SIZE_BYTES
+        while block or select.select([conn], [], [], 0)[0]:
+            conn.settimeout(None)
+            data = conn.recv(ack_size * self.slot_count)
+            if not data:
+                raise ConnectionError('Connection closed by the receiver.')
+            self._acks += data
+
+            n_complete = len(self._acks) // ack_size * ack_size
+            for (slot,) in struct.iter_unpack('<I', self._acks[:n_complete]):
+                self._free_slots.append(slot)
+            del self._acks[:n_complete]
+            block = block and not self._free_slots
+
+
+class SharedMemoryReceiverSocket:
+    """Receives objects from a SharedMemorySenderSocket running on the same host.
+
+    The buffers of the received objects are mapped straight from the shared memory slot, e.g. a received
+    frame is an ndarray view of the slot, without any copy. The slot is handed back to the sender on the
+    next call to recv_object, so the received object is only valid until then (copy it to keep it longer).
+    The latency and gap statistics are available in socket.metrics.
+
+    Attributes:
+        socket: ObjectReceiverSocket -- The socket carrying the slot indices and sequence numbers.
+        shm: shared_memory.SharedMemory -- The block holding the slots.
+        slot_size_bytes: int -- The size of a single slot.
+        last_seq: int -- The sequence number of the last received object (-1 before the first one).
+
+    Methods:
+        recv_object() -> Any -- Receives an object from the sender.
+        recv_array() -> Optional[np.ndarray] -- Receives an array (or None as end of stream marker) from the sender.
+        close() -- Closes the connection and detaches from the shared memory.
+        is_connected() -> bool -- Returns whether the connection is active.
+    """
+    socket: ObjectReceiverSocket
+    shm: shared_memory.SharedMemory
+    slot_size_bytes: int
+    last_seq: int
+
+    def __init__(self, ip: str, port: Optional[int] = None,
+                 print_when_connecting_to_sender: bool = False,
+                 print_when_receiving_object: bool = False,
+                 metrics_log_interval_s: Optional[float] = None):
+        """Initializes the SharedMemoryReceiverSocket, connects to the sender and attaches to its shared memory.
+
+        Args:
+            ip: str -- The IP of the sender socket, or its endpoint URI.
+            port = None: Optional[int] -- The port of the sender socket, only with an IP.
+            print_when_connecting_to_sender = False: bool -- Whether to print when connecting to the sender.
+            print_when_receiving_object = False: bool -- Deprecated, see metrics_log_interval_s.
+            metrics_log_interval_s = None: Optional[float] -- The interval between two printed metrics summaries.
+        """
+        self.socket = ObjectReceiverSocket(ip, port, print_when_connecting_to_sender, print_when_receiving_object,
+                                           metrics_log_interval_s=metrics_log_interval_s)
+        shm_name, self.slot_size_bytes, _slot_count = self.socket.recv_object()
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        if sys.platform != 'win32':
+            # the block belongs to the sender, which unlinks it: the tracker of this process must not do it too
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.last_seq = -1
+        self._held_slot = None
+
+    def recv_object(self) -> Any:
+        """Receives an object from the sender, handing back the slot of the previous object.
+
+        Returns:
+            Any -- The object received. Its buffers are views of a shared memory slot.
+        """
+        self._release_slot()
+        seq, slot, data, layout = self.socket.recv_object()
+        self.last_seq = seq
+        if slot is None:
+            return pickle.loads(data)
+
+        slot_start = slot * self.slot_size_bytes
+        buffers = [self.shm.buf[slot_start + offset:slot_start + offset + size] for offset, size in layout]
+        self._held_slot = slot
+        return pickle.loads(data, buffers=buffers)
+
+    def recv_array(self) -> Optional[np.ndarray]:
+        """Receives an array sent with send_array. Equivalent to recv_object.
+
+        Returns:
+            Optional[np.ndarray] -- The array (a view of a shared memory slot), or None at the end of the stream.
+        """
+        return self.recv_object()
+
+    def close(self):
+        """Closes the connection and detaches from the shared memory.
+
+        Arrays received earlier must not be used afterwards.
+        """
+        self.socket.close()
+        try:
+            self.shm.close()
+        except BufferError:  # received arrays still reference the block, it is unmapped when they are gone
+            pass
+
+    def is_connected(self) -> bool:
+        """Returns whether the connection is active.
+
+        Returns:
+            bool -- True if the connection is active, false otherwise.
+        """
+        return self.socket.is_connected()
+
+    def _release_slot(self):
+        if self._held_slot is not None:
+            self.socket.conn.sendall(struct.pack('<I', self._held_slot))
+            self._held_slot = None
+
+
+def _slot_offsets(sizes: List[int]) -> List[int]:
+    """Places buffers of the given sizes one after the other in a slot, each aligned to BUFFER_ALIGNMENT_BYTES."""
+    alignment = SharedMemoryParams.BUFFER_ALIGNMENT_BYTES
+    offsets = []
+    offset = 0
+    for size in sizes:
+        offsets.append(offset)
+        offset += (size + alignment - 1) // alignment * alignment
+    return offsets
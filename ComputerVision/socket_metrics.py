@@ -0,0 +1,184 @@
+import collections
+import threading
+import time
+
+import numpy as np
+
+from typing import *
+
+
+class MetricsParams:
+    """Wrapper for configuration constants"""
+    WINDOW_SIZE = 1000
+    PERCENTILES = (50, 95, 99)
+
+
+class SocketMetrics:
+    """Rolling statistics about the messages going through a socket.
+
+    Every message is recorded with its size and, when the peer stamps its messages (wire version 2 and above),
+    its sequence number and send timestamp. Latencies and throughputs are computed over the last window_size
+    messages, while the counters cover the whole connection.
+
+    Send timestamps come from time.monotonic_ns() on the sender. The clock is shared by all the processes of
+    a host but not synchronized between hosts, so transit latencies are only meaningful on the same host.
+
+    Attributes:
+        window_size: int -- The number of recent messages the rates and percentiles are computed on.
+        log_interval_s: Optional[float] -- The interval between two printed summaries, None to never print.
+        objects: int -- The total number of messages recorded.
+        bytes: int -- The total size of the messages recorded, headers included.
+        gaps: int -- The number of times one or more sequence numbers were skipped.
+        missing_objects: int -- The total number of skipped sequence numbers (e.g. messages dropped by the sender).
+        out_of_order: int -- The number of messages whose sequence number was lower than expected (e.g. the sender restarted).
+
+    Methods:
+        record(n_bytes: int, seq: Optional[int] = None, sent_ns: Optional[int] = None) -- Records a message.
+        latency_percentiles_ms() -> Dict[int, float] -- Returns the transit latency percentiles.
+        bytes_per_s() -> float -- Returns the recent throughput in bytes per second.
+        objects_per_s() -> float -- Returns the recent throughput in messages per second.
+        snapshot() -> Dict[str, float] -- Returns all the metrics in a dict.
+        summary() -> str -- Returns a one line summary of the metrics.
+        log_due() -> bool -- Returns whether a summary should be printed now.
+        reset() -- Clears all the metrics.
+    """
+    window_size: int
+    log_interval_s: Optional[float]
+    objects: int
+    bytes: int
+    gaps: int
+    missing_objects: int
+    out_of_order: int
+
+    def __init__(self, window_size: int = MetricsParams.WINDOW_SIZE, log_interval_s: Optional[float] = None):
+        """Initializes empty SocketMetrics.
+
+        Args:
+            window_size = MetricsParams.WINDOW_SIZE: int -- The number of recent messages the rates and percentiles are computed on.
+            log_interval_s = None: Optional[float] -- The interval between two printed summaries, None to never print.
+        """
+        self.window_size = window_size
+        self.log_interval_s = log_interval_s
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all the metrics."""
+        with self._lock:
+            self.objects = 0
+            self.bytes = 0
+            self.gaps = 0
+            self.missing_objects = 0
+            self.out_of_order = 0
+            self._next_seq = None
+            self._times_ns = collections.deque(maxlen=self.window_size)
+            self._sizes = collections.deque(maxlen=self.window_size)
+            self._latencies_ns = collections.deque(maxlen=self.window_size)
+            self._next_log_s = time.monotonic() + (self.log_interval_s or 0)
+
+    def record(self, n_bytes: int, seq: Optional[int] = None, sent_ns: Optional[int] = None):
+        """Records a message.
+
+        Args:
+            n_bytes: int -- The size of the message, headers included.
+            seq = None: Optional[int] -- The sequence number of the message, if the sender stamps its messages.
+            sent_ns = None: Optional[int] -- The time.monotonic_ns() of the sender when the message was sent.
+        """
+        now_ns = time.monotonic_ns()
+        with self._lock:
+            self.objects += 1
+            self.bytes += n_bytes
+            self._times_ns.append(now_ns)
+            self._sizes.append(n_bytes)
+            if sent_ns is not None:
+                self._latencies_ns.append(now_ns - sent_ns)
+            if seq is not None:
+                if self._next_seq is not None and seq > self._next_seq:
+                    self.gaps += 1
+                    self.missing_objects += seq - self._next_seq
+                elif self._next_seq is not None and seq < self._next_seq:
+                    self.out_of_order += 1
+                self._next_seq = seq + 1
+
+    def latency_percentiles_ms(self) -> Dict[int, float]:
+        """Returns the percentiles of the transit latency of the recent messages.
+
+        Returns:
+            Dict[int, float] -- The latency in milliseconds for every percentile of MetricsParams.PERCENTILES,
+                empty if the sender does not stamp its messages.
+        """
+        with self._lock:
+            latencies_ns = np.array(self._latencies_ns, dtype=np.int64)
+        if latencies_ns.size == 0:
+            return {}
+        values_ms = np.percentile(latencies_ns, MetricsParams.PERCENTILES) / 1e6
+        return {percentile: float(value_ms) for percentile, value_ms in zip(MetricsParams.PERCENTILES, values_ms)}
+
+    def bytes_per_s(self) -> float:
+        """Returns the throughput over the recent messages.
+
+        Returns:
+            float -- The number of bytes per second (0 until two messages are recorded).
+        """
+        with self._lock:
+            elapsed_s = self._window_elapsed_s()
+            # the first message of the window opens the interval, its bytes arrived before it
+            n_bytes = sum(self._sizes) - self._sizes[0] if elapsed_s else 0
+        return n_bytes / elapsed_s if elapsed_s else 0.0
+
+    def objects_per_s(self) -> float:
+        """Returns the message rate over the recent messages.
+
+        Returns:
+            float -- The number of messages per second (0 until two messages are recorded).
+        """
+        with self._lock:
+            elapsed_s = self._window_elapsed_s()
+            n_objects = len(self._times_ns) - 1
+        return n_objects / elapsed_s if elapsed_s else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Returns all the metrics in a dict, e.g. to be logged as JSON.
+
+        Returns:
+            Dict[str, float] -- The counters, the rates and the latency percentiles (latency_p50_ms, ...).
+        """
+        snapshot = {'objects': self.objects, 'bytes': self.bytes, 'gaps': self.gaps,
+                    'missing_objects': self.missing_objects, 'out_of_order': self.out_of_order,
+                    'objects_per_s': self.objects_per_s(), 'bytes_per_s': self.bytes_per_s()}
+        for percentile, value_ms in self.latency_percentiles_ms().items():
+            snapshot[f'latency_p{percentile}_ms'] = value_ms
+        return snapshot
+
+    def summary(self) -> str:
+        """Returns a one line summary of the metrics.
+
+        Returns:
+            str -- The summary.
+        """
+        summary = (f'{self.objects} objects, {self.objects_per_s():.1f} objects/s, '
+                   f'{self.bytes_per_s() / 1e6:.2f} MB/s, {self.gaps} gaps ({self.missing_objects} missing)')
+        latencies_ms = self.latency_percentiles_ms()
+        if latencies_ms:
+            summary += ', latency ' + ' '.join(f'p{percentile}={value_ms:.2f}ms' for percentile, value_ms in latencies_ms.items())
+        return summary
+
+    def log_due(self) -> bool:
+        """Returns True at most once every log_interval_s, to throttle the printed summaries.
+
+        Returns:
+            bool -- Whether a summary should be printed now (always False if log_interval_s is None).
+        """
+        if self.log_interval_s is None:
+            return False
+        now_s = time.monotonic()
+        if now_s < self._next_log_s:
+            return False
+        self._next_log_s = now_s + self.log_interval_s
+        return True
+
+    def _window_elapsed_s(self) -> float:
+        # must be called with _lock held
+        if len(self._times_ns) < 2:
+            return 0.0
+        return (self._times_ns[-1] - self._times_ns[0]) / 1e9
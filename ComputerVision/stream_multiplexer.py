@@ -0,0 +1,180 @@
+import collections
+import datetime
+import threading
+
+from typing import *
+
+import object_socket
+from lane_detector import LaneDetection, LaneDetector
+from parallel_lane_detector import ParallelLaneDetector
+from send_queue import BoundedSendQueue, SlowConsumerPolicy
+
+
+class MultiplexerParams:
+    """Wrapper for configuration constants"""
+    QUEUE_CAPACITY = 2  # frames buffered per stream
+    IDLE_WAIT_S = 0.05  # how long the scheduler sleeps when no stream has a frame and no detection is pending
+    JOIN_TIMEOUT_S = 1
+
+
+class StreamMultiplexer:
+    """Receives the frames of several producers (e.g. one per camera) and detects their lane lines in one process.
+
+    Every endpoint is read by its own thread into a small per-stream queue. The scheduler serves the streams
+    round-robin, one frame per stream and per turn, so a fast camera cannot starve a slow one: when the detectors
+    are busy, the queue of each stream fills up and its policy applies (BLOCK slows the producer down, LATEST or
+    DROP_OLDEST skip frames of that stream only). Frames are detected by a shared ParallelLaneDetector, or in
+    this process if workers is 0. Each stream keeps its own last good lines, and its detections come out in order.
+
+    Example:
+        with StreamMultiplexer(['tcp://10.0.0.2:5000', 'tcp://10.0.0.3:5000'], workers=4) as multiplexer:
+            for stream, detection in multiplexer.detections():
+                ...
+
+    Attributes:
+        streams: List[str] -- The endpoints of the producers, which are also the IDs of their streams.
+        workers: int -- The number of worker processes, 0 to detect in this process.
+        policy: str -- The SlowConsumerPolicy of the per-stream queues.
+        frames: Dict[str, int] -- The number of frames scheduled, per stream.
+
+    Methods:
+        detections() -> Iterator[Tuple[str, LaneDetection]] -- Yields the detections of all the streams, until they all end.
+        detector(stream: str) -> LaneDetector -- Returns the detector holding the state of a stream.
+        dropped(stream: str) -> int -- Returns the number of frames of a stream skipped by its queue.
+        close() -- Disconnects from the producers and stops the workers.
+    """
+    streams: List[str]
+    workers: int
+    policy: str
+    frames: Dict[str, int]
+
+    def __init__(self, endpoints: Sequence[str], workers: int = 0, queue_capacity: int = MultiplexerParams.QUEUE_CAPACITY,
+                 policy: str = SlowConsumerPolicy.BLOCK, reconnect: bool = False, metrics_log_interval_s: Optional[float] = None,
+                 **detector_kwargs):
+        """Initializes the StreamMultiplexer and starts connecting to the producers.
+
+        Args:
+            endpoints: Sequence[str] -- The endpoints of the producers (see object_socket.parse_endpoint).
+            workers = 0: int -- The number of worker processes shared by all the streams, 0 to detect in this process.
+            queue_capacity = MultiplexerParams.QUEUE_CAPACITY: int -- The number of frames buffered per stream.
+            policy = SlowConsumerPolicy.BLOCK: str -- What to do with the frames of a stream whose queue is full.
+            reconnect = False: bool -- Whether the receivers reconnect to their producer when the connection is lost.
+            metrics_log_interval_s = None: Optional[float] -- The interval between the metrics printed by the receivers.
+            **detector_kwargs -- The arguments of the LaneDetectors.
+        """
+        if len(set(endpoints)) != len(endpoints):
+            raise ValueError(f'Every endpoint must be given once, got {list(endpoints)}')
+        self.streams = list(endpoints)
+        self.workers = workers
+        self.policy = policy
+        self.frames = {stream: 0 for stream in self.streams}
+        self._detector_kwargs = detector_kwargs
+        self._detectors = {}
+        self._pool = ParallelLaneDetector(workers, **detector_kwargs) if workers else None
+        self._queues = {stream: BoundedSendQueue(queue_capacity, policy) for stream in self.streams}
+        self._rotation = collections.deque(self.streams)
+        self._frame_ready = threading.Event()
+        self._receivers = {}
+        self._closed = False
+        self._threads = [threading.Thread(target=self._read_stream, args=(stream, reconnect, metrics_log_interval_s), daemon=True)
+                         for stream in self.streams]
+        for thread in self._threads:
+            thread.start()
+
+    def detector(self, stream: str) -> LaneDetector:
+        """Returns the LaneDetector holding the last good lines of a stream.
+
+        Args:
+            stream: str -- The stream.
+
+        Returns:
+            LaneDetector -- The detector, e.g. to draw the overlay of the detections of the stream.
+        """
+        if self._pool is not None:
+            return self._pool.detector(stream)
+        detector = self._detectors.get(stream)
+        if detector is None:
+            detector = self._detectors[stream] = LaneDetector(**self._detector_kwargs)
+        return detector
+
+    def dropped(self, stream: str) -> int:
+        """Returns the number of frames of a stream discarded by the policy of its queue.
+
+        Args:
+            stream: str -- The stream.
+
+        Returns:
+            int -- The number of frames.
+        """
+        return self._queues[stream].dropped
+
+    def detections(self) -> Iterator[Tuple[str, LaneDetection]]:
+        """Yields the detections of all the streams as they are ready, until every producer ended its video.
+
+        Returns:
+            Iterator[Tuple[str, LaneDetection]] -- The stream of each detection and the detection, in the order of
+                the frames within a stream.
+        """
+        while True:
+            self._frame_ready.clear()
+            scheduled = False
+            # one turn of the round-robin: at most one frame per stream, resuming after the last stream served
+            for _ in range(len(self._rotation)):
+                if self._pool is not None and self._pool.full():
+                    break
+                stream = self._rotation[0]
+                self._rotation.rotate(-1)
+                frame = self._queues[stream].get(timeout_s=0)
+                if frame is None:
+                    continue
+                self._queues[stream].task_done()
+                self.frames[stream] += 1
+                scheduled = True
+                if self._pool is None:
+                    yield stream, self.detector(stream).detect(frame)
+                else:
+                    self._pool.submit(frame, stream)
+
+            if self._pool is not None and self._pool.pending() and (self._pool.full() or self._pool.ready() or not scheduled):
+                yield self._pool.collect()
+            elif not scheduled:
+                if all(queue.closed and not queue.depth() for queue in self._queues.values()):
+                    return
+                self._frame_ready.wait(MultiplexerParams.IDLE_WAIT_S)
+
+    def close(self):
+        """Disconnects from the producers and stops the workers, the frames not detected yet are discarded."""
+        self._closed = True
+        for queue in self._queues.values():
+            queue.close()
+        for receiver in list(self._receivers.values()):
+            receiver.close()
+        for thread in self._threads:
+            thread.join(MultiplexerParams.JOIN_TIMEOUT_S)
+        if self._pool is not None:
+            self._pool.close()
+
+    def __enter__(self) -> 'StreamMultiplexer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_stream(self, stream: str, reconnect: bool, metrics_log_interval_s: Optional[float]):
+        queue = self._queues[stream]
+        try:
+            receiver = object_socket.ObjectReceiverSocket(stream, print_when_connecting_to_sender=True, reconnect=reconnect,
+                                                          metrics_log_interval_s=metrics_log_interval_s)
+            self._receivers[stream] = receiver
+            while not self._closed:
+                frame = receiver.recv_array(copy=True)  # the frame waits in the queue, it must own its data
+                if frame is None or not queue.put(frame):
+                    break
+                self._frame_ready.set()
+            receiver.close()
+        except (ConnectionError, OSError) as e:
+            if not self._closed:
+                print(f'[{datetime.datetime.now()}][StreamMultiplexer/{stream}] stream lost: {e!r}')
+        finally:
+            queue.close()
+            self._frame_ready.set()
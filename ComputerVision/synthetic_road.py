@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+from typing import *
+
+
+def make_road_frame(width: int = 1280, height: int = 720, frame_index: int = 0, seed: int = 0) -> np.ndarray:
+    """Draws a synthetic BGR dashcam frame: noisy asphalt, two solid lane lines and a dashed center line.
+
+    The lines converge towards a vanishing point slightly above the middle of the image (like in the
+    test video) and sway a little with frame_index, so consecutive frames differ. No video file is needed,
+    which makes the frames usable for benchmarks at any resolution.
+
+    Args:
+        width = 1280: int -- The width of the frame.
+        height = 720: int -- The height of the frame.
+        frame_index = 0: int -- The index of the frame in the synthetic sequence.
+        seed = 0: int -- The seed of the asphalt noise.
+
+    Returns:
+        np.ndarray -- The (height, width, 3) uint8 frame.
+    """
+    rng = np.random.default_rng(seed + frame_index)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:int(height * 0.6)] = (200, 170, 140)  # sky
+    frame[int(height * 0.6):] = (90, 90, 90)  # asphalt
+    frame += rng.integers(0, 8, size=frame.shape, dtype=np.uint8)
+
+    sway = int(width * 0.02 * np.sin(frame_index / 15))
+    vanishing_point = (width // 2 + sway, int(height * 0.6))
+    thickness = max(1, width // 120)
+    left_bottom = (int(width * 0.12), height - 1)
+    right_bottom = (int(width * 0.88), height - 1)
+    cv2.line(frame, _towards(left_bottom, vanishing_point, 0.7), left_bottom, (235, 235, 235), thickness)
+    cv2.line(frame, _towards(right_bottom, vanishing_point, 0.7), right_bottom, (235, 235, 235), thickness)
+
+    center_bottom = (width // 2, height - 1)
+    n_dashes = 6
+    for i in range(n_dashes):
+        start = (i + (frame_index % 4) / 4) / n_dashes * 0.7
+        end = start + 0.35 / n_dashes
+        cv2.line(frame, _towards(center_bottom, vanishing_point, start), _towards(center_bottom, vanishing_point, end),
+                 (235, 235, 235), max(1, thickness // 2))
+    return frame
+
+
+def make_road_frames(n_frames: int, width: int = 1280, height: int = 720) -> Iterator[np.ndarray]:
+    """Yields n_frames consecutive synthetic frames.
+
+    Args:
+        n_frames: int -- The number of frames.
+        width = 1280: int -- The width of the frames.
+        height = 720: int -- The height of the frames.
+
+    Returns:
+        Iterator[np.ndarray] -- The frames.
+    """
+    for frame_index in range(n_frames):
+        yield make_road_frame(width, height, frame_index)
+
+
+def _towards(start: Tuple[int, int], end: Tuple[int, int], fraction: float) -> Tuple[int, int]:
+    return int(start[0] + (end[0] - start[0]) * fraction), int(start[1] + (end[1] - start[1]) * fraction)
@@ -1,6 +1,8 @@
 import cv2
 import numpy as np
 
+from lane_detector import extract_points
+
 def main() -> None:
     cam = cv2.VideoCapture('Lane Detection Test Video 01.mp4')
 
@@ -109,56 +111,47 @@ def main() -> None:
         cv2.moveWindow('No Noise', width, int(width * ratio * 2) + bar_width * 2)
 
         # Find the coordinates of the white points
-        left_xs = []
-        left_ys = []
-        right_xs = []
-        right_ys = []
-
         half = int(width // 2)
         first_half = no_noise_frame[0:height, 0:half]
         second_half = no_noise_frame[0:height, half:width]
         cv2.imshow('First Half', first_half)
         cv2.imshow('Second Half', second_half)
 
-        left_points = np.argwhere(first_half > 1) # stores the matrix coordinates of the white pixels
-        right_points = np.argwhere(second_half > 1) # stores the matrix coordinates of the white pixels
-
-        # since argwhere returns the coordinates reversed, this corrects that:
-        for point in left_points:
-            left_xs.append(point[1])
-            left_ys.append(point[0])
-        for point in right_points:
-            right_xs.append(point[1] + half)
-            right_ys.append(point[0])
+        # extract_points returns the (x, y) coordinates of the white pixels in a single pass, none for a black half
+        left_xs, left_ys = extract_points(first_half)
+        right_xs, right_ys = extract_points(second_half, half)
 
         # Exercise 10
         lined_frame = binary_frame.copy()
         # draw the middle line
         cv2.line(lined_frame, (half, 0), (half, height), (100, 0, 0), 2)
 
-        # find the line that best fits the left and right points
-        b_left, a_left = np.polynomial.polynomial.polyfit(left_xs, left_ys, deg=1)
-        b_right, a_right = np.polynomial.polynomial.polyfit(right_xs, right_ys, deg=1)
+        # find the line that best fits the left and right points, the previous line is kept for a half without points
+        if len(left_xs) > 1:
+            b_left, a_left = np.polynomial.polynomial.polyfit(left_xs, left_ys, deg=1)
 
-        left_top_y = int(0)
-        left_top_x = int((left_top_y - b_left) / a_left)
+            left_top_y = int(0)
+            left_top_x = int((left_top_y - b_left) / a_left)
 
-        left_bottom_y = int(height - 1)
-        left_bottom_x = int((left_bottom_y - b_left) / a_left)
+            left_bottom_y = int(height - 1)
+            left_bottom_x = int((left_bottom_y - b_left) / a_left)
 
-        right_top_y = int(0)
-        right_top_x = int((right_top_y - b_right) / a_right)
+            if np.abs(left_top_x) < 10 ** 8 and np.abs(left_bottom_x) < 10 ** 8:
+                left_top = (left_top_x, left_top_y)
+                left_bottom = (left_bottom_x, left_bottom_y)
 
-        right_bottom_y = int(height - 1)
-        right_bottom_x = int((right_bottom_y - b_right) / a_right)
-        
-        if np.abs(left_top_x) < 10 ** 8 and np.abs(left_bottom_x) < 10 ** 8:
-            left_top = (left_top_x, left_top_y)
-            left_bottom = (left_bottom_x, left_bottom_y)
+        if len(right_xs) > 1:
+            b_right, a_right = np.polynomial.polynomial.polyfit(right_xs, right_ys, deg=1)
 
-        if np.abs(right_top_x) < 10 ** 8 and np.abs(right_bottom_x) < 10 ** 8:
-            right_top = (right_top_x, right_top_y)
-            right_bottom = (right_bottom_x, right_bottom_y)
+            right_top_y = int(0)
+            right_top_x = int((right_top_y - b_right) / a_right)
+
+            right_bottom_y = int(height - 1)
+            right_bottom_x = int((right_bottom_y - b_right) / a_right)
+
+            if np.abs(right_top_x) < 10 ** 8 and np.abs(right_bottom_x) < 10 ** 8:
+                right_top = (right_top_x, right_top_y)
+                right_bottom = (right_bottom_x, right_bottom_y)
 
         # Draw the lines
         cv2.line(lined_frame, left_top, left_bottom, (200, 0, 0), 5)
@@ -178,14 +171,9 @@ def main() -> None:
         reverted_left_line = cv2.warpPerspective(blank_frame_left, back_magic_matrix, (width, height))
         reverted_right_line = cv2.warpPerspective(blank_frame_right, back_magic_matrix, (width, height))
 
-        left_white_points = np.array(np.argwhere(reverted_left_line > 1))
-        right_white_points = np.array(np.argwhere(reverted_right_line > 1))
-
         colored_img = resized_frame.copy()
-        for y, x in left_white_points:
-            colored_img[y, x] = [0, 0, 255]
-        for y, x in right_white_points:
-            colored_img[y, x] = [255, 0, 0]
+        colored_img[reverted_left_line > 1] = [0, 0, 255]
+        colored_img[reverted_right_line > 1] = [255, 0, 0]
 
         cv2.imshow('Colored Left Line', colored_img)
 
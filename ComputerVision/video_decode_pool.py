@@ -0,0 +1,224 @@
+import collections
+import concurrent.futures
+import os
+import sys
+from multiprocessing import shared_memory, resource_tracker
+
+import cv2
+import numpy as np
+
+from typing import *
+
+
+class DecodePoolParams:
+    """Wrapper for configuration constants"""
+    SEGMENT_FRAMES = 16
+
+
+def count_frames(video_path: str) -> int:
+    """Returns the number of frames announced by the container of a video file.
+
+    Args:
+        video_path: str -- The path of the video file.
+
+    Returns:
+        int -- The number of frames (an estimate for some containers, 0 if unknown).
+    """
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise IOError(f'Could not open video {video_path!r}')
+    n_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    video.release()
+    return max(n_frames, 0)
+
+
+def read_frames(video_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Decodes the frames [start, stop) of a video file one after the other, on the calling thread.
+
+    The capture seeks straight to start. Backends which can only seek to key frames report another
+    position, in which case the frames before start are decoded and skipped instead.
+
+    Args:
+        video_path: str -- The path of the video file.
+        start = 0: int -- The index of the first frame.
+        stop = None: Optional[int] -- The index after the last frame, None to decode until the end of the video.
+
+    Returns:
+        Iterator[np.ndarray] -- The decoded frames, fewer than stop - start if the video ends before stop.
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        if start > 0:
+            video.set(cv2.CAP_PROP_POS_FRAMES, start)
+            if int(video.get(cv2.CAP_PROP_POS_FRAMES)) != start:
+                video.release()
+                video = cv2.VideoCapture(video_path)
+                for _ in range(start):
+                    if not video.grab():
+                        break
+
+        index = start
+        while stop is None or index < stop:
+            ret, frame = video.read()
+            if not ret:
+                break
+            index += 1
+            yield frame
+    finally:
+        video.release()
+
+
+def decode_segment(video_path: str, start: int, stop: Optional[int]) -> List[np.ndarray]:
+    """Decodes the frames [start, stop) of a video file (see read_frames()). Runs in the worker processes of VideoDecodePool.
+
+    Args:
+        video_path: str -- The path of the video file.
+        start: int -- The index of the first frame.
+        stop: Optional[int] -- The index after the last frame, None to decode until the end of the video.
+
+    Returns:
+        List[np.ndarray] -- The decoded frames, fewer than stop - start if the video ends before stop.
+    """
+    return list(read_frames(video_path, start, stop))
+
+
+def _decode_segment_to_shared_memory(video_path: str, start: int, stop: Optional[int]) -> Optional[Tuple[str, int, Tuple[int, ...], str]]:
+    """Decodes a segment into a new shared memory block, which is unlinked by the parent process once consumed.
+
+    Returns the name of the block, the number of frames, their shape and their dtype, or None if no frame was decoded.
+    """
+    frames = decode_segment(video_path, start, stop)
+    if not frames:
+        return None
+    block = shared_memory.SharedMemory(create=True, size=len(frames) * frames[0].nbytes)
+    if sys.platform != 'win32':
+        # the block belongs to the parent from now on: the tracker of the worker must not unlink it when the worker exits
+        resource_tracker.unregister(block._name, 'shared_memory')
+    segment = np.ndarray((len(frames), *frames[0].shape), dtype=frames[0].dtype, buffer=block.buf)
+    segment[:] = frames
+    del segment
+    block.close()
+    return block.name, len(frames), frames[0].shape, frames[0].dtype.str
+
+
+def _read_segment(result: Optional[Tuple[str, int, Tuple[int, ...], str]]) -> Iterator[np.ndarray]:
+    """Yields copies of the frames of a segment decoded by _decode_segment_to_shared_memory, then releases its block."""
+    if result is None:
+        return
+    name, n_frames, shape, dtype = result
+    block = shared_memory.SharedMemory(name=name)
+    segment = np.ndarray((n_frames, *shape), dtype=np.dtype(dtype), buffer=block.buf)
+    try:
+        for index in range(n_frames):
+            yield segment[index].copy()
+    finally:
+        del segment  # the block cannot be closed while an array uses its buffer, even when the reader is closed early
+        block.close()
+        block.unlink()
+
+
+def _release_segment(result: Optional[Tuple[str, int, Tuple[int, ...], str]]):
+    """Releases the block of a segment decoded by _decode_segment_to_shared_memory without reading it."""
+    if result is None:
+        return
+    block = shared_memory.SharedMemory(name=result[0])
+    block.close()
+    block.unlink()
+
+
+class VideoDecodePool:
+    """Decodes a video file with a pool of processes and yields its frames in order.
+
+    The video is split into segments of segment_frames consecutive frames, which are decoded in parallel
+    by the workers, each with its own capture. Segments are handed out in order and their frames are
+    re-sequenced by segment index, so iterating over the pool yields exactly the frames of a single
+    cv2.VideoCapture.read() loop (from frame start on), only faster when decoding is the bottleneck (e.g. high resolution files).
+    Decoded segments are handed over through shared memory rather than pickled through the pool's pipes.
+    At most workers + 1 segments are decoded ahead, which bounds the memory used. If the container does not
+    announce its frame count, the whole video is decoded as a single segment.
+
+    Example:
+        with VideoDecodePool('video.mp4', workers=4) as pool:
+            for frame in pool:
+                ...
+
+    Attributes:
+        video_path: str -- The path of the video file.
+        workers: int -- The number of decoding processes.
+        segment_frames: int -- The number of frames decoded by a worker at once.
+        start: int -- The index of the first frame decoded.
+        frame_count: int -- The number of frames announced by the container (the last segment reads until the end).
+
+    Methods:
+        close() -- Stops the workers.
+    """
+    video_path: str
+    workers: int
+    segment_frames: int
+    start: int
+    frame_count: int
+
+    def __init__(self, video_path: str, workers: Optional[int] = None,
+                 segment_frames: int = DecodePoolParams.SEGMENT_FRAMES, start: int = 0):
+        """Initializes the VideoDecodePool and starts the worker processes.
+
+        Args:
+            video_path: str -- The path of the video file.
+            workers = None: Optional[int] -- The number of decoding processes, defaults to the number of CPUs.
+            segment_frames = DecodePoolParams.SEGMENT_FRAMES: int -- The number of frames decoded by a worker at once.
+            start = 0: int -- The index of the first frame to decode, e.g. to resume a previous run.
+        """
+        self.video_path = video_path
+        self.workers = workers or os.cpu_count() or 1
+        self.segment_frames = segment_frames
+        self.start = start
+        self.frame_count = count_frames(video_path)
+        self._executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Yields the frames of the video, in order.
+
+        Returns:
+            Iterator[np.ndarray] -- The decoded frames.
+        """
+        n_segments = max(1, -(-(self.frame_count - self.start) // self.segment_frames))
+        max_pending = self.workers + 1  # one more segment keeps the workers busy while the oldest one is consumed
+        pending = collections.deque()
+        next_segment = 0
+        reader = None
+        try:
+            while True:
+                while next_segment < n_segments and len(pending) < max_pending:
+                    start = self.start + next_segment * self.segment_frames
+                    # the frame count of the container may be wrong, the last segment reads until the end
+                    stop = start + self.segment_frames if next_segment < n_segments - 1 else None
+                    future = self._executor.submit(_decode_segment_to_shared_memory, self.video_path, start, stop)
+                    pending.append((stop, future))
+                    next_segment += 1
+                if not pending:
+                    return
+
+                stop, future = pending.popleft()
+                n_frames = 0
+                reader = _read_segment(future.result())
+                for frame in reader:
+                    n_frames += 1
+                    yield frame
+                if stop is not None and n_frames < self.segment_frames:  # the video is shorter than announced
+                    return
+        finally:
+            if reader is not None:  # releases the block of the segment being read when the iteration stops early
+                reader.close()
+            for _, future in pending:
+                if not future.cancel():  # already decoded or being decoded, its block must be released
+                    _release_segment(future.result())
+
+    def close(self):
+        """Stops the workers, cancelling the segments which are not decoded yet."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> 'VideoDecodePool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()